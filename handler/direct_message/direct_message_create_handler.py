@@ -3,6 +3,7 @@ from botpy.message import DirectMessage
 
 from handler.handle_email_verification import handle_email_verification_direct_message
 from utils.send_message_with_log import post_dms_with_log
+from utils.task_supervisor import supervisor
 
 _log = logging.get_logger()
 
@@ -20,7 +21,9 @@ async def direct_message_create_handler(client, message: DirectMessage):
         handler = COMMANDS.get(command)
 
         if handler:
-            await handler(client, message)
+            # 私信按来源频道排队，与频道消息的任务分开限流
+            supervisor.submit("direct_message", message.src_guild_id, command, lambda: handler(client, message),
+                              on_shed=lambda: post_dms_with_log(client, message, content="机器人当前繁忙，请稍后再试。"))
         else:
             await post_dms_with_log(client, message, content="无法识别的命令，请检查您的输入。")
     else:
@@ -7,7 +7,7 @@ from botpy.message import Message
 
 from config import config
 from utils.guild_utils import get_guild_name_from_redis, check_guild_authenticity
-from utils.mysql_utils import get_mysql_conn
+from utils.mysql_utils import get_async_mysql_conn
 from utils.send_message_with_log import reply_with_log
 
 
@@ -26,21 +26,21 @@ def extract_id(content: str):
         return None
 
 
-def insert_authenticated_guild(guild_id: str):
+async def insert_authenticated_guild(guild_id: str):
     # 建立数据库连接
-    conn = get_mysql_conn()
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             # 插入数据的SQL语句
             query = "INSERT INTO `authenticated_guilds` (`guild_id`) VALUES (%s)"
-            cursor.execute(query, (guild_id,))
-        conn.commit()
+            await cursor.execute(query, (guild_id,))
+        await conn.commit()
     except pymysql.err.IntegrityError:
         _log.error(f"频道ID {guild_id} 已经被认证过了。")
     except Exception as e:
         _log.error(f"尝试认证频道ID {guild_id} 时发生错误：{e}")
     finally:
-        conn.close()
+        await conn.close()
 
 
 async def handle_authenticate_guild(client, message: Message):
@@ -66,7 +66,7 @@ async def handle_authenticate_guild(client, message: Message):
     guild_id_from_reference = extract_id(referenced_message['message']['content'])
     if guild_id_from_reference is not None:
         # 检查频道是否已经被认证过
-        if check_guild_authenticity(guild_id_from_reference):
+        if await check_guild_authenticity(guild_id_from_reference):
             await reply_with_log(message, content=f"频道ID: {guild_id_from_reference} 已经被认证过了")
         else:
             try:
@@ -77,7 +77,7 @@ async def handle_authenticate_guild(client, message: Message):
                     await reply_with_log(message, content=f"机器人未加入频道ID: {guild_id_from_reference}")
                     return
 
-                insert_authenticated_guild(guild_id_from_reference)
+                await insert_authenticated_guild(guild_id_from_reference)
                 guild_name = await get_guild_name_from_redis(client, guild_id_from_reference)
                 await reply_with_log(message,
                                      content=f"频道{guild_name}（{guild_id_from_reference}）认证成功")
@@ -9,13 +9,15 @@ from botpy import get_logger
 from botpy.message import DirectMessage
 
 from config import config
+from utils.command_router import Action, Arg
 from utils.get_help import get_help, bot_features_dict
 from utils.guild_utils import get_guild_name_from_redis
-from utils.mysql_utils import get_mysql_conn
-from utils.redis_utils import RedisConnection
+from utils.mysql_utils import get_async_mysql_conn
+from utils.redis_utils import get_async_redis
 from utils.roles import get_guild_roles, is_email_verification_admin_from_message
-from utils.send_email import send_email, EmailSendingError
+from utils.send_email import enqueue_email, EmailSendingError
 from utils.send_message_with_log import reply_with_log, post_dms_with_log, post_dms_from_message_with_log
+from utils.task_supervisor import supervisor
 
 _log = get_logger()
 
@@ -26,6 +28,31 @@ AES_KEY = os.environ.get('AES_KEY').encode()
 cipher = AES.new(AES_KEY, AES.MODE_ECB)
 
 
+def role_id_or_cancel(value, label):
+    if value != '取消' and not value.isdigit():
+        raise ValueError(f"<{label}>必须是身份组ID或“取消”")
+    return value
+
+
+def mentioned_user_id(value, label):
+    # “查询”后面紧跟@用户，取出用户ID
+    match = re.fullmatch(r"<@!(\d+)>", value)
+    if match is None:
+        raise ValueError(f"<{label}>必须是@用户")
+    return match.group(1)
+
+
+# @机器人 /邮箱认证的子命令格式
+EMAIL_VERIFICATION_ACTIONS = [
+    Action('添加域名', [Arg("邮箱域名")]),
+    Action('删除域名', [Arg("邮箱域名")]),
+    Action('清空域名'),
+    Action('域名列表'),
+    Action('添加邮箱认证身份组', [Arg("身份组ID|取消", kind=role_id_or_cancel)]),
+    Action('查询', [Arg("@用户", kind=mentioned_user_id)], attached=True),
+]
+
+
 def encrypt_email(email):
     # 对电子邮件地址进行AES加密
     email = email.encode()
@@ -39,15 +66,14 @@ def decrypt_email(encrypted_email):
     return email
 
 
-def execute_sql_with_commit(conn, sql, params):
+async def execute_sql_with_commit(conn, sql, params):
+    # 连接由调用方在finally中关闭
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, params)
-        conn.commit()
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+        await conn.commit()
     except Exception as e:
         _log.error(f"发生了一个错误: {e}")
-    finally:
-        conn.close()
 
 
 def validate_email_domain(email_domain):
@@ -59,7 +85,7 @@ def validate_email_domain(email_domain):
     return True, ""
 
 
-def add_email_domain(email_domain, guild_id):
+async def add_email_domain(email_domain, guild_id):
     is_valid, message = validate_email_domain(email_domain)
     if not is_valid:
         return message
@@ -68,166 +94,165 @@ def add_email_domain(email_domain, guild_id):
     if not email_domain.startswith('@'):
         email_domain = '@' + email_domain
 
-    conn = get_mysql_conn()
-    with conn.cursor() as cursor:
-        sql = "SELECT COUNT(*) AS count FROM email_domains WHERE email_domain = %s AND guild_id = %s"
-        cursor.execute(sql, (email_domain, guild_id))
-        result = cursor.fetchone()
-        if result['count'] > 0:
-            return "此邮箱域名已存在。"
-
-    with conn.cursor() as cursor:
-        sql = "SELECT COUNT(*) AS count, MAX(guild_domain_id) AS max_id FROM email_domains WHERE guild_id = %s"
-        cursor.execute(sql, (guild_id,))
-        result = cursor.fetchone()
-        max_domain_counts = config['email_verification']['max_domain_counts']
-        if result['count'] >= max_domain_counts:
-            return f"当前频道的邮箱域名已达上限（{max_domain_counts}个）。无法添加更多。"
-        current_max_id = int(result['max_id']) if result['max_id'] is not None else 0
-
-    sql = "INSERT INTO email_domains (email_domain, guild_id, guild_domain_id) VALUES (%s, %s, %s)"
-    execute_sql_with_commit(conn, sql, (email_domain, guild_id, current_max_id + 1))
+    conn = await get_async_mysql_conn()
+    try:
+        async with conn.cursor() as cursor:
+            sql = "SELECT COUNT(*) AS count FROM email_domains WHERE email_domain = %s AND guild_id = %s"
+            await cursor.execute(sql, (email_domain, guild_id))
+            result = await cursor.fetchone()
+            if result['count'] > 0:
+                return "此邮箱域名已存在。"
+
+        async with conn.cursor() as cursor:
+            sql = "SELECT COUNT(*) AS count, MAX(guild_domain_id) AS max_id FROM email_domains WHERE guild_id = %s"
+            await cursor.execute(sql, (guild_id,))
+            result = await cursor.fetchone()
+            max_domain_counts = config['email_verification']['max_domain_counts']
+            if result['count'] >= max_domain_counts:
+                return f"当前频道的邮箱域名已达上限（{max_domain_counts}个）。无法添加更多。"
+            current_max_id = int(result['max_id']) if result['max_id'] is not None else 0
+
+        sql = "INSERT INTO email_domains (email_domain, guild_id, guild_domain_id) VALUES (%s, %s, %s)"
+        await execute_sql_with_commit(conn, sql, (email_domain, guild_id, current_max_id + 1))
+    finally:
+        await conn.close()
 
     return f"邮箱域名 {email_domain} 已成功添加。"
 
 
-def delete_email_domain(email_domain, guild_id):
+async def delete_email_domain(email_domain, guild_id):
     # 确保域名以'@'开头'
     if not email_domain.startswith('@'):
         email_domain = '@' + email_domain
 
-    conn = get_mysql_conn()
-    with conn.cursor() as cursor:
-        # 检查域名是否存在
-        sql = "SELECT guild_domain_id FROM email_domains WHERE email_domain = %s AND guild_id = %s"
-        cursor.execute(sql, (email_domain, guild_id))
-        result = cursor.fetchone()
-        if not result:
-            return "此邮箱域名不存在。"
-        guild_domain_id = result['guild_domain_id']
-
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
-            conn.begin()
-            # 删除域名
-            sql = "DELETE FROM email_domains WHERE email_domain = %s AND guild_id = %s"
-            cursor.execute(sql, (email_domain, guild_id))
-
-            # 更新其它域名的guild_domain_id
-            sql = "UPDATE email_domains SET guild_domain_id = guild_domain_id - 1 WHERE guild_id = %s AND guild_domain_id > %s"
-            cursor.execute(sql, (guild_id, guild_domain_id))
-            conn.commit()
-    except Exception as e:
-        conn.rollback()
-        _log.error(f"发生了一个错误: {e}")
+        async with conn.cursor() as cursor:
+            # 检查域名是否存在
+            sql = "SELECT guild_domain_id FROM email_domains WHERE email_domain = %s AND guild_id = %s"
+            await cursor.execute(sql, (email_domain, guild_id))
+            result = await cursor.fetchone()
+            if not result:
+                return "此邮箱域名不存在。"
+            guild_domain_id = result['guild_domain_id']
+
+        try:
+            async with conn.cursor() as cursor:
+                await conn.begin()
+                # 删除域名
+                sql = "DELETE FROM email_domains WHERE email_domain = %s AND guild_id = %s"
+                await cursor.execute(sql, (email_domain, guild_id))
+
+                # 更新其它域名的guild_domain_id
+                sql = "UPDATE email_domains SET guild_domain_id = guild_domain_id - 1 WHERE guild_id = %s AND guild_domain_id > %s"
+                await cursor.execute(sql, (guild_id, guild_domain_id))
+                await conn.commit()
+        except Exception as e:
+            await conn.rollback()
+            _log.error(f"发生了一个错误: {e}")
     finally:
-        conn.close()
+        await conn.close()
 
     return f"邮箱域名 {email_domain} 已成功删除。"
 
 
-def clear_email_domains(guild_id):
+async def clear_email_domains(guild_id):
     sql = "DELETE FROM email_domains WHERE guild_id = %s"
-    conn = get_mysql_conn()
-    execute_sql_with_commit(conn, sql, (guild_id,))
+    conn = await get_async_mysql_conn()
+    try:
+        await execute_sql_with_commit(conn, sql, (guild_id,))
+    finally:
+        await conn.close()
 
     return "当前频道的所有邮箱域名已成功清空(未删除邮箱地址信息)。"
 
 
-def get_email_domains(guild_id):
-    conn = get_mysql_conn()
+async def get_email_domains(guild_id):
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             sql = "SELECT guild_domain_id, email_domain FROM email_domains WHERE guild_id = %s ORDER BY guild_domain_id"
-            cursor.execute(sql, (guild_id,))
-            result = cursor.fetchall()
+            await cursor.execute(sql, (guild_id,))
+            result = await cursor.fetchall()
             return [(row['guild_domain_id'], row['email_domain']) for row in result]
     except Exception as e:
         _log.error(f"发生了一个错误: {e}")
     finally:
-        conn.close()
+        await conn.close()
 
 
-def add_or_update_email_verification_role(guild_id, role_id):
-    conn = get_mysql_conn()
+async def add_or_update_email_verification_role(guild_id, role_id):
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             # 检查角色是否存在
             sql = "SELECT COUNT(*) AS count FROM email_verification_roles WHERE guild_id = %s"
-            cursor.execute(sql, (guild_id,))
-            result = cursor.fetchone()
+            await cursor.execute(sql, (guild_id,))
+            result = await cursor.fetchone()
             if result['count'] > 0:
                 # 更新角色
                 sql = "UPDATE email_verification_roles SET role = %s WHERE guild_id = %s"
-                cursor.execute(sql, (role_id, guild_id))
+                await cursor.execute(sql, (role_id, guild_id))
             else:
                 # 插入角色
                 sql = "INSERT INTO email_verification_roles (role, guild_id) VALUES (%s, %s)"
-                cursor.execute(sql, (role_id, guild_id))
-            conn.commit()
+                await cursor.execute(sql, (role_id, guild_id))
+            await conn.commit()
     except Exception as e:
         _log.error(f"发生了一个错误: {e}")
     finally:
-        conn.close()
+        await conn.close()
 
 
-def delete_email_verification_role(guild_id):
-    conn = get_mysql_conn()
+async def delete_email_verification_role(guild_id):
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             sql = "DELETE FROM email_verification_roles WHERE guild_id = %s"
-            cursor.execute(sql, (guild_id,))
-            conn.commit()
+            await cursor.execute(sql, (guild_id,))
+            await conn.commit()
     except Exception as e:
         _log.error(f"发生了一个错误: {e}")
     finally:
-        conn.close()
+        await conn.close()
 
 
-async def handle_email_verification_at_message(client, message):
-    content = message.content.strip()
-    command_parts = content.split(' ')
-    command = command_parts[2] if len(command_parts) > 2 else None
-    param = command_parts[3] if len(command_parts) > 3 else None
-
-    if command is None:
+async def handle_email_verification_at_message(client, message, command):
+    if command.action is None:
         help_text = get_help('邮箱认证')
         await reply_with_log(message, help_text)
         return
 
-    if not is_email_verification_admin_from_message(message):
+    if not await is_email_verification_admin_from_message(message):
         await reply_with_log(message, "抱歉，您没有权限执行此操作。")
         return
 
-    if command == '添加域名':
-        if param is None:
-            await reply_with_log(message, "请输入要添加的邮箱域名。")
-        else:
-            result = add_email_domain(param, message.guild_id)
-            await reply_with_log(message, result)
-    elif command == '删除域名':
-        if param is None:
-            await reply_with_log(message, "请输入要删除的邮箱域名。")
-        else:
-            result = delete_email_domain(param, message.guild_id)
-            await reply_with_log(message, result)
-    elif command == '清空域名':
-        result = clear_email_domains(message.guild_id)
+    if command.error:
+        await reply_with_log(message, command.error)
+        return
+
+    param = next(iter(command.args.values()), None)
+    if command.action == '添加域名':
+        result = await add_email_domain(param, message.guild_id)
+        await reply_with_log(message, result)
+    elif command.action == '删除域名':
+        result = await delete_email_domain(param, message.guild_id)
+        await reply_with_log(message, result)
+    elif command.action == '清空域名':
+        result = await clear_email_domains(message.guild_id)
         await reply_with_log(message, result)
-    elif command == '域名列表':
-        domains = get_email_domains(message.guild_id)
+    elif command.action == '域名列表':
+        domains = await get_email_domains(message.guild_id)
         if not domains:
             await reply_with_log(message, "当前频道没有设置邮箱域名。")
         else:
             domains_str = '\n'.join([f"{domain_id}: {domain}" for domain_id, domain in domains])
             await reply_with_log(message, f"当前频道的邮箱域名列表:\n{domains_str}")
-    elif command == '添加邮箱认证身份组':
-        if param is None:
-            await reply_with_log(message, "请输入要添加的邮箱认证身份组ID或'取消'。")
-        elif param == '取消':
-            delete_email_verification_role(message.guild_id)
+    elif command.action == '添加邮箱认证身份组':
+        if param == '取消':
+            await delete_email_verification_role(message.guild_id)
             await reply_with_log(message, "邮箱认证身份组已成功取消。")
-        elif param.isdigit():
+        else:
             guild_roles = await get_guild_roles(client, message.guild_id)
             if guild_roles is None:
                 await reply_with_log(message, "获取身份组信息时发生错误。")
@@ -237,24 +262,16 @@ async def handle_email_verification_at_message(client, message):
                 if param not in role_ids:
                     await reply_with_log(message, f"身份组 {role_name} 在当前频道中不存在，使用@机器人 /查询身份组，以查看频道身份组ID。")
                 else:
-                    add_or_update_email_verification_role(message.guild_id, param)
+                    await add_or_update_email_verification_role(message.guild_id, param)
                     await reply_with_log(message, f"邮箱认证身份组 {role_name} 已成功添加。")
+    elif command.action == '查询':
+        user_id = param
+        email_address = await get_email_address(message.guild_id, user_id)
+        if email_address is not None:
+            await post_dms_from_message_with_log(client, message, f"用户 {user_id} 的电子邮件地址是 {email_address}")
+            await reply_with_log(message, "已通过私信发送用户的电子邮件地址，请注意查看私信。")
         else:
-            await reply_with_log(message, "无法识别的命令，请检查您的输入。")
-    elif re.match(r"查询<@!\d+>", command):
-        param = re.search(r"<@!(\d+)>", command).group(1)
-        if param is None:
-            await reply_with_log(message, "请输入要查询的用户。")
-        else:
-            user_id = param
-            email_address = get_email_address(message.guild_id, user_id)
-            if email_address is not None:
-                await post_dms_from_message_with_log(client, message, f"用户 {user_id} 的电子邮件地址是 {email_address}")
-                await reply_with_log(message, "已通过私信发送用户的电子邮件地址，请注意查看私信。")
-            else:
-                await reply_with_log(message, f"未找到用户 {user_id} 的电子邮件地址。")
-    else:
-        await reply_with_log(message, "无法识别的命令，请检查您的输入。")
+            await reply_with_log(message, f"未找到用户 {user_id} 的电子邮件地址。")
 
 
 def generate_verification_code():
@@ -263,24 +280,34 @@ def generate_verification_code():
     return ''.join(random.choices(chars, k=code_length))
 
 
-def save_verification_code_to_redis(email, guild_id, author_id, code):
+async def save_verification_code_to_redis(email, guild_id, author_id, code):
     encrypted_email = encrypt_email(email)
-    redis_conn = RedisConnection().get_connection()
     guild_key_pattern = config['email_verification']['redis']['guild_key_pattern']
     key = guild_key_pattern.format(guild_id=guild_id, author_id=author_id)
-    redis_conn.hmset(key, {"email": encrypted_email, "code": code})
     if code == 'Failed':
-        redis_conn.expire(key, config['email_verification']['redis']['failed_ttl'])
+        ttl = config['email_verification']['redis']['failed_ttl']
     else:
-        redis_conn.expire(key, config['email_verification']['redis']['ttl'])
+        ttl = config['email_verification']['redis']['ttl']
+    # 写入和设置过期时间在同一个pipeline中完成
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping={"email": encrypted_email, "code": code})
+        pipe.expire(key, ttl)
+        await pipe.execute()
 
 
-def get_verification_code_from_redis(guild_id, author_id):
-    redis_conn = RedisConnection().get_connection()
+async def wait_email_sent(client, message, future, email, guild_id, author_id):
+    # 邮件最终发送失败时把验证码标记为失败，用户需要等待failed_ttl秒后重试
+    try:
+        await future
+    except EmailSendingError:
+        await save_verification_code_to_redis(email, guild_id, author_id, 'Failed')
+        await post_dms_with_log(client, message, content="验证码发送失败，请稍后重试。")
+
+
+async def get_verification_code_from_redis(guild_id, author_id):
     guild_key_pattern = config['email_verification']['redis']['guild_key_pattern']
     key = guild_key_pattern.format(guild_id=guild_id, author_id=author_id)
-    encrypted_email = redis_conn.hget(key, "email")
-    code = redis_conn.hget(key, "code")
+    encrypted_email, code = await get_async_redis().hmget(key, "email", "code")
     if encrypted_email is not None:
         encrypted_email = encrypted_email.decode('utf-8')
     if code is not None:
@@ -288,41 +315,43 @@ def get_verification_code_from_redis(guild_id, author_id):
     return encrypted_email, code
 
 
-def check_verification_code(email, guild_id, code):
-    saved_code = get_verification_code_from_redis(email, guild_id)
+async def check_verification_code(email, guild_id, code):
+    saved_code = await get_verification_code_from_redis(email, guild_id)
     return saved_code is not None and saved_code.lower() == code.lower()
 
 
-def add_email_address(email_address, guild_id, user_id):
+async def add_email_address(email_address, guild_id, user_id):
     encrypted_email_address = encrypt_email(email_address)
-    conn = get_mysql_conn()
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             sql = "SELECT COUNT(*) AS count FROM email_addresses WHERE email_address = %s AND guild_id = %s"
-            cursor.execute(sql, (encrypted_email_address, guild_id))
-            result = cursor.fetchone()
+            await cursor.execute(sql, (encrypted_email_address, guild_id))
+            result = await cursor.fetchone()
             if result['count'] > 0:
                 return "此电子邮件地址已被使用。"
         sql = "INSERT INTO email_addresses (email_address, guild_id, user_id) VALUES (%s, %s, %s)"
-        execute_sql_with_commit(conn, sql, (encrypted_email_address, guild_id, user_id))
+        await execute_sql_with_commit(conn, sql, (encrypted_email_address, guild_id, user_id))
     except Exception as e:
         _log.error(f"发生了一个错误: {e}")
+    finally:
+        await conn.close()
 
 
-def get_email_address(guild_id, user_id):
-    conn = get_mysql_conn()
+async def get_email_address(guild_id, user_id):
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             sql = "SELECT email_address FROM email_addresses WHERE guild_id = %s AND user_id = %s"
-            cursor.execute(sql, (guild_id, user_id))
-            result = cursor.fetchone()
+            await cursor.execute(sql, (guild_id, user_id))
+            result = await cursor.fetchone()
             # 对电子邮件地址进行AES解密
             email_address = decrypt_email(result['email_address']) if result else None
             return email_address
     except Exception as e:
         _log.error(f"发生了一个错误: {e}")
     finally:
-        conn.close()
+        await conn.close()
 
 
 async def handle_email_verification_direct_message(client, message: DirectMessage):
@@ -330,7 +359,7 @@ async def handle_email_verification_direct_message(client, message: DirectMessag
     author_id = message.author.id
 
     # 检查用户是否已经进行过邮箱认证
-    email_address = get_email_address(src_guild_id, author_id)
+    email_address = await get_email_address(src_guild_id, author_id)
     if email_address is not None:
         await post_dms_with_log(client, message, content="您已经完成了邮箱认证，无需重复认证。")
         return
@@ -341,7 +370,7 @@ async def handle_email_verification_direct_message(client, message: DirectMessag
 
     if command is None:
         usage = bot_features_dict.get("邮箱认证", {}).get("usage", "")
-        domains = get_email_domains(src_guild_id)
+        domains = await get_email_domains(src_guild_id)
         domains_str = '\n'.join([f"{domain_id}: {domain}" for domain_id, domain in domains])
         await post_dms_with_log(client, message, content=f"指令格式错误。正确格式为：\n{usage}\n你可以使用的邮箱域名有：\n{domains_str}")
     elif command == "开始认证":
@@ -349,18 +378,18 @@ async def handle_email_verification_direct_message(client, message: DirectMessag
         domain_id = command_parts[3] if len(command_parts) > 3 else None
         if username is None or domain_id is None:
             usage = bot_features_dict.get("邮箱认证", {}).get("usage", "")
-            domains = get_email_domains(src_guild_id)
+            domains = await get_email_domains(src_guild_id)
             domains_str = '\n'.join([f"{domain_id}: {domain}" for domain_id, domain in domains])
             await post_dms_with_log(client, message, content=f"指令格式错误。正确格式为：\n{usage}\n你可以使用的邮箱域名有：\n{domains_str}")
         else:
-            domains = get_email_domains(src_guild_id)
+            domains = await get_email_domains(src_guild_id)
             email_domain = next((domain for domain_id, domain in domains if domain_id == domain_id), None)
             if email_domain is None:
                 await post_dms_with_log(client, message, content="无法识别的域名ID，请检查您的输入。")
             else:
                 email = f"{username}{email_domain}"
-                encrypted_email, verification_code = get_verification_code_from_redis(src_guild_id, author_id)
-                ttl = RedisConnection().get_connection().ttl(f"guild_id:{src_guild_id}-author_id:{author_id}")
+                encrypted_email, verification_code = await get_verification_code_from_redis(src_guild_id, author_id)
+                ttl = await get_async_redis().ttl(f"guild_id:{src_guild_id}-author_id:{author_id}")
                 if verification_code == 'Failed':
                     await post_dms_with_log(client, message, content=f"发送失败，请{ttl}秒后重试。")
                 elif verification_code:
@@ -371,30 +400,36 @@ async def handle_email_verification_direct_message(client, message: DirectMessag
                     subject = f'【{guild_name}】QQ频道校园邮箱验证'
                     body = f'您的验证码是：{verification_code}\n\n您收到这封邮件，是因为有人在【{guild_name}】QQ频道上使用了此邮箱地址进行教育邮箱验证。如果这不是您本人的操作，或者您没有进行此操作，请忽视此邮件。同时，如果此邮件给您带来了困扰，我们深感抱歉并诚挚地向您道歉。'
                     try:
-                        send_email(email, subject, body)
-                        save_verification_code_to_redis(email, src_guild_id, author_id, verification_code)
-                        await post_dms_with_log(client, message,
-                                                content="验证码已发送到您的邮箱。请输入验证码。例如：/邮箱认证 验证码 你的验证码")
+                        # 只把邮件放入发送队列，发送在后台完成，失败时再私信通知
+                        future = enqueue_email(email, subject, body)
                     except EmailSendingError:
-                        save_verification_code_to_redis(email, src_guild_id, author_id, 'Failed')
+                        await save_verification_code_to_redis(email, src_guild_id, author_id, 'Failed')
                         await post_dms_with_log(client, message, content="验证码发送失败，请稍后重试。")
+                    else:
+                        await save_verification_code_to_redis(email, src_guild_id, author_id, verification_code)
+                        supervisor.run_in_background(wait_email_sent(client, message, future, email, src_guild_id, author_id))
+                        await post_dms_with_log(client, message,
+                                                content="验证码已发送到您的邮箱。请输入验证码。例如：/邮箱认证 验证码 你的验证码")
     elif command == "验证码":
         verification_code = command_parts[2] if len(command_parts) > 2 else None
         if verification_code is None:
             await post_dms_with_log(client, message, content="请输入验证码。例如：/邮箱认证 验证码 你的验证码")
         else:
-            encrypted_email_address, saved_code = get_verification_code_from_redis(src_guild_id, author_id)
+            encrypted_email_address, saved_code = await get_verification_code_from_redis(src_guild_id, author_id)
             if saved_code is None:
                 await post_dms_with_log(client, message,
                                         content="请先发送验证码。例如：/邮箱认证 开始认证 邮箱用户名 邮箱域名id\n如果你已经发送过验证码，可能是验证码已过期。")
             else:
                 email_address = decrypt_email(encrypted_email_address)
                 if saved_code == verification_code.upper():
-                    conn = get_mysql_conn()
-                    with conn.cursor() as cursor:
-                        sql = "SELECT role FROM email_verification_roles WHERE guild_id = %s"
-                        cursor.execute(sql, (src_guild_id,))
-                        result = cursor.fetchone()
+                    conn = await get_async_mysql_conn()
+                    try:
+                        async with conn.cursor() as cursor:
+                            sql = "SELECT role FROM email_verification_roles WHERE guild_id = %s"
+                            await cursor.execute(sql, (src_guild_id,))
+                            result = await cursor.fetchone()
+                    finally:
+                        await conn.close()
 
                     if result is None:
                         await post_dms_with_log(client, message, content="当前频道没有设置邮箱认证身份组，请联系频道管理员。")
@@ -406,7 +441,7 @@ async def handle_email_verification_direct_message(client, message: DirectMessag
                                 role_id=role_id,
                                 user_id=author_id,
                             )
-                            result = add_email_address(email_address, src_guild_id, author_id)
+                            result = await add_email_address(email_address, src_guild_id, author_id)
                             if result is not None:
                                 await post_dms_with_log(client, message, content=result)
                             else:
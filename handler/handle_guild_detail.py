@@ -6,7 +6,7 @@ from utils.send_message_with_log import reply_with_log
 
 
 async def handle_guild_detail(client, message: Message):
-    if not is_bot_admin_from_message(message):
+    if not await is_bot_admin_from_message(message):
         await reply_with_log(message, "只有机器人管理才能使用该指令。")
         return
 
@@ -1,55 +1,25 @@
 import ipaddress
-import json
 import re
 
 from botpy import get_logger
-from mcstatus import JavaServer
 
 from config import config
+from utils.command_router import Action, Arg
 from utils.get_help import get_help
-from utils.mysql_utils import get_mysql_conn
-from utils.redis_utils import RedisConnection
+from utils.mc_status import mc_status_service
+from utils.mysql_utils import get_async_mysql_conn
 from utils.roles import is_minecraft_server_admin_from_message
 from utils.send_message_with_log import reply_with_log
 
 
-# 初始化一个Redis连接
-redis_conn = RedisConnection()
-
 # 创建一个日志记录器
 _log = get_logger()
 
-
-async def query_mc_server(server):
-    # 获取一个Redis连接
-    r = redis_conn.get_connection()
-
-    # 尝试从Redis中获取服务器状态
-    try:
-        server_status = r.get(server["server_address"])
-    except Exception as e:
-        _log.error(f"从Redis中获取服务器状态失败，服务器地址：{server['server_address']}，错误信息：{str(e)}")
-        return None
-
-    if server_status is not None:
-        # 如果在Redis中找到了服务器状态，就直接返回
-        return json.loads(server_status)
-
-    # 如果在Redis中没有找到服务器状态，就查询服务器，并将结果存入Redis
-    mc_server = JavaServer.lookup(server["server_address"])
-    try:
-        status = await mc_server.async_status()
-        latency = round(status.latency, 2)
-        server_status = f"在线，玩家数：{status.players.online}/{status.players.max}，延迟：{latency} ms"
-        status_query_timeout = config['minecraft_servers']['redis']['status_query_timeout']
-        r.set(server["server_address"], json.dumps(server_status), ex=status_query_timeout)
-    except Exception as e:
-        server_status = f"离线，错误信息：{str(e)}"
-        status_query_failed_ttl = config['minecraft_servers']['redis']['status_query_failed_ttl']
-        r.set(server["server_address"], json.dumps(server_status), ex=status_query_failed_ttl)  # 设置失败状态的过期时间为1分钟
-        _log.error(f"查询服务器状态失败，服务器地址：{server['server_address']}，错误信息：{str(e)}")
-
-    return server_status
+# /mc的子命令格式，不带子命令时显示所有服务器
+MINECRAFT_SERVER_ACTIONS = [
+    Action("添加", [Arg("服务器地址"), Arg("服务器名称"), Arg("服务器简介", rest=True)]),
+    Action("删除", [Arg("服务器地址")]),
+]
 
 
 def is_valid_ip_address(address):
@@ -93,29 +63,33 @@ def is_valid_server_address(server_address):
 
 
 async def show_servers(client, message):
-    conn = get_mysql_conn()
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             sql = "SELECT `server_address`, `server_name`, `server_description` FROM `minecraft_servers` WHERE `guild_id` = %s"
-            cursor.execute(sql, (message.guild_id,))
-            servers = cursor.fetchall()
+            await cursor.execute(sql, (message.guild_id,))
+            servers = await cursor.fetchall()
     finally:
-        conn.close()
+        await conn.close()
 
     if not servers:
         help_msg = get_help('mc')  # 假设 'mc' 是你的 feature_name
         await reply_with_log(message, f"没有设置服务器。\n\n{help_msg}")
     else:
-        server_info = "\n".join(
-            [
-                f"名称: {server['server_name']}\n"
-                f"地址: {server['server_address']}\n"
-                f"描述: {server['server_description']}\n"
-                f"状态: {await query_mc_server(server)}\n"
-                f"-----------------------------------"
-                for server in servers
-            ]
-        )
+        # 所有服务器并发查询，最慢的服务器不会拖慢整条回复
+        statuses = await mc_status_service.get_statuses([server['server_address'] for server in servers])
+        server_infos = []
+        for server in servers:
+            server_info = (f"名称: {server['server_name']}\n"
+                           f"地址: {server['server_address']}\n"
+                           f"描述: {server['server_description']}\n"
+                           f"状态: {statuses[server['server_address']]}\n")
+            # 后台轮询记录的在线率和延迟趋势，不需要额外查询
+            trend = mc_status_service.get_trend(server['server_address'])
+            if trend:
+                server_info += f"趋势: {trend}\n"
+            server_infos.append(server_info + "-----------------------------------")
+        server_info = "\n".join(server_infos)
         await reply_with_log(message, server_info)
 
 
@@ -142,67 +116,58 @@ async def add_server(client, message, server_address, server_name, server_descri
         await reply_with_log(message, f"服务器描述过长。最大长度为{max_server_description_length}个字符。")
         return
 
-    conn = get_mysql_conn()
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             # 检查服务器是否已经存在
             sql = "SELECT COUNT(*) as count FROM `minecraft_servers` WHERE `server_address` = %s AND `guild_id` = %s"
-            cursor.execute(sql, (server_address, message.guild_id))
-            result = cursor.fetchone()
+            await cursor.execute(sql, (server_address, message.guild_id))
+            result = await cursor.fetchone()
             if result['count'] > 0:
                 await reply_with_log(message, "服务器已经存在。")
             else:
                 sql = "INSERT INTO `minecraft_servers` (`server_address`, `server_name`, `server_description`, `guild_id`) VALUES (%s, %s, %s, %s)"
-                cursor.execute(sql, (server_address, server_name, server_description, message.guild_id))
-                conn.commit()
+                await cursor.execute(sql, (server_address, server_name, server_description, message.guild_id))
+                await conn.commit()
                 await reply_with_log(message, "服务器添加成功。")
     finally:
-        conn.close()
+        await conn.close()
 
 
 async def delete_server(client, message, server_address):
-    conn = get_mysql_conn()
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             # 检查服务器是否存在
             sql = "SELECT COUNT(*) as count FROM `minecraft_servers` WHERE `server_address` = %s AND `guild_id` = %s"
-            cursor.execute(sql, (server_address, message.guild_id))
-            result = cursor.fetchone()
+            await cursor.execute(sql, (server_address, message.guild_id))
+            result = await cursor.fetchone()
             if result['count'] > 0:
                 sql = "DELETE FROM `minecraft_servers` WHERE `server_address` = %s AND `guild_id` = %s"
-                cursor.execute(sql, (server_address, message.guild_id))
-                conn.commit()
+                await cursor.execute(sql, (server_address, message.guild_id))
+                await conn.commit()
                 await reply_with_log(message, "服务器删除成功。")
             else:
                 await reply_with_log(message, "服务器不存在。")
     finally:
-        conn.close()
-
+        await conn.close()
 
-async def handle_minecraft_server(client, message):
-    content = message.content.strip()
-    args = content.split(" ")
 
-    if len(args) < 3:
+async def handle_minecraft_server(client, message, command):
+    if command.action is None:
         # 如果没有指定子命令，就显示所有服务器的信息
         await show_servers(client, message)
-    else:
-        subcommand = args[2]
-        if subcommand == "添加":
-            if not is_minecraft_server_admin_from_message(message):
-                await reply_with_log(message, "对不起，你没有权限执行此操作。")
-                return
-            if len(args) < 6:
-                await reply_with_log(message, "参数不足，正确的格式是：/mc 添加 服务器地址 服务器名称 服务器简介")
-            else:
-                await add_server(client, message, args[3], args[4], " ".join(args[5:]))
-        elif subcommand == "删除":
-            if not is_minecraft_server_admin_from_message(message):
-                await reply_with_log(message, "对不起，你没有权限执行此操作。")
-                return
-            if len(args) < 4:
-                await reply_with_log(message, "参数不足，正确的格式是：/mc 删除 服务器地址")
-            else:
-                await delete_server(client, message, args[3])
-        else:
-            await reply_with_log(message, "无法识别的命令，请检查您的输入。")
+        return
+
+    if not await is_minecraft_server_admin_from_message(message):
+        await reply_with_log(message, "对不起，你没有权限执行此操作。")
+        return
+    if command.error:
+        await reply_with_log(message, command.error)
+        return
+
+    if command.action == "添加":
+        await add_server(client, message, command.args["服务器地址"], command.args["服务器名称"],
+                         command.args["服务器简介"])
+    elif command.action == "删除":
+        await delete_server(client, message, command.args["服务器地址"])
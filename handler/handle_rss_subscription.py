@@ -1,35 +1,85 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import hashlib
+import heapq
 import html
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
 import pymysql
 
 import aiohttp
-import feedparser
 from botpy import get_logger
 from botpy.message import Message
-from bs4 import BeautifulSoup
 
 from config import config
 from utils.channel_utils import get_channel_name_from_redis
+from utils.command_router import Action, Arg
 from utils.get_help import bot_features_dict
 from utils.guild_utils import check_guild_authenticity
-from utils.mysql_utils import get_mysql_conn
+from utils.html_cleaner import clean_html
+from utils.http_client import get_http_session
+from utils.mysql_utils import get_async_mysql_conn
 from utils.parse_date import parse_date
-from utils.redis_utils import RedisConnection
+from utils.rss_parser import parse_feed_entries
+from utils.message_dispatcher import dispatcher
 from utils.roles import is_rss_subscription_admin_from_message
-from utils.send_message_with_log import reply_with_log, post_with_log
+from utils.send_message_with_log import reply_with_log
 from utils.time_utils import is_time_range_valid
 
 
 _log = get_logger()
 
+# /rss订阅的子命令格式
+RSS_ACTIONS = [
+    Action("添加", [Arg("URL"), Arg("自定义名称"), Arg("更新间隔")]),
+    Action("删除", [Arg("RSS源序号")]),
+    Action("列表"),
+    Action("修改更新间隔", [Arg("RSS源序号"), Arg("新的更新间隔")]),
+    Action("修改过期时间", [Arg("RSS源序号"), Arg("新的过期时间")]),
+]
+
+# 推送消息模板，custom_name为订阅时设置的名称；摘要模板用于积压时合并发送
+RSS_MESSAGE_TEMPLATE = "{custom_name}：\n{title}：\n链接：{link}\n描述：{description}"
+RSS_SUMMARY_TEMPLATE = "{custom_name}：{title} {link}"
+
+# process_feed在feed快照上更新的抓取状态，完成后同步回调度表
+FEED_STATE_FIELDS = ('etag', 'last_modified', 'content_hash', 'poll_interval', 'block_count',
+                     'update_interval_ewma', 'new_item_seen')
+
+
+def update_interval_ewma(ewma, since_new_item, new_items, alpha):
+    """
+    用本次发现的新条目更新RSS源更新间隔的指数加权移动平均（秒）。
+    since_new_item为距上次发现新条目的秒数，期间到达的new_items条平均分摊这段时间。
+    """
+    if not new_items or since_new_item is None:
+        return ewma
+    sample = since_new_item / new_items
+    if ewma is None:
+        return sample
+    return alpha * sample + (1 - alpha) * ewma
+
+
+def adaptive_poll_interval(min_interval, max_interval, ewma, since_new_item, error_count, factor):
+    """
+    根据RSS源的更新频率计算抓取间隔（分钟），结果限制在[min_interval, max_interval]之间。
+    源长时间没有新条目时，按已经等待的时间估计更新间隔，间隔逐渐拉长；抓取失败时按连续失败次数指数退避。
+    """
+    expected = max(ewma or 0, since_new_item or 0)
+    interval = max(min_interval, expected * factor / 60)
+    if error_count:
+        interval *= 2 ** min(error_count, 16)
+    return int(max(min_interval, min(interval, max_interval)))
+
 
 class RSSCrawler:
     def __init__(self, client):
         self.client = client
         self.loop = asyncio.get_event_loop()
-        self.session = aiohttp.ClientSession()
+        self.session = get_http_session()
 
         # 从配置文件中获取rss_subscription部分的配置
         self.config = config['rss_subscription']
@@ -39,202 +89,540 @@ class RSSCrawler:
         self.message_length_limit = self.config['message_length_limit']
         self.rss_fetch_timeout = self.config['rss_fetch_timeout']
         self.rss_parse_max_workers = self.config['rss_parse_max_workers']
+        self.rss_parse_mode = self.config['rss_parse_mode']
         self.rss_truncate_length = self.config['rss_truncate_length']
+        self.rss_fetch_concurrency = self.config['rss_fetch_concurrency']
+        self.rss_fetch_per_host = self.config['rss_fetch_per_host']
+        self.rss_delivery_workers = self.config['rss_delivery_workers']
+        self.rss_item_max_age = self.config['rss_item_max_age']
+        self.rss_retention_batch_size = self.config['rss_retention_batch_size']
+        self.rss_retention_interval = self.config['rss_retention_interval']
+        self.rss_description_cache_size = self.config['rss_description_cache_size']
+        self.rss_max_feed_interval = self.config['rss_max_feed_interval']
+        self.rss_adaptive_poll_factor = self.config['rss_adaptive_poll_factor']
+        self.rss_update_ewma_alpha = self.config['rss_update_ewma_alpha']
         self.time_range_start, self.time_range_end = self.config['time_range'].split('-')
-        self.message_limit_seconds = config['message_limit_seconds']
 
-        # 创建线程池
-        self.executor = ThreadPoolExecutor(max_workers=self.rss_parse_max_workers)
+        # 创建解析用的线程池或进程池
+        self.executor = self.create_parse_executor()
+
+        # 调度状态：按下次抓取时间排序的堆，以及正在处理的RSS源
+        self.feeds = {}
+        self.schedule = []
+        self.due_at = {}
+        self.in_flight = set()
+        self.tasks = set()
+
+        # 抓取并发限制和推送队列
+        self.fetch_semaphore = asyncio.Semaphore(self.rss_fetch_concurrency)
+        self.host_semaphores = {}
+        self.delivery_queue = asyncio.Queue(maxsize=self.config['rss_delivery_queue_size'])
+
+        # 发送时清理后的description，按rss_item_id缓存
+        self.description_cache = OrderedDict()
+
+        # 条件请求统计，body_sizes记录各源上次完整响应的大小，用于估算304节省的流量
+        self.body_sizes = {}
+        self.stats = {
+            "fetches": 0,
+            "not_modified": 0,
+            "unchanged": 0,
+            "parses_skipped": 0,
+            "bytes_downloaded": 0,
+            "bytes_saved": 0,
+            "fetches_per_hour_saved": 0,
+        }
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
         await self.close()
-        if self.session:
-            await self.session.close()
-            self.session = None
 
     async def close(self):
-        await self.session.close()
+        # HTTP会话是全局共享的，由main在退出时统一关闭
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def create_parse_executor(self):
+        # feedparser是纯Python实现，受GIL限制，线程池无法并行解析；
+        # process模式下在子进程中解析，只传回精简后的条目
+        if self.rss_parse_mode == 'process':
+            return ProcessPoolExecutor(max_workers=self.rss_parse_max_workers)
+        return ThreadPoolExecutor(max_workers=self.rss_parse_max_workers)
 
     @staticmethod
     def truncate_string(s, length):
         return (s[:length] + '..') if len(s) > length else s
 
     @staticmethod
-    def clean_html(raw_html):
-        soup = BeautifulSoup(raw_html, "html.parser")
-        return soup.get_text()
+    def clean_html(raw_html, max_length=None):
+        return clean_html(raw_html, max_length)
 
-    async def fetch_rss(self, session, url: str):
+    async def fetch_rss(self, session, url: str, etag=None, last_modified=None):
+        # 返回包含状态码、正文和缓存校验信息的字典，获取失败时返回None
         _log.info(f"正在从{url}获取RSS...")
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
         try:
-            async with session.get(url, timeout=self.rss_fetch_timeout) as response:  # 设置超时
-                return await response.text()
+            async with session.get(url, headers=headers, timeout=self.rss_fetch_timeout) as response:  # 设置超时
+                if response.status == 304:
+                    return {
+                        "status": 304,
+                        "body": None,
+                        "etag": response.headers.get('ETag', etag),
+                        "last_modified": response.headers.get('Last-Modified', last_modified),
+                        "content_hash": None,
+                        "size": 0,
+                    }
+                body = await response.read()
+                return {
+                    "status": response.status,
+                    "body": body,
+                    "etag": response.headers.get('ETag'),
+                    "last_modified": response.headers.get('Last-Modified'),
+                    "content_hash": hashlib.sha1(body).hexdigest(),
+                    "size": len(body),
+                }
         except (asyncio.TimeoutError, Exception) as e:
             _log.error(f"由于{str(e)}，从{url}获取RSS失败。")
             return None
 
-    async def parse_rss(self, rss_text: str):
-        return await self.loop.run_in_executor(self.executor, feedparser.parse, rss_text)
-
-    async def send_rss_item(self, client, rss_item, subscriptions):
-        if not is_time_range_valid(self.time_range_start, self.time_range_end):
-            _log.info("由于时间限制，跳过发送rss项目。")
-            return False
+    async def parse_rss(self, body: bytes):
+        # 原始字节直接交给feedparser，由它根据XML声明识别编码；返回精简后的条目列表
+        try:
+            return await self.loop.run_in_executor(self.executor, parse_feed_entries, body)
+        except BrokenProcessPool:
+            # 子进程异常退出后进程池不可再用，重建后由调用方按解析失败处理
+            _log.error("RSS解析进程池已损坏，正在重建。")
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self.create_parse_executor()
+            raise
+
+    def render_rss_item(self, rss_item):
+        # 与子频道无关的部分只渲染一次，供所有订阅共用
         title = html.unescape(rss_item['title'])
-        link = rss_item['link']
-        description = self.clean_html(html.unescape(rss_item['description']))
+        description = self.get_rss_description(rss_item)
+
+        published_date = rss_item['published_date']
+        if published_date:
+            title = f"{title} ({published_date.strftime('%Y-%m-%d %H:%M:%S')})"
+        return {"title": title, "link": rss_item['link'], "description": description}
+
+    def get_rss_description(self, rss_item):
+        # 发送时的清理结果按rss_item_id缓存，同一条目重试或补发时不再重复解析
+        rss_item_id = rss_item.get('rss_item_id')
+        description = self.description_cache.get(rss_item_id)
+        if description is not None:
+            self.description_cache.move_to_end(rss_item_id)
+            return description
+
+        description = self.clean_html(html.unescape(rss_item['description'] or ''), self.message_length_limit)
 
         # 如果description过长，只发送前半部分字符，并注明截断
         if len(description) > self.message_length_limit:
             description = description[:self.message_length_limit] + "... (内容过长，已截断，详情请点击链接查看)"
 
-        for subscription in subscriptions:
-            channel_id = subscription['channel_id']
-            custom_name = subscription['custom_name']
-            published_date = rss_item['published_date']
-            if published_date:
-                title = f"{title} ({published_date.strftime('%Y-%m-%d %H:%M:%S')})"
-            message = f"{custom_name}：\n{title}：\n链接：{link}\n描述：{description}"
-
-            # 创建Redis连接
-            redis_conn = RedisConnection()
-            conn = redis_conn.get_connection()
-
-            # 检查频道是否已经达到消息发送上限
-            key = f"msg_daily_limit:{channel_id}"
-            if not conn.exists(key):
-                try:
-                    await post_with_log(client, channel_id, message, encode_urls=True)
-                except Exception as e:
-                    if 'push channel message reach limit' in str(e):
-                        _log.error(f"消息发送达到上限：{e}")
-                        # 设置过期时间为当日23:59
-                        expire_seconds = (datetime.now().replace(hour=23, minute=59, second=59)
-                                          - datetime.now()).seconds
-                        # 如果过期时间超过config中预设的过期时间上限，则设为上限时间
-                        if expire_seconds > self.message_limit_seconds:
-                            expire_seconds = self.message_limit_seconds
-                        conn.set(key, 1, ex=expire_seconds)
-                        return False
-                    return True
-        return True
+        if rss_item_id is not None:
+            self.description_cache[rss_item_id] = description
+            if len(self.description_cache) > self.rss_description_cache_size:
+                self.description_cache.popitem(last=False)
+        return description
 
-    async def crawler(self):
-        await asyncio.sleep(10)  # 等待10秒以确保QQ机器人已启动
-        while True:
-            _log.info("爬虫正在运行...")
-            if not is_time_range_valid(self.time_range_start, self.time_range_end):
-                await asyncio.sleep(self.crawler_sleep_time)
+    async def broadcast_rss_item(self, client, rss_item, subscriptions):
+        # 渲染一次后并发交给出站调度器，每个子频道只发送一次，返回(订阅, 发送结果future)列表；
+        # 配额不足的子频道留待之后重试
+        if not is_time_range_valid(self.time_range_start, self.time_range_end):
+            _log.info("由于时间限制，跳过发送rss项目。")
+            return []
+        rendered = self.render_rss_item(rss_item)
+
+        channel_subscriptions = list({subscription['channel_id']: subscription
+                                      for subscription in subscriptions}.values())
+
+        async def submit(subscription):
+            message = RSS_MESSAGE_TEMPLATE.format(custom_name=subscription['custom_name'], **rendered)
+            summary = RSS_SUMMARY_TEMPLATE.format(custom_name=subscription['custom_name'], **rendered)
+            return await dispatcher.submit(client, subscription['channel_id'], message, summary=summary)
+
+        futures = await asyncio.gather(*[submit(subscription) for subscription in channel_subscriptions])
+        return list(zip(channel_subscriptions, futures))
+
+    async def fetch_feed(self, feed):
+        # 同一主机的并发数和总并发数都有上限，先等待主机名额，避免占用总名额空等
+        url = feed['url']
+        host = urlsplit(url).hostname or url
+        host_semaphore = self.host_semaphores.get(host)
+        if host_semaphore is None:
+            host_semaphore = self.host_semaphores[host] = asyncio.Semaphore(self.rss_fetch_per_host)
+        async with host_semaphore, self.fetch_semaphore:
+            return await self.fetch_rss(self.session, url, feed.get('etag'), feed.get('last_modified'))
+
+    def is_feed_unchanged(self, feed, result):
+        # 304或正文哈希与上次相同时无需重新解析，同时更新统计
+        rss_feed_id = feed['rss_feed_id']
+        self.stats["fetches"] += 1
+        if result['status'] == 304:
+            self.stats["not_modified"] += 1
+            self.stats["parses_skipped"] += 1
+            self.stats["bytes_saved"] += self.body_sizes.get(rss_feed_id, 0)
+            return True
+
+        self.stats["bytes_downloaded"] += result['size']
+        self.body_sizes[rss_feed_id] = result['size']
+        if result['content_hash'] == feed.get('content_hash'):
+            self.stats["unchanged"] += 1
+            self.stats["parses_skipped"] += 1
+            return True
+        return False
+
+    def schedule_feed(self, rss_feed_id, due_at):
+        # due_at以最后一次调度为准，堆中旧的条目在弹出时丢弃
+        self.due_at[rss_feed_id] = due_at
+        heapq.heappush(self.schedule, (due_at, rss_feed_id))
+
+    def pop_due_feeds(self, now):
+        due_feeds = []
+        while self.schedule and self.schedule[0][0] <= now:
+            due_at, rss_feed_id = heapq.heappop(self.schedule)
+            if self.due_at.get(rss_feed_id) != due_at:
                 continue
+            del self.due_at[rss_feed_id]
+            due_feeds.append(rss_feed_id)
+        return due_feeds
 
-            conn = None
-            try:
-                conn = get_mysql_conn()
-                with conn.cursor() as cursor:
-                    # 获取需要更新的RSS源
-                    sql = "SELECT * FROM rss_feed WHERE ADDDATE(last_updated, INTERVAL current_interval MINUTE) <= NOW() AND (block_duration IS NULL OR last_blocked IS NULL OR ADDDATE(last_blocked, INTERVAL block_duration DAY) < NOW())"
-                    cursor.execute(sql)
-                    feeds = cursor.fetchall()
-
-                    for feed in feeds:
-                        rss_feed_id = feed['rss_feed_id']
-                        url = feed['url']
-
-                        # 更新last_updated字段
-                        sql = "UPDATE rss_feed SET last_updated = NOW() WHERE rss_feed_id = %s"
-                        cursor.execute(sql, (rss_feed_id,))
-                        conn.commit()  # 提交事务
-
-                        # 获取RSS源
+    async def refresh_schedule(self):
+        # 从数据库重新加载所有RSS源的下次抓取时间，以感知新增、删除的源和间隔调整
+        conn = await get_async_mysql_conn()
+        try:
+            async with conn.cursor() as cursor:
+                sql = """SELECT rss_feed_id, url, current_interval, poll_interval, block_count, update_interval_ewma,
+                         etag, last_modified, content_hash,
+                         TIMESTAMPDIFF(SECOND, last_new_item, NOW()) AS since_new_item,
+                         TIMESTAMPDIFF(SECOND, NOW(), GREATEST(
+                             ADDDATE(last_updated, INTERVAL GREATEST(current_interval, poll_interval) MINUTE),
+                             IF(last_blocked IS NULL, last_updated, ADDDATE(last_blocked, INTERVAL block_duration DAY))
+                         )) AS due_in
+                         FROM rss_feed"""
+                await cursor.execute(sql)
+                feeds = await cursor.fetchall()
+        finally:
+            await conn.close()
+
+        now = time.monotonic()
+        self.feeds = {feed['rss_feed_id']: feed for feed in feeds}
+        self.schedule = []
+        self.due_at = {}
+        for feed in feeds:
+            # 上次发现新条目的时刻换算到单调时钟，之后在内存中计算间隔
+            since_new_item = feed.pop('since_new_item')
+            feed['new_item_seen'] = None if since_new_item is None else now - since_new_item
+            if feed['rss_feed_id'] not in self.in_flight:
+                self.schedule_feed(feed['rss_feed_id'], now + max(feed['due_in'], 0))
+
+        # 与按用户设置的间隔抓取相比，自适应间隔每小时少抓取的次数
+        self.stats["fetches_per_hour_saved"] = round(sum(
+            60 / feed['current_interval'] - 60 / self.effective_interval(feed) for feed in feeds), 1)
+        _log.info(f"RSS源调度表已更新，共{len(feeds)}个源，自适应间隔每小时节省"
+                  f"{self.stats['fetches_per_hour_saved']}次抓取。")
+
+    @staticmethod
+    def effective_interval(feed):
+        return max(feed['current_interval'], feed['poll_interval'])
+
+    def update_poll_interval(self, feed, success, new_items, now):
+        # 根据本次抓取结果更新feed中的更新频率、失败次数和抓取间隔
+        since_new_item = None if feed['new_item_seen'] is None else now - feed['new_item_seen']
+        if success:
+            feed['block_count'] = 0
+            feed['update_interval_ewma'] = update_interval_ewma(
+                feed['update_interval_ewma'], since_new_item, new_items, self.rss_update_ewma_alpha)
+            # 从未发现过新条目的源从本次抓取开始计时，长期不更新的源同样可以拉长间隔
+            if new_items or feed['new_item_seen'] is None:
+                feed['new_item_seen'] = now
+                since_new_item = 0
+        else:
+            feed['block_count'] += 1
+        feed['poll_interval'] = adaptive_poll_interval(
+            feed['current_interval'], self.rss_max_feed_interval, feed['update_interval_ewma'], since_new_item,
+            feed['block_count'], self.rss_adaptive_poll_factor)
+        return feed['poll_interval']
+
+    async def record_fetch_result(self, feed, success, result=None, new_items=0):
+        # 保存抓取结果，并根据更新频率和失败次数重新计算抓取间隔，内存中的feed同步更新
+        rss_feed_id = feed['rss_feed_id']
+        self.update_poll_interval(feed, success, new_items, time.monotonic())
+        ewma = feed['update_interval_ewma']
+        ewma = None if ewma is None else int(ewma)
+
+        conn = await get_async_mysql_conn()
+        try:
+            async with conn.cursor() as cursor:
+                if success:
+                    # 访问成功，重置block_count和last_blocked，并保存下次条件请求需要的校验信息
+                    sql = """UPDATE rss_feed SET last_updated = NOW(), block_count = 0, last_blocked = NULL,
+                             etag = %s, last_modified = %s, content_hash = COALESCE(%s, content_hash),
+                             poll_interval = %s, update_interval_ewma = %s,
+                             last_new_item = IF(%s, NOW(), COALESCE(last_new_item, NOW()))
+                             WHERE rss_feed_id = %s"""
+                    await cursor.execute(sql, (result['etag'], result['last_modified'], result['content_hash'],
+                                               feed['poll_interval'], ewma, new_items > 0, rss_feed_id))
+                else:
+                    # 访问被屏蔽，更新block_count和last_blocked，抓取间隔按失败次数退避
+                    sql = """UPDATE rss_feed SET last_updated = NOW(), block_count = block_count + 1,
+                             last_blocked = NOW(), poll_interval = %s WHERE rss_feed_id = %s"""
+                    await cursor.execute(sql, (feed['poll_interval'], rss_feed_id))
+            await conn.commit()  # 提交事务
+        finally:
+            await conn.close()
+
+    async def save_rss_items(self, rss_feed_id, entries):
+        # 按截断后的链接去重，整个源只查询一次已有链接、批量插入并提交一次
+        entries_by_link = {}
+        for rss_item in entries:
+            link = self.truncate_string(rss_item['link'], self.rss_truncate_length)
+            entries_by_link.setdefault(link, rss_item)
+        if not entries_by_link:
+            return 0
+
+        conn = await get_async_mysql_conn()
+        try:
+            async with conn.cursor() as cursor:
+                links = list(entries_by_link)
+                sql = f"SELECT link FROM rss_item WHERE link IN ({', '.join(['%s'] * len(links))})"
+                await cursor.execute(sql, links)
+                existing_links = {row['link'] for row in await cursor.fetchall()}
+
+                new_items = []
+                for link, rss_item in entries_by_link.items():
+                    if link in existing_links:
+                        continue
+                    published_date_str = rss_item.get('published', None)
+                    published_date = None  # 默认为None
+                    if published_date_str:
                         try:
-                            rss_text = await self.fetch_rss(self.session, url)
-                            try:
-                                rss_data = await self.loop.run_in_executor(self.executor, feedparser.parse, rss_text)
-                            except Exception as e:
-                                _log.error(f"解析RSS源时发生错误：{e}")
-                                # 访问被屏蔽，更新block_count和last_blocked
-                                sql = "UPDATE rss_feed SET block_count = block_count + 1, last_blocked = NOW() WHERE rss_feed_id = %s"
-                                cursor.execute(sql, (rss_feed_id,))
-                                conn.commit()  # 提交事务
-                                continue
-
-                            # 访问成功，重置block_count和last_blocked
-                            sql = "UPDATE rss_feed SET block_count = 0, last_blocked = NULL WHERE rss_feed_id = %s"
-                            cursor.execute(sql, (rss_feed_id,))
-                            conn.commit()  # 提交事务
-
-                            # 保存新的RSS项
-                            for rss_item in rss_data.entries:
-                                link = rss_item['link']
-                                sql = "SELECT * FROM rss_item WHERE link = %s"
-                                cursor.execute(sql, (link,))
-                                result = cursor.fetchone()
-                                if not result:
-                                    published_date_str = rss_item.get('published', None)
-                                    published_date = None  # 默认为None
-                                    if published_date_str:
-                                        try:
-                                            published_date = parse_date(published_date_str)
-                                        except ValueError as e:
-                                            _log.error(f"解析日期时间时发生错误：{e}")
-                                    title = self.truncate_string(rss_item['title'], self.rss_truncate_length)
-                                    link = self.truncate_string(rss_item['link'], self.rss_truncate_length)
-
-                                    # 清除description中的HTML标签
-                                    description = self.clean_html(rss_item.get('description', ''))
-
-                                    # 如果description长度超过限制，则只保存前面的部分
-                                    if len(description) > 1000:
-                                        description = description[:1000]
-
-                                    sql = "INSERT INTO rss_item (rss_feed_id, title, link, description, published_date) VALUES (%s, %s, %s, %s, %s)"
-                                    cursor.execute(sql, (
-                                        rss_feed_id, title, link, description, published_date))
-                                    conn.commit()  # 提交事务
-
-                        except Exception as e:
-                            _log.error(f"获取RSS源时发生错误：{e}")
-                            # 访问被屏蔽，更新block_count和last_blocked
-                            sql = "UPDATE rss_feed SET block_count = block_count + 1, last_blocked = NOW() WHERE rss_feed_id = %s"
-                            cursor.execute(sql, (rss_feed_id,))
-                            conn.commit()  # 提交事务
+                            published_date = parse_date(published_date_str)
+                        except ValueError as e:
+                            _log.error(f"解析日期时间时发生错误：{e}")
+                    # 超过保留期限的条目不会再被推送，也会被定期清理，不再保存
+                    if published_date:
+                        cutoff = datetime.now(published_date.tzinfo) - timedelta(days=self.rss_item_max_age)
+                        if published_date < cutoff:
                             continue
+                    title = self.truncate_string(rss_item['title'], self.rss_truncate_length)
+
+                    # 清除description中的HTML标签，长度超过限制时只保存前面的部分，超出部分不再解析
+                    description = self.clean_html(rss_item.get('description', ''), 1000)[:1000]
+
+                    new_items.append((rss_feed_id, title, link, description, published_date))
+
+                if new_items:
+                    sql = "INSERT INTO rss_item (rss_feed_id, title, link, description, published_date) VALUES (%s, %s, %s, %s, %s)"
+                    await cursor.executemany(sql, new_items)
+            await conn.commit()  # 提交事务
+            return len(new_items)
+        except Exception:
+            await conn.rollback()
+            raise
+        finally:
+            await conn.close()
+
+    async def process_feed(self, feed):
+        # 抓取、解析、入库一个RSS源，成功后交给推送阶段
+        rss_feed_id = feed['rss_feed_id']
+        try:
+            result = await self.fetch_feed(feed)
+            if result is None:
+                await self.record_fetch_result(feed, success=False)
+                return
+
+            if self.is_feed_unchanged(feed, result):
+                _log.info(f"RSS源{rss_feed_id}没有变化，跳过解析。")
+                await self.record_fetch_result(feed, success=True, result=result)
+            else:
+                try:
+                    entries = await self.parse_rss(result['body'])
+                except Exception as e:
+                    _log.error(f"解析RSS源时发生错误：{e}")
+                    await self.record_fetch_result(feed, success=False)
+                    return
+
+                # 先保存条目再记录抓取结果，保存失败时内容哈希不会更新，下次抓取会重新解析
+                new_items = await self.save_rss_items(rss_feed_id, entries)
+                await self.record_fetch_result(feed, success=True, result=result, new_items=new_items)
 
-                        # 获取RSS源的订阅
-                        sql = "SELECT * FROM rss_subscription WHERE rss_feed_id = %s"
-                        cursor.execute(sql, (rss_feed_id,))
-                        subscriptions = cursor.fetchall()
-
-                        # 发送新的RSS项
-                        sql = "SELECT * FROM rss_item WHERE rss_feed_id = %s AND rss_item_id NOT IN (SELECT rss_item_id FROM rss_item_delivery WHERE channel_id = %s) AND DATE_ADD(published_date, INTERVAL %s DAY) >= NOW()"
-                        for subscription in subscriptions:
-                            cursor.execute(sql, (rss_feed_id, subscription['channel_id'], subscription['max_age']))
-                            rss_items = cursor.fetchall()
-                            for rss_item in rss_items:
-                                sql = "SELECT rss_item_id FROM rss_item WHERE rss_item_id = %s"
-                                cursor.execute(sql, (rss_item['rss_item_id'],))
-                                if cursor.fetchone() is None:
-                                    _log.error("rss_item_id does not exist in rss_item table.")
-                                    continue
-                                if await self.send_rss_item(self.client, rss_item, subscriptions):
-                                    sql = "INSERT INTO rss_item_delivery (rss_item_id, guild_id, channel_id) VALUES (%s, %s, %s)"
-                                    cursor.execute(sql, (
-                                        rss_item['rss_item_id'], subscription['guild_id'], subscription['channel_id']))
-                                    conn.commit()  # 提交事务
+            # 同步内存中的校验信息，下次抓取时无需等待调度表刷新
+            feed['etag'] = result['etag']
+            feed['last_modified'] = result['last_modified']
+            feed['content_hash'] = result['content_hash'] or feed.get('content_hash')
 
+            # 源没有变化时仍然执行推送，新增的订阅可以收到已保存的RSS项；推送队列已满时在此等待
+            await self.delivery_queue.put(rss_feed_id)
+        except Exception as e:
+            _log.error(f"获取RSS源时发生错误：{e}")
+        finally:
+            # 把抓取状态同步回当前的调度表，任务执行期间调度表可能已被refresh_schedule替换
+            current = self.feeds.get(rss_feed_id)
+            if current is not None:
+                current.update({field: feed[field] for field in FEED_STATE_FIELDS})
+                feed = current
+            self.in_flight.discard(rss_feed_id)
+            self.schedule_feed(rss_feed_id, time.monotonic() + self.effective_interval(feed) * 60)
+
+    async def plan_deliveries(self, rss_feed_id):
+        # 一次反连接查询出该源所有尚未推送的(RSS项, 订阅)组合，按RSS项分组
+        conn = await get_async_mysql_conn()
+        try:
+            async with conn.cursor() as cursor:
+                sql = """SELECT i.rss_item_id, i.title, i.link, i.description, i.published_date,
+                         s.guild_id, s.channel_id, s.custom_name
+                         FROM rss_subscription s
+                         JOIN rss_item i ON i.rss_feed_id = s.rss_feed_id
+                             AND DATE_ADD(i.published_date, INTERVAL s.max_age DAY) >= NOW()
+                         LEFT JOIN rss_item_delivery d ON d.rss_item_id = i.rss_item_id AND d.channel_id = s.channel_id
+                         WHERE s.rss_feed_id = %s AND d.rss_item_delivery_id IS NULL
+                         ORDER BY i.published_date, i.rss_item_id"""
+                await cursor.execute(sql, (rss_feed_id,))
+                rows = await cursor.fetchall()
+        finally:
+            await conn.close()
+
+        plan = {}
+        for row in rows:
+            rss_item, subscriptions = plan.setdefault(row['rss_item_id'], (row, []))
+            subscriptions.append({
+                'guild_id': row['guild_id'],
+                'channel_id': row['channel_id'],
+                'custom_name': row['custom_name'],
+            })
+        return list(plan.values())
+
+    async def record_deliveries(self, deliveries):
+        if not deliveries:
+            return
+        conn = await get_async_mysql_conn()
+        try:
+            async with conn.cursor() as cursor:
+                sql = "INSERT INTO rss_item_delivery (rss_item_id, guild_id, channel_id) VALUES (%s, %s, %s)"
+                await cursor.executemany(sql, deliveries)
+            await conn.commit()  # 提交事务
+        finally:
+            await conn.close()
+
+    async def deliver_feed(self, rss_feed_id):
+        # 推送期间不占用数据库连接，先把所有RSS项交给调度器，便于同一子频道的积压合并为摘要，
+        # 全部发送完成后一次性写入推送记录
+        pending = []
+        try:
+            for rss_item, subscriptions in await self.plan_deliveries(rss_feed_id):
+                for subscription, future in await self.broadcast_rss_item(self.client, rss_item, subscriptions):
+                    pending.append((rss_item, subscription, future))
+        finally:
+            # 中途出错时也要等待已经交给调度器的消息，并记录所有发送成功的部分，避免重复推送
+            results = await asyncio.gather(*[future for _, _, future in pending], return_exceptions=True)
+            deliveries = [(rss_item['rss_item_id'], subscription['guild_id'], subscription['channel_id'])
+                          for (rss_item, subscription, _), result in zip(pending, results) if result is True]
+            await self.record_deliveries(deliveries)
+
+    async def prune_rss_items(self):
+        # 分批删除超过rss_item_max_age天的RSS项及其推送记录，每批单独提交，避免长时间锁表
+        deleted = 0
+        while True:
+            conn = await get_async_mysql_conn()
+            try:
+                async with conn.cursor() as cursor:
+                    sql = """SELECT rss_item_id FROM rss_item
+                             WHERE COALESCE(published_date, created_at) < NOW() - INTERVAL %s DAY
+                             LIMIT %s"""
+                    await cursor.execute(sql, (self.rss_item_max_age, self.rss_retention_batch_size))
+                    rss_item_ids = [row['rss_item_id'] for row in await cursor.fetchall()]
+                    if not rss_item_ids:
+                        break
+
+                    placeholders = ", ".join(["%s"] * len(rss_item_ids))
+                    await cursor.execute(f"DELETE FROM rss_item_delivery WHERE rss_item_id IN ({placeholders})",
+                                         rss_item_ids)
+                    await cursor.execute(f"DELETE FROM rss_item WHERE rss_item_id IN ({placeholders})", rss_item_ids)
+                await conn.commit()  # 提交事务
+            except Exception:
+                await conn.rollback()
+                raise
+            finally:
+                await conn.close()
+
+            deleted += len(rss_item_ids)
+            if len(rss_item_ids) < self.rss_retention_batch_size:
+                break
+            await asyncio.sleep(0)
+        if deleted:
+            _log.info(f"已清理{deleted}条过期的RSS项。")
+        return deleted
+
+    async def retention_worker(self):
+        while True:
+            try:
+                await self.prune_rss_items()
+            except Exception as e:
+                _log.error(f"清理过期RSS项时发生错误：{e}")
+            await asyncio.sleep(self.rss_retention_interval)
+
+    async def delivery_worker(self):
+        while True:
+            rss_feed_id = await self.delivery_queue.get()
+            try:
+                await self.deliver_feed(rss_feed_id)
+            except Exception as e:
+                _log.error(f"推送RSS项目时发生错误：{e}")
             finally:
-                if conn:
-                    conn.close()
-                _log.info("爬虫运行结束")
-                await asyncio.sleep(self.crawler_sleep_time)
+                self.delivery_queue.task_done()
+
+    async def crawler(self):
+        await asyncio.sleep(10)  # 等待10秒以确保QQ机器人已启动
+        workers = [asyncio.create_task(self.delivery_worker()) for _ in range(self.rss_delivery_workers)]
+        workers.append(asyncio.create_task(self.retention_worker()))
+        next_refresh = 0
+        try:
+            while True:
+                now = time.monotonic()
+                # 定期从数据库同步调度表，其余时间只按堆顶的到期时间唤醒
+                if now >= next_refresh:
+                    try:
+                        await self.refresh_schedule()
+                    except Exception as e:
+                        _log.error(f"加载RSS源调度表时发生错误：{e}")
+                    next_refresh = now + self.crawler_sleep_time
+
+                if not is_time_range_valid(self.time_range_start, self.time_range_end):
+                    await asyncio.sleep(self.crawler_sleep_time)
+                    continue
+
+                due_feeds = self.pop_due_feeds(now)
+                if due_feeds:
+                    _log.info(f"爬虫正在抓取{len(due_feeds)}个RSS源...")
+                for rss_feed_id in due_feeds:
+                    feed = self.feeds.get(rss_feed_id)
+                    if feed is None:
+                        continue
+                    self.in_flight.add(rss_feed_id)
+                    # 任务使用feed的快照，refresh_schedule在任务执行期间替换self.feeds时互不影响
+                    task = asyncio.create_task(self.process_feed(dict(feed)))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+
+                # 睡到下一个RSS源到期或下次同步调度表
+                wake_at = min(self.schedule[0][0], next_refresh) if self.schedule else next_refresh
+                await asyncio.sleep(max(wake_at - time.monotonic(), 1))
+        finally:
+            for worker in workers:
+                worker.cancel()
+            for task in list(self.tasks):
+                task.cancel()
 
 
 class RSSSystem:
     def __init__(self):
-        self.conn = get_mysql_conn()
         # 从配置文件中获取rss_subscription部分的配置
         self.config = config['rss_subscription']
         self.rss_item_max_age = self.config['rss_item_max_age']
@@ -251,11 +639,12 @@ class RSSSystem:
         interval = int(interval)
 
         # 检查当前频道的 RSS 源数量是否已达到上限
+        conn = await get_async_mysql_conn()
         try:
-            with self.conn.cursor() as cursor:
+            async with conn.cursor() as cursor:
                 sql = "SELECT COUNT(*) AS count FROM rss_subscription WHERE guild_id = %s"
-                cursor.execute(sql, (message.guild_id,))
-                result = cursor.fetchone()
+                await cursor.execute(sql, (message.guild_id,))
+                result = await cursor.fetchone()
                 if result['count'] >= self.max_feeds_per_channel:
                     await reply_with_log(message, f"当前频道的 RSS 源数量已达到上限（{self.max_feeds_per_channel}个）。")
                     return
@@ -263,21 +652,27 @@ class RSSSystem:
             _log.error(f"检查 RSS 源数量时发生错误：{e}")
             await reply_with_log(message, "检查 RSS 源数量时发生错误。")
             return
+        finally:
+            await conn.close()
 
         # 检查当前频道的子频道数量是否已达到上限
         try:
-            with self.conn.cursor() as cursor:
-                sql = "SELECT channel_id FROM rss_subscription WHERE guild_id = %s GROUP BY channel_id"
-                cursor.execute(sql, (message.guild_id,))
-                channels = cursor.fetchall()
-                channel_ids = [channel['channel_id'] for channel in channels]
-                if len(channel_ids) >= self.max_channels_per_guild and message.channel_id not in channel_ids:
-                    channel_names = ", ".join(
-                        [await get_channel_name_from_redis(client, message.guild_id, channel_id) for channel_id in
-                         channel_ids])
-                    await reply_with_log(message,
-                                         f"当前频道的子频道数量已达到上限（{self.max_channels_per_guild}个）。请在机器人-管理-机器人推送设置中添加{channel_names}三个子频道，否则推送将无法正常发送。")
-                    return
+            conn = await get_async_mysql_conn()
+            try:
+                async with conn.cursor() as cursor:
+                    sql = "SELECT channel_id FROM rss_subscription WHERE guild_id = %s GROUP BY channel_id"
+                    await cursor.execute(sql, (message.guild_id,))
+                    channels = await cursor.fetchall()
+            finally:
+                await conn.close()
+            channel_ids = [channel['channel_id'] for channel in channels]
+            if len(channel_ids) >= self.max_channels_per_guild and message.channel_id not in channel_ids:
+                channel_names = ", ".join(
+                    [await get_channel_name_from_redis(client, message.guild_id, channel_id) for channel_id in
+                     channel_ids])
+                await reply_with_log(message,
+                                     f"当前频道的子频道数量已达到上限（{self.max_channels_per_guild}个）。请在机器人-管理-机器人推送设置中添加{channel_names}三个子频道，否则推送将无法正常发送。")
+                return
         except Exception as e:
             _log.error(f"检查子频道数量时发生错误：{e}")
             await reply_with_log(message, "检查子频道数量时发生错误。")
@@ -293,31 +688,31 @@ class RSSSystem:
         # 检查URL是否有效
         try:
             timeout = aiohttp.ClientTimeout(total=config["rss_subscription"]["rss_fetch_timeout"])  # 设置超时时间
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        await reply_with_log(message, "无法访问RSS源，请检查URL是否正确。")
-                        return
+            async with get_http_session().get(url, timeout=timeout) as response:
+                if response.status != 200:
+                    await reply_with_log(message, "无法访问RSS源，请检查URL是否正确。")
+                    return
         except Exception as e:
             _log.error(f"无法访问RSS源，错误信息：{e}")
             await reply_with_log(message, "无法访问RSS源。")
             return
 
         # 将RSS源添加到数据库
+        conn = await get_async_mysql_conn()
         try:
             # 开始事务
-            with self.conn.cursor() as cursor:
-                self.conn.begin()
+            async with conn.cursor() as cursor:
+                await conn.begin()
                 sql = "SELECT rss_feed_id, system_min_interval FROM rss_feed WHERE url = %s"
-                cursor.execute(sql, (url,))
-                result = cursor.fetchone()
+                await cursor.execute(sql, (url,))
+                result = await cursor.fetchone()
                 if result:
                     rss_feed_id = result['rss_feed_id']
                     system_min_interval = result['system_min_interval']
                 else:
                     sql = "INSERT INTO rss_feed (url, system_min_interval, current_interval) VALUES (%s, %s, %s)"
                     system_min_interval = self.min_feed_interval
-                    cursor.execute(sql, (url, system_min_interval, interval))
+                    await cursor.execute(sql, (url, system_min_interval, interval))
                     rss_feed_id = cursor.lastrowid
 
                 if interval < system_min_interval:
@@ -328,22 +723,22 @@ class RSSSystem:
 
                 # 获取当前guild_id下最大的guild_rss_subscription_id
                 sql = "SELECT MAX(guild_rss_subscription_id) AS max_id FROM rss_subscription WHERE guild_id = %s"
-                cursor.execute(sql, (message.guild_id,))
-                result = cursor.fetchone()
+                await cursor.execute(sql, (message.guild_id,))
+                result = await cursor.fetchone()
                 if result['max_id']:
                     guild_rss_subscription_id = result['max_id'] + 1
                 else:
                     guild_rss_subscription_id = 1
 
                 sql = "INSERT INTO rss_subscription (guild_id, channel_id, rss_feed_id, custom_name, user_min_interval, guild_rss_subscription_id) VALUES (%s, %s, %s, %s, %s, %s)"
-                cursor.execute(sql, (
+                await cursor.execute(sql, (
                     message.guild_id, message.channel_id, rss_feed_id, name, interval, guild_rss_subscription_id))
 
                 # 更新rss_feed的current_interval为当前rss_feed的user_min_interval的最小值
                 sql = "UPDATE rss_feed SET current_interval = (SELECT MIN(user_min_interval) FROM rss_subscription WHERE rss_feed_id = %s) WHERE rss_feed_id = %s"
-                cursor.execute(sql, (rss_feed_id, rss_feed_id))
+                await cursor.execute(sql, (rss_feed_id, rss_feed_id))
 
-                self.conn.commit()
+                await conn.commit()
         except pymysql.err.IntegrityError as e:
             if e.args[0] == 1062:  # 重复的RSS源
                 await reply_with_log(message, f"RSS源：{name} 已经在当前频道订阅过了。")
@@ -351,10 +746,12 @@ class RSSSystem:
             else:
                 raise
         except Exception as e:
-            self.conn.rollback()
+            await conn.rollback()
             _log.error(f"添加RSS源时发生错误：{e}")
             await reply_with_log(message, "添加RSS源时发生错误。")
             return
+        finally:
+            await conn.close()
 
         await reply_with_log(message, f"成功添加RSS源：{name}{interval_message}。建议在机器人-管理-机器人推送设置中设置单个子频道推送上限为99条每天")
 
@@ -367,12 +764,13 @@ class RSSSystem:
         guild_rss_subscription_id = int(guild_rss_subscription_id)
 
         # 从数据库中删除RSS源
+        conn = await get_async_mysql_conn()
         try:
-            with self.conn.cursor() as cursor:
+            async with conn.cursor() as cursor:
                 # 先判断是否存在该guild_rss_subscription_id
                 sql = "SELECT custom_name FROM rss_subscription WHERE guild_rss_subscription_id = %s AND guild_id = %s"
-                cursor.execute(sql, (guild_rss_subscription_id, message.guild_id))
-                result = cursor.fetchone()
+                await cursor.execute(sql, (guild_rss_subscription_id, message.guild_id))
+                result = await cursor.fetchone()
                 if not result:
                     await reply_with_log(message, f"RSS源编号：{guild_rss_subscription_id} 在当前频道未找到。")
                     return
@@ -380,34 +778,39 @@ class RSSSystem:
 
                 # 删除rss_subscription
                 sql = "DELETE FROM rss_subscription WHERE guild_rss_subscription_id = %s AND guild_id = %s"
-                cursor.execute(sql, (guild_rss_subscription_id, message.guild_id))
+                await cursor.execute(sql, (guild_rss_subscription_id, message.guild_id))
 
                 # 更新所有guild_rss_subscription_id大于被删除项的rss_subscription的guild_rss_subscription_id，将其减1
                 sql = "UPDATE rss_subscription SET guild_rss_subscription_id = guild_rss_subscription_id - 1 WHERE guild_id = %s AND guild_rss_subscription_id > %s"
-                cursor.execute(sql, (message.guild_id, guild_rss_subscription_id))
-            self.conn.commit()
+                await cursor.execute(sql, (message.guild_id, guild_rss_subscription_id))
+            await conn.commit()
         except Exception as e:
-            self.conn.rollback()
+            await conn.rollback()
             _log.error(f"删除RSS源时发生错误：{e}")
             await reply_with_log(message, "删除RSS源时发生错误。")
             return
+        finally:
+            await conn.close()
 
         await reply_with_log(message, f"成功删除RSS源：{custom_name}")
 
     async def list_feeds(self, client, message: Message):
         # 从数据库中获取当前频道订阅的所有RSS源并发送给用户
+        conn = await get_async_mysql_conn()
         try:
-            with self.conn.cursor() as cursor:
+            async with conn.cursor() as cursor:
                 sql = """SELECT rss_subscription.guild_rss_subscription_id, rss_subscription.custom_name, rss_feed.url, rss_subscription.user_min_interval, rss_subscription.max_age, rss_subscription.channel_id 
                          FROM rss_subscription 
                          LEFT JOIN rss_feed ON rss_subscription.rss_feed_id = rss_feed.rss_feed_id 
                          WHERE rss_subscription.guild_id = %s"""
-                cursor.execute(sql, (message.guild_id,))
-                feeds = cursor.fetchall()
+                await cursor.execute(sql, (message.guild_id,))
+                feeds = await cursor.fetchall()
         except Exception as e:
             _log.error(f"获取RSS源列表时发生错误：{e}")
             await reply_with_log(message, "获取RSS源列表时发生错误。")
             return
+        finally:
+            await conn.close()
 
         if feeds:
             reply = "当前订阅的RSS源：\n"
@@ -430,12 +833,13 @@ class RSSSystem:
         new_interval = int(new_interval)
 
         # 更新数据库中的user_min_interval
+        conn = await get_async_mysql_conn()
         try:
-            with self.conn.cursor() as cursor:
+            async with conn.cursor() as cursor:
                 # 先判断是否存在该guild_rss_subscription_id
                 sql = "SELECT rss_feed_id, custom_name FROM rss_subscription WHERE guild_rss_subscription_id = %s AND guild_id = %s"
-                cursor.execute(sql, (guild_rss_subscription_id, message.guild_id))
-                result = cursor.fetchone()
+                await cursor.execute(sql, (guild_rss_subscription_id, message.guild_id))
+                result = await cursor.fetchone()
                 if not result:
                     await reply_with_log(message, f"RSS源编号：{guild_rss_subscription_id} 在当前频道未找到。")
                     return
@@ -443,8 +847,8 @@ class RSSSystem:
                 rss_feed_id = result['rss_feed_id']
 
                 sql = "SELECT system_min_interval FROM rss_feed WHERE rss_feed_id = %s"
-                cursor.execute(sql, (rss_feed_id,))
-                result = cursor.fetchone()
+                await cursor.execute(sql, (rss_feed_id,))
+                result = await cursor.fetchone()
                 system_min_interval = result['system_min_interval']
 
                 if new_interval < system_min_interval:
@@ -454,17 +858,19 @@ class RSSSystem:
                     interval_message = ""
 
                 sql = "UPDATE rss_subscription SET user_min_interval = %s WHERE guild_rss_subscription_id = %s AND guild_id = %s"
-                cursor.execute(sql, (new_interval, guild_rss_subscription_id, message.guild_id))
+                await cursor.execute(sql, (new_interval, guild_rss_subscription_id, message.guild_id))
 
                 # 更新rss_feed的current_interval为当前rss_feed的user_min_interval的最小值
                 sql = "UPDATE rss_feed SET current_interval = (SELECT MIN(user_min_interval) FROM rss_subscription WHERE rss_feed_id = %s) WHERE rss_feed_id = %s"
-                cursor.execute(sql, (rss_feed_id, rss_feed_id))
-            self.conn.commit()
+                await cursor.execute(sql, (rss_feed_id, rss_feed_id))
+            await conn.commit()
         except Exception as e:
-            self.conn.rollback()
+            await conn.rollback()
             _log.error(f"更新RSS源更新间隔时发生错误：{e}")
             await reply_with_log(message, "更新RSS源更新间隔时发生错误。")
             return
+        finally:
+            await conn.close()
 
         await reply_with_log(message, f"成功更新RSS源：{custom_name} 的更新间隔为 {new_interval}分钟{interval_message}")
 
@@ -483,72 +889,59 @@ class RSSSystem:
         new_expiration = int(new_expiration)
 
         # 更新数据库中的max_age
+        conn = await get_async_mysql_conn()
         try:
-            with self.conn.cursor() as cursor:
+            async with conn.cursor() as cursor:
                 # 先判断是否存在该guild_rss_subscription_id
                 sql = "SELECT custom_name FROM rss_subscription WHERE guild_rss_subscription_id = %s AND guild_id = %s"
-                cursor.execute(sql, (guild_rss_subscription_id, message.guild_id))
-                result = cursor.fetchone()
+                await cursor.execute(sql, (guild_rss_subscription_id, message.guild_id))
+                result = await cursor.fetchone()
                 if not result:
                     await reply_with_log(message, f"RSS源编号：{guild_rss_subscription_id} 在当前频道未找到。")
                     return
                 custom_name = result['custom_name']
 
                 sql = "UPDATE rss_subscription SET max_age = %s WHERE guild_rss_subscription_id = %s AND guild_id = %s"
-                cursor.execute(sql, (new_expiration, guild_rss_subscription_id, message.guild_id))
-            self.conn.commit()
+                await cursor.execute(sql, (new_expiration, guild_rss_subscription_id, message.guild_id))
+            await conn.commit()
         except Exception as e:
-            self.conn.rollback()
+            await conn.rollback()
             _log.error(f"更新RSS源过期时间时发生错误：{e}")
             await reply_with_log(message, "更新RSS源过期时间时发生错误。")
             return
+        finally:
+            await conn.close()
 
         await reply_with_log(message, f"成功更新RSS源：{custom_name} 的过期时间为 {new_expiration}天")
 
-    async def on_command(self, client, message: Message):
+    async def on_command(self, client, message: Message, command):
         guild_id = message.guild_id
-        if not check_guild_authenticity(guild_id):
+        if not await check_guild_authenticity(guild_id):
             await reply_with_log(message, content="当前功能存在安全隐患，请在我的官方频道【小千校园助手】中认证后使用")
             return
-        if not is_rss_subscription_admin_from_message(message):
+        if not await is_rss_subscription_admin_from_message(message):
             await reply_with_log(message, "只有rss订阅管理才能使用该指令。")
             return
 
-        content = message.content.strip()
-        command_parts = content.split()
-        if len(command_parts) < 3:
+        if command.action is None:
             usage = bot_features_dict.get("rss订阅", {}).get("usage", "")
             await reply_with_log(message, f"请提供指令。使用方法：\n{usage}")
             return
+        if command.error:
+            await reply_with_log(message, command.error)
+            return
 
-        action = command_parts[2]
-        if action == "添加":
-            if len(command_parts) != 6:
-                await reply_with_log(message, "添加RSS源的指令格式应为：添加 [URL] [自定义名称] [更新间隔]")
-                return
-            await self.add_feed(client, message, command_parts[3], command_parts[4], command_parts[5])
-        elif action == "删除":
-            if len(command_parts) != 4:
-                await reply_with_log(message, "删除RSS源的指令格式应为：删除 [RSS源序号]")
-                return
-            await self.remove_feed(client, message, command_parts[3])
-        elif action == "列表":
-            if len(command_parts) != 3:
-                await reply_with_log(message, "查看RSS源列表的指令格式应为：列表")
-                return
+        args = command.args
+        if command.action == "添加":
+            await self.add_feed(client, message, args["URL"], args["自定义名称"], args["更新间隔"])
+        elif command.action == "删除":
+            await self.remove_feed(client, message, args["RSS源序号"])
+        elif command.action == "列表":
             await self.list_feeds(client, message)
-        elif action == "修改更新间隔":
-            if len(command_parts) != 5:
-                await reply_with_log(message, "修改更新间隔的指令格式应为：修改更新间隔 [RSS源序号] [新的更新间隔]")
-                return
-            await self.update_feed_interval(client, message, command_parts[3], command_parts[4])
-        elif action == "修改过期时间":
-            if len(command_parts) != 5:
-                await reply_with_log(message, "修改过期时间的指令格式应为：修改过期时间 [RSS源序号] [新的过期时间]")
-                return
-            await self.update_feed_expiration(client, message, command_parts[3], command_parts[4])
-        else:
-            await reply_with_log(message, "无效的指令，可用的指令为：添加、删除、列表")
+        elif command.action == "修改更新间隔":
+            await self.update_feed_interval(client, message, args["RSS源序号"], args["新的更新间隔"])
+        elif command.action == "修改过期时间":
+            await self.update_feed_expiration(client, message, args["RSS源序号"], args["新的过期时间"])
 
 
 rss = RSSSystem()
@@ -1,29 +1,33 @@
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 
 from config import config
-from utils.redis_utils import RedisConnection
+from utils.http_client import get_http_session
+from utils.redis_utils import get_async_redis
 from utils.send_message_with_log import reply_with_log
+from utils.single_flight import single_flight
 
 now = datetime.now().timestamp()
 
 
-def update():
+@single_flight(key=lambda: 'youth_study')
+async def update():
     # 尝试从Redis中获取答案
-    redis_conn = RedisConnection().get_connection()
-    cached_answer = redis_conn.get('youth_study')
+    redis_conn = get_async_redis()
+    cached_answer = await redis_conn.get('youth_study')
     if cached_answer:
         return {'status': True, 'data': cached_answer.decode('utf-8')}
 
-    req = requests.get('https://qcsh.h5yunban.com/youth-learning/cgi-bin/common-api/course/current')
-    req.raise_for_status()  # 如果请求失败，这将引发HTTPError
-    info = req.json()
+    session = get_http_session()
+    async with session.get('https://qcsh.h5yunban.com/youth-learning/cgi-bin/common-api/course/current') as req:
+        req.raise_for_status()  # 如果请求失败，这将引发ClientResponseError
+        info = await req.json(content_type=None)
     end_time = datetime.strptime(info['result']['endTime'], '%Y-%m-%d %H:%M:%S').timestamp()
 
     if now < end_time:
-        page = requests.get(info['result']['uri'].replace('index.html', 'm.html'))
-        soup = BeautifulSoup(page.text, 'html.parser')
+        async with session.get(info['result']['uri'].replace('index.html', 'm.html')) as page:
+            page_text = await page.text()
+        soup = BeautifulSoup(page_text, 'html.parser')
         current = soup.select_one('.section0')
         a = []
 
@@ -47,20 +51,18 @@ def update():
         content += '\n知识卡片：' + card if card else ''
         content += '\n课后习题：' + exercise if exercise else ''
         # 将答案保存到Redis中
-        redis_conn = RedisConnection().get_connection()
         ttl = config['youth_study']['success_ttl']  # 成功时的TTL
-        redis_conn.setex('youth_study', ttl, content)
+        await redis_conn.setex('youth_study', ttl, content)
         return {'status': True, 'info': info, 'data': content}
 
     # 如果当前时间大于或等于end_time，则认为没有可用的青年大学习信息
-    redis_conn = RedisConnection().get_connection()
     ttl = config['youth_study']['failure_ttl']  # 失败时的TTL
-    redis_conn.setex('youth_study', ttl, "当前没有可用的青年大学习信息")
+    await redis_conn.setex('youth_study', ttl, "当前没有可用的青年大学习信息")
     return {'status': False}
 
 
 async def handle_youth_study(client, message):
-    result = update()
+    result = await update()
     if result['status']:
         output_text = result['data']
     else:
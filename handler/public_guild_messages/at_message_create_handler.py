@@ -1,5 +1,5 @@
-import asyncio
-import re
+import functools
+
 from botpy import logging
 from botpy.message import Message
 
@@ -7,19 +7,42 @@ from handler.handle_authenticate_guild import handle_authenticate_guild
 from handler.handle_channel_list import handle_channel_list
 from handler.handle_dice_random import dice_random
 from handler.handle_guild_detail import handle_guild_detail
-from handler.handle_role import handle_admin
-from handler.handle_email_verification import handle_email_verification_at_message
+from handler.handle_role import ADMIN_ACTIONS, handle_admin
+from handler.handle_email_verification import EMAIL_VERIFICATION_ACTIONS, handle_email_verification_at_message
 from handler.handle_help import handle_help
 from handler.handle_role import handle_query_identity_group
-from handler.handle_minecraft_server import handle_minecraft_server
+from handler.handle_minecraft_server import MINECRAFT_SERVER_ACTIONS, handle_minecraft_server
 from handler.handle_ping import handle_ping
-from handler.handle_question import qa
-from handler.handle_rss_subscription import rss
+from handler.handle_question import QA_ACTIONS, qa
+from handler.handle_rss_subscription import RSS_ACTIONS, rss
 from handler.handle_youth_study import handle_youth_study
+from utils.command_router import CommandRouter
 from utils.send_message_with_log import reply_with_log
+from utils.task_supervisor import supervisor
 
 _log = logging.get_logger()
 
+# 在导入时构建一次的命令路由，声明了子命令格式的命令由路由解析参数后交给处理函数
+router = CommandRouter()
+router.add("/帮助", handle_help)
+router.add("/菜单", handle_help)
+router.add("/问", qa.on_command, task_class="question_answer", actions=QA_ACTIONS)
+router.add("/rss订阅", rss.on_command, task_class="network", actions=RSS_ACTIONS)
+router.add("/邮箱认证", handle_email_verification_at_message, actions=EMAIL_VERIFICATION_ACTIONS)
+router.add("/mc", handle_minecraft_server, task_class="network", actions=MINECRAFT_SERVER_ACTIONS)
+router.add("/随机", dice_random.on_command)
+router.add("/设置管理", handle_admin, actions=ADMIN_ACTIONS)
+router.add("/查询身份组", handle_query_identity_group)
+router.add("/查询子频道", handle_channel_list)
+router.add("/查询频道详情", handle_guild_detail)
+router.add("/ping", handle_ping)
+router.add("/频道认证", handle_authenticate_guild)
+router.add("/青年大学习", handle_youth_study, task_class="network")
+
+
+async def reply_busy(message):
+    await reply_with_log(message, "机器人当前繁忙，请稍后再试。")
+
 
 async def at_message_create_handler(client, message: Message):
     timestamp = message.timestamp
@@ -31,33 +54,15 @@ async def at_message_create_handler(client, message: Message):
     message_info = f"{timestamp} {channel_id} {nick}: {content}"
     _log.info(message_info)
 
-    # Match any command starting with /
-    match = re.search(r"(/\w+)", content)
-
-    COMMANDS = {
-        "/帮助": handle_help,
-        "/菜单": handle_help,
-        "/问": qa.on_command,
-        "/rss订阅": rss.on_command,
-        "/邮箱认证": handle_email_verification_at_message,
-        "/mc": handle_minecraft_server,
-        "/随机": dice_random.on_command,
-        "/设置管理": handle_admin,
-        "/查询身份组": handle_query_identity_group,
-        "/查询子频道": handle_channel_list,
-        "/查询频道详情": handle_guild_detail,
-        "/ping": handle_ping,
-        "/频道认证": handle_authenticate_guild,
-        "/青年大学习": handle_youth_study
-    }
-
-    if match:
-        command = match.group(1)
-        handler = COMMANDS.get(command)
-
-        if handler:
-            asyncio.create_task(handler(client, message))
+    route, command = router.route(content)
+    if route is not None:
+        if route.takes_command:
+            handler = functools.partial(route.handler, client, message, command=command)
         else:
-            await reply_with_log(message, "无法识别的命令，请检查您的输入。")
+            handler = functools.partial(route.handler, client, message)
+        supervisor.submit(route.task_class, message.guild_id, route.name, handler,
+                          on_shed=lambda: reply_busy(message))
+    elif command is not None:
+        await reply_with_log(message, "无法识别的命令，请检查您的输入。")
     else:
         await reply_with_log(message, "消息格式错误，请使用正确的命令格式。")
@@ -10,6 +10,10 @@ from handler.direct_message.direct_message_create_handler import direct_message_
 from handler.handle_rss_subscription import RSSCrawler
 from handler.open_forum_event.open_forum_thread_create_handler import open_forum_thread_create_handler
 from handler.public_guild_messages.at_message_create_handler import at_message_create_handler
+from utils.http_client import close_http_session
+from utils.mc_status import mc_status_service
+from utils.send_email import email_sender
+from utils.task_supervisor import supervisor
 
 _log = get_logger()
 
@@ -22,17 +26,19 @@ class MyClient(botpy.Client):
     async def on_ready(self):
         _log.info(f"robot 「{self.robot.name}」 on_ready!")
 
+    # 事件回调本身已经在botpy创建的任务中执行，命令处理交给任务监督器限流后执行
     # 当收到@机器人的消息时
     async def on_at_message_create(self, message: Message):
-        asyncio.create_task(at_message_create_handler(self,message))
+        await at_message_create_handler(self, message)
 
     # 当收到用户发给机器人的私信消息时
     async def on_direct_message_create(self, message: DirectMessage):
-        asyncio.create_task(direct_message_create_handler(self, message))
+        await direct_message_create_handler(self, message)
 
     # 当收到用户创建主题时
     async def on_open_forum_thread_create(self, open_forum_thread: OpenThread):
-        asyncio.create_task(open_forum_thread_create_handler(self, open_forum_thread))
+        supervisor.submit("default", open_forum_thread.guild_id, "open_forum_thread_create",
+                          lambda: open_forum_thread_create_handler(self, open_forum_thread))
 
 
 async def main():
@@ -45,9 +51,14 @@ async def main():
     # 启动QQ机器人
     client_task = asyncio.create_task(client.start(config["appid"], config["token"]))
 
-    # 启动RSSCrawler
-    async with RSSCrawler(client) as crawler:
-        await asyncio.gather(client_task, crawler.crawler())
+    # 启动RSSCrawler和Minecraft服务器状态轮询
+    try:
+        async with RSSCrawler(client) as crawler:
+            await asyncio.gather(client_task, crawler.crawler(), mc_status_service.poller())
+    finally:
+        await supervisor.close()
+        await email_sender.close()
+        await close_http_session()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,116 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from handler.public_guild_messages.at_message_create_handler import router
+
+# 对比旧的分发方式（每条消息重新构建命令字典、用正则找命令、处理函数再按空格切分参数）
+# 与导入时构建的命令路由在每条消息上的耗时，并校验两者识别出的命令一致、打印按格式生成的错误提示。
+# 不需要MySQL、Redis和QQ机器人，但需要能导入各处理模块的依赖。
+
+MENTION = "<@!1234567890> "
+
+MESSAGES = [
+    "/问 12",
+    "/问 宿舍 几点 熄灯",
+    "/问 添加 图书馆开放时间:每天8:00-22:00",
+    "/问 报错 15 答案已经过时",
+    "/问 查错 全部",
+    "/问 水印 小千 密",
+    "/问 删除 abc",
+    "/rss订阅 添加 https://example.com/feed.xml 校园新闻 30",
+    "/rss订阅 列表",
+    "/rss订阅 修改更新间隔 1",
+    "/mc",
+    "/mc 添加 mc.example.com 生存服 一个长期运营的生存服务器",
+    "/mc 删除",
+    "/设置管理 列表",
+    "/设置管理 123456 问答管理 设置",
+    "/设置管理 123456 不存在的管理 设置",
+    "/邮箱认证 添加域名 example.edu.cn",
+    "/邮箱认证 查询<@!987654321>",
+    "/邮箱认证 开始认证",
+    "/帮助",
+    "/ping",
+    "/青年大学习",
+    "/不存在的命令 参数",
+    "没有命令的消息",
+]
+
+
+def legacy_lookup_command(content, handlers):
+    # 旧实现中分发的部分：每条消息构建命令字典并用正则匹配命令
+    match = re.search(r"(/\w+)", content)
+    commands = {name: handler for name, handler in handlers}
+    return commands.get(match.group(1)) if match else None
+
+
+def legacy_dispatch(content, handlers):
+    # 旧实现：每条消息构建命令字典，正则匹配命令，处理函数中再split取子命令和参数
+    match = re.search(r"(/\w+)", content)
+    commands = {name: handler for name, handler in handlers}
+    if not match:
+        return None
+    command = match.group(1)
+    if commands.get(command) is None:
+        return command
+    command_parts = content.split()
+    action = command_parts[2] if len(command_parts) > 2 else None
+    params = command_parts[3:]
+    return command
+
+
+def measure(func, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for content in messages:
+            func(content)
+    return (time.perf_counter() - start) / (rounds * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比旧的命令分发与命令路由的每条消息耗时")
+    parser.add_argument("-n", "--rounds", type=int, default=20000, help="每条样例消息的重复次数")
+    args = parser.parse_args()
+
+    messages = [MENTION + content for content in MESSAGES]
+    handlers = [(name, route.handler) for name, route in router.routes.items()]
+
+    # 识别出的命令与旧实现一致
+    for content in messages:
+        route, command = router.route(content)
+        expected = legacy_dispatch(content, handlers)
+        actual = command.command if command is not None else None
+        assert actual == expected, (content, actual, expected)
+        assert (route is not None) == (expected in router.routes), content
+
+    legacy_lookup = measure(lambda content: legacy_lookup_command(content, handlers), messages, args.rounds)
+    lookup = measure(router.find_command, messages, args.rounds)
+    legacy = measure(lambda content: legacy_dispatch(content, handlers), messages, args.rounds)
+    routed = measure(router.route, messages, args.rounds)
+    print(f"{len(messages)}条样例消息各{args.rounds}次：")
+    print(f"  查找处理函数：旧实现 {legacy_lookup:.2f}µs/条，命令路由 {lookup:.2f}µs/条")
+    print(f"  查找并切分参数：旧实现 {legacy:.2f}µs/条（不校验参数），"
+          f"命令路由 {routed:.2f}µs/条（包含子命令匹配、参数校验和错误提示）")
+
+    print("按格式生成的解析结果：")
+    for content in messages:
+        route, command = router.route(content)
+        if command is None:
+            result = "消息格式错误"
+        elif route is None:
+            result = "无法识别的命令"
+        elif command.error:
+            result = command.error
+        else:
+            result = f"子命令={command.action} 参数={command.args}"
+        print(f"  {content[len(MENTION):]} -> {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import os
+import smtplib
+import socket
+import sys
+import time
+
+from aiosmtpd.controller import Controller
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.send_email import EmailSender, EmailSendingError, build_message
+
+# 用aiosmtpd在本地启动SMTP桩服务器（需要另外pip install aiosmtpd，机器人本身不依赖它），
+# 对比旧实现（每封邮件在事件循环中新建连接、登录、发送、断开）与发送队列（复用连接）的每秒发送数和事件循环卡顿，
+# 并校验失败重试和按域名限流。桩服务器在EHLO时注入延迟，模拟TLS握手和登录的往返耗时。
+# 不需要MySQL、Redis和QQ机器人。
+
+FROM_EMAIL = "bot@example.com"
+
+
+class StubHandler:
+    def __init__(self, handshake_latency):
+        self.handshake_latency = handshake_latency
+        self.received = []
+        self.fail_next = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake_latency)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            return "451 Temporary failure"
+        self.received.append((time.monotonic(), envelope.rcpt_tos[0]))
+        return "250 OK"
+
+
+class StubEmailSender(EmailSender):
+    def __init__(self, port, **overrides):
+        super().__init__()
+        self.port = port
+        self.config = dict(self.config, **overrides)
+
+    def connect(self):
+        # 桩服务器不需要TLS和登录
+        return smtplib.SMTP("127.0.0.1", self.port, timeout=self.config['timeout']), FROM_EMAIL
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def legacy_send(port, to_email, subject, body):
+    # 旧实现：每封邮件新建连接，在事件循环中同步执行
+    server = smtplib.SMTP("127.0.0.1", port)
+    server.send_message(build_message(FROM_EMAIL, to_email, subject, body))
+    server.quit()
+
+
+async def measure_loop_lag(stop, interval=0.01):
+    max_lag = 0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, loop.time() - start - interval)
+    return max_lag
+
+
+async def run(name, send_all, count):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await send_all()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    max_lag = await lag_task
+    print(f"{name}: {count}封用时{elapsed:.2f}s，{count / elapsed:.1f}封/秒，事件循环最大卡顿 {max_lag * 1000:.0f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比每封邮件新建连接与发送队列复用连接的发送速度")
+    parser.add_argument("-n", "--count", type=int, default=200, help="发送的邮件数量")
+    parser.add_argument("-l", "--latency", type=float, default=0.05, help="每个新连接的握手注入延迟（秒）")
+    args = parser.parse_args()
+
+    handler = StubHandler(args.latency)
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    recipients = [f"user{i}@domain{i % 20}.edu.cn" for i in range(args.count)]
+
+    async def send_legacy():
+        for to_email in recipients:
+            legacy_send(port, to_email, "验证码", "您的验证码是：ABC123")
+
+    sender = StubEmailSender(port, domain_interval=0, queue_size=args.count)
+
+    async def send_queued():
+        futures = [sender.enqueue(to_email, "验证码", "您的验证码是：ABC123") for to_email in recipients]
+        await asyncio.gather(*futures)
+
+    try:
+        await run("每封邮件新建连接", send_legacy, args.count)
+        await run("发送队列", send_queued, args.count)
+        assert len(handler.received) == args.count * 2, len(handler.received)
+        await sender.close()
+
+        # 4xx响应按退避重试，复用的连接断开后自动重连
+        sender = StubEmailSender(port, domain_interval=0, retry_backoff=0.1)
+        handler.fail_next = 2
+        await sender.enqueue("retry@example.edu.cn", "验证码", "重试")
+        assert handler.received[-1][1] == "retry@example.edu.cn"
+        await asyncio.get_running_loop().run_in_executor(sender.executor, lambda: sender.smtp[0].close())
+        await sender.enqueue("reconnect@example.edu.cn", "验证码", "重连")
+        print("校验通过：失败两次后重试成功，断开的连接自动重连")
+
+        # 重试次数用完后Future以EmailSendingError结束
+        handler.fail_next = 10
+        try:
+            await sender.enqueue("fail@example.edu.cn", "验证码", "失败")
+            raise AssertionError("应当抛出EmailSendingError")
+        except EmailSendingError:
+            handler.fail_next = 0
+        print(f"校验通过：重试{sender.config['max_retries']}次后放弃")
+        await sender.close()
+
+        # 同一域名按间隔发送，其他域名不受影响。去掉握手延迟，避免第一封邮件的建连耗时影响间隔
+        handler.handshake_latency = 0
+        sender = StubEmailSender(port, domain_interval=0.2)
+        start = len(handler.received)
+        await asyncio.gather(*[sender.enqueue(f"user{i}@same.edu.cn", "验证码", "限流") for i in range(5)],
+                             sender.enqueue("other@other.edu.cn", "验证码", "限流"))
+        received = handler.received[start:]
+        same = [t for t, rcpt in received if rcpt.endswith("@same.edu.cn")]
+        gaps = [b - a for a, b in zip(same, same[1:])]
+        assert min(gaps) >= 0.18, gaps
+        assert received[1][1] == "other@other.edu.cn", received
+        print(f"校验通过：同一域名的发送间隔最小{min(gaps) * 1000:.0f}ms，其他域名的邮件没有排在后面")
+    finally:
+        await sender.close()
+        controller.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+import argparse
+import html
+import os
+import random
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.html_cleaner import clean_html
+
+# 对比BeautifulSoup与流式清理在RSS description上的耗时，并逐条校验两者输出的文本一致。
+# 语料按常见RSS源的description结构构造：博客全文、带图片和脚本的新闻、代码发布说明、纯文本摘要等。
+
+PARAGRAPH = ("小千今天在频道里发布了新的功能说明，欢迎大家试用并反馈问题。"
+             "The quick brown fox jumps over the lazy dog &amp; keeps running&#8230; ")
+
+TEMPLATES = [
+    # WordPress全文输出
+    lambda p: ("<div class=\"entry\">" + "".join(f"<p>{p}<a href=\"http://example.com/{i}\">阅读更多</a>"
+                                                f"&nbsp;&raquo;</p>" for i in range(12))
+               + "<img src=\"http://example.com/a.png\" alt=\"图片\"/><br/></div>"),
+    # 带脚本、样式和iframe的新闻页面片段
+    lambda p: ("<style>.ad{display:none}</style><p><strong>快讯</strong>：" + p + "</p>"
+               "<script type=\"text/javascript\">var ad = '<p>广告</p>';</script>"
+               "<iframe src=\"http://player.example.com/v\"></iframe><p>" + p * 3 + "</p>"),
+    # GitHub Release说明
+    lambda p: ("<h2>What's Changed</h2><ul>" + "".join(f"<li>Fix #{i} by <a href=\"#\">@dev</a> in "
+                                                     f"<code>handler/handle_{i}.py</code></li>" for i in range(30))
+               + "</ul><pre><code>pip install -U xiaoqianbot &gt;= 1.0</code></pre>"),
+    # 表格和CDATA
+    lambda p: ("<![CDATA[" + p + "]]><table><tr><th>名称</th><th>状态</th></tr>"
+               + "".join(f"<tr><td>服务器{i}</td><td>在线 &#x2714;</td></tr>" for i in range(20)) + "</table>"),
+    # 纯文本摘要
+    lambda p: p * 2,
+    # 不规范的HTML：未闭合的标签、裸露的尖括号
+    lambda p: "<p>" + p + "<br>a < b && c > d<p><b>未闭合" + p + "<i>斜体</b>",
+]
+
+
+def make_corpus(size, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        template = TEMPLATES[i % len(TEMPLATES)]
+        paragraph = PARAGRAPH * rng.randint(1, 6)
+        corpus.append(template(paragraph))
+    return corpus
+
+
+def legacy_clean(raw_html, max_length):
+    # 旧实现：每次都构造完整的BeautifulSoup树
+    return BeautifulSoup(raw_html, "html.parser").get_text()[:max_length]
+
+
+def stream_clean(raw_html, max_length):
+    return clean_html(raw_html, max_length)[:max_length]
+
+
+def check(corpus, max_length):
+    mismatches = 0
+    for raw_html in corpus:
+        for text in (raw_html, html.unescape(raw_html)):
+            if legacy_clean(text, max_length) != stream_clean(text, max_length):
+                mismatches += 1
+    return mismatches
+
+
+def run(clean, corpus, max_length, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for raw_html in corpus:
+            clean(raw_html, max_length)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比BeautifulSoup与流式清理RSS description的耗时")
+    parser.add_argument("-n", "--items", type=int, default=600, help="语料中的description数量")
+    parser.add_argument("-r", "--rounds", type=int, default=5, help="重复次数")
+    parser.add_argument("-l", "--limit", type=int, default=800, help="截断长度（message_length_limit）")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.items)
+    total_bytes = sum(len(raw_html.encode()) for raw_html in corpus)
+    print(f"语料：{len(corpus)}条description，共{total_bytes / 1024:.0f}KB")
+
+    for max_length in (args.limit, 1000):
+        mismatches = check(corpus, max_length)
+        print(f"截断长度{max_length}：与BeautifulSoup输出不一致的条目 {mismatches}")
+
+    legacy = run(legacy_clean, corpus, args.limit, args.rounds)
+    stream = run(stream_clean, corpus, args.limit, args.rounds)
+    count = len(corpus) * args.rounds
+    print(f"BeautifulSoup: {legacy:.2f}s，平均 {legacy / count * 1e6:.0f}us/条")
+    print(f"流式清理: {stream:.2f}s，平均 {stream / count * 1e6:.0f}us/条，加速 {legacy / stream:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
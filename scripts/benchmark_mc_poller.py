@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmark_mc_status import start_stub_server
+from utils.mc_status import MinecraftStatusService
+from utils.redis_utils import close_async_redis, get_async_redis
+
+# 模拟多个频道登记了部分相同的Minecraft服务器，对比缓存过期后第一个/mc的回复耗时：
+# 旧行为（状态过期即删除，第一个用户等待完整查询）与后台轮询+过期仍返回旧值并后台刷新。
+# 同时统计轮询时每个服务器的连接数，校验相同地址只查询一次，并输出环形缓冲区记录的趋势。
+# 需要Redis，不需要MySQL和QQ机器人。
+
+
+class BenchmarkStatusService(MinecraftStatusService):
+    def __init__(self, guild_servers, **overrides):
+        super().__init__()
+        self.guild_servers = guild_servers
+        redis_overrides = overrides.pop('redis', {})
+        self.config = dict(self.config, **overrides)
+        self.config['redis'] = dict(self.config['redis'], **redis_overrides)
+
+    async def get_registered_addresses(self):
+        # 对应SELECT DISTINCT server_address FROM minecraft_servers
+        return list(dict.fromkeys(address for addresses in self.guild_servers.values() for address in addresses))
+
+
+async def timed(func, *args):
+    start = time.perf_counter()
+    result = await func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比缓存过期后第一个/mc的回复耗时，并校验后台轮询去重")
+    parser.add_argument("-n", "--servers", type=int, default=6, help="桩服务器数量")
+    parser.add_argument("-g", "--guilds", type=int, default=5, help="频道数量，每个频道登记一半服务器")
+    parser.add_argument("-l", "--latency", type=float, default=0.3, help="每个服务器的注入延迟（秒）")
+    parser.add_argument("-p", "--polls", type=int, default=5, help="轮询轮数")
+    args = parser.parse_args()
+
+    connections = {}
+    servers = []
+    for i in range(args.servers):
+        def on_connect(i=i):
+            connections[i] = connections.get(i, 0) + 1
+        servers.append(await start_stub_server(args.latency, on_connect=on_connect))
+    server_addresses = [address for _, address in servers]
+    half = max(1, args.servers // 2)
+    guild_servers = {f"guild-{g}": [server_addresses[(g + k) % args.servers] for k in range(half)]
+                     for g in range(args.guilds)}
+    registrations = sum(len(addresses) for addresses in guild_servers.values())
+    guild_addresses = guild_servers["guild-0"]
+
+    r = get_async_redis()
+    # 新鲜期设为1秒，便于观察过期后的行为
+    service = BenchmarkStatusService(guild_servers, poll_interval=1, reply_timeout=5,
+                                     redis={"status_query_timeout": 1, "status_query_failed_ttl": 1})
+    try:
+        await r.delete(*server_addresses)
+        # 旧行为：缓存过期后没有任何值，第一个用户等待完整查询
+        _, cold = await timed(service.get_statuses, guild_addresses)
+        await r.delete(*guild_addresses)
+        _, legacy_expired = await timed(service.get_statuses, guild_addresses)
+
+        # 新行为：过期后直接返回旧值，同时后台刷新
+        await asyncio.sleep(1.1)
+        statuses, stale = await timed(service.get_statuses, guild_addresses)
+        assert all(status.startswith("在线") for status in statuses.values()), statuses
+        revalidating = len(service.querying)
+        await asyncio.gather(*service.querying.values())
+        print(f"缓存过期后第一个/mc：旧行为 {legacy_expired:.0f}ms，过期仍返回旧值 {stale:.1f}ms"
+              f"（后台刷新{revalidating}个服务器），冷启动 {cold:.0f}ms")
+
+        # 后台轮询：多个频道登记的相同地址每轮只查询一次
+        connections.clear()
+        for _ in range(args.polls):
+            await asyncio.sleep(1)
+            polled = await service.poll_once()
+            assert polled == args.servers, polled
+        assert all(count == args.polls for count in connections.values()), connections
+        print(f"{args.guilds}个频道共登记{registrations}次、{args.servers}个不同地址，"
+              f"{args.polls}轮轮询共建立{sum(connections.values())}个连接，每个地址每轮1次")
+
+        # 轮询保持新鲜后，用户查询直接命中缓存，不触发刷新
+        statuses, warm = await timed(service.get_statuses, guild_addresses)
+        assert not service.querying, service.querying
+        print(f"轮询期间的/mc：{warm:.1f}ms，没有触发查询")
+
+        history = service.histories[server_addresses[0]]
+        print(f"环形缓冲区记录{history.count}次，占用"
+              f"{history.timestamps.itemsize * history.size + history.latencies.itemsize * history.size}字节"
+              f"（容量{history.size}次）")
+        print(f"趋势: {service.get_trend(server_addresses[0])}")
+    finally:
+        await r.delete(*server_addresses)
+        for server, _ in servers:
+            server.close()
+        await close_async_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from mcstatus import JavaServer
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.mc_status import PENDING_STATUS, MinecraftStatusService
+from utils.redis_utils import close_async_redis, get_async_redis
+
+# 在本地启动若干个带注入延迟的Minecraft状态协议桩服务器，其中一个接受连接后不回应，模拟卡住的离线服务器。
+# 对比旧实现（逐个服务器查询）与新实现（MGET取缓存、并发查询、回复超时返回部分结果）一条/mc回复的耗时。
+# 需要Redis，不需要MySQL和QQ机器人。
+
+STATUS = json.dumps({
+    "version": {"name": "1.20.1", "protocol": 763},
+    "players": {"online": 3, "max": 20},
+    "description": "stub",
+})
+
+
+def pack_varint(value):
+    data = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+
+async def read_varint(reader):
+    value = 0
+    for i in range(5):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value
+    raise IOError("varint过长")
+
+
+def pack_packet(payload):
+    return pack_varint(len(payload)) + payload
+
+
+async def start_stub_server(latency, hang=False, on_connect=None):
+    async def handle(reader, writer):
+        if on_connect is not None:
+            on_connect()
+        try:
+            while True:
+                packet = await reader.readexactly(await read_varint(reader))
+                if hang:
+                    continue
+                if packet == b"\x00":
+                    # 状态请求
+                    await asyncio.sleep(latency)
+                    text = STATUS.encode()
+                    writer.write(pack_packet(b"\x00" + pack_varint(len(text)) + text))
+                elif packet[:1] == b"\x01":
+                    # ping请求，原样返回
+                    writer.write(pack_packet(packet))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+async def legacy_show(server_addresses):
+    # 旧实现：逐个服务器查Redis、阻塞解析地址、查询状态
+    r = get_async_redis()
+    statuses = {}
+    for server_address in server_addresses:
+        server_status = await r.get(server_address)
+        if server_status is not None:
+            statuses[server_address] = json.loads(server_status)
+            continue
+        mc_server = JavaServer.lookup(server_address)
+        try:
+            status = await mc_server.async_status()
+            server_status = f"在线，玩家数：{status.players.online}/{status.players.max}，延迟：{round(status.latency, 2)} ms"
+            await r.set(server_address, json.dumps(server_status), ex=180)
+        except Exception as e:
+            server_status = f"离线，错误信息：{str(e)}"
+            await r.set(server_address, json.dumps(server_status), ex=60)
+        statuses[server_address] = server_status
+    return statuses
+
+
+async def timed(name, func, server_addresses):
+    start = time.perf_counter()
+    statuses = await func(server_addresses)
+    elapsed = time.perf_counter() - start
+    online = sum(status.startswith("在线") for status in statuses.values())
+    pending = sum(status == PENDING_STATUS for status in statuses.values())
+    print(f"{name}: {elapsed * 1000:.0f}ms，在线{online}个，查询中{pending}个，共{len(statuses)}个")
+    return statuses
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比逐个查询与并发查询Minecraft服务器状态的回复耗时")
+    parser.add_argument("-n", "--servers", type=int, default=8, help="在线的桩服务器数量")
+    parser.add_argument("-l", "--latency", type=float, default=0.2, help="最大注入延迟（秒），各服务器均匀分布")
+    args = parser.parse_args()
+
+    servers = []
+    for i in range(args.servers):
+        servers.append(await start_stub_server(args.latency * (i + 1) / args.servers))
+    servers.append(await start_stub_server(0, hang=True))
+    server_addresses = [address for _, address in servers]
+    hung_address = server_addresses[-1]
+
+    r = get_async_redis()
+    service = MinecraftStatusService()
+    # 让卡住的服务器比回复等待时间晚结束，便于观察部分结果
+    service.config = dict(service.config, query_timeout=2, reply_timeout=0.5)
+    try:
+        await r.delete(*server_addresses)
+        await timed("旧实现（冷缓存）", legacy_show, server_addresses)
+        await timed("旧实现（热缓存）", legacy_show, server_addresses)
+
+        await r.delete(*server_addresses)
+        statuses = await timed("新实现（冷缓存）", service.get_statuses, server_addresses)
+        assert statuses[hung_address] == PENDING_STATUS, statuses[hung_address]
+        assert all(statuses[address].startswith("在线") for address in server_addresses[:-1]), statuses
+
+        # 卡住的服务器查询超时后，结果在后台写入Redis
+        await asyncio.gather(*service.querying.values())
+        statuses = await timed("新实现（热缓存）", service.get_statuses, server_addresses)
+        assert statuses[hung_address] == "离线，错误信息：连接超时", statuses[hung_address]
+        print("校验通过：卡住的服务器先返回查询中，超时结果随后写入缓存")
+    finally:
+        await r.delete(*server_addresses)
+        for server, _ in servers:
+            server.close()
+        await close_async_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.message_dispatcher import MessageDispatcher
+from utils.redis_utils import get_async_redis, close_async_redis
+from utils.send_message_with_log import QUOTA_ERROR, post_with_log
+
+# 注意：这个脚本需要本地Redis（与config.yaml中的配置一致），用于保存每日配额计数，测试用的键结束后删除。
+# 用一个模拟平台限制的假client.api对比两种发送方式：
+# 1. 旧实现：每条RSS项直接post_with_log，只能在出错后才知道超限
+# 2. 出站调度器：令牌桶限速、Redis配额计数，积压时合并为摘要
+
+
+class FakeAPI:
+    """每个子频道每天最多daily_quota条主动消息，每秒最多rate条，超出时抛出与平台相同的错误。"""
+
+    def __init__(self, daily_quota, rate):
+        self.daily_quota = daily_quota
+        self.rate = rate
+        self.posts = defaultdict(list)
+        self.rejected = defaultdict(int)
+
+    async def post_message(self, channel_id, content, **kwargs):
+        await asyncio.sleep(0.005)
+        now = time.monotonic()
+        posts = self.posts[channel_id]
+        if len(posts) >= self.daily_quota:
+            self.rejected[channel_id] += 1
+            raise Exception(f"{QUOTA_ERROR}")
+        if len([t for t, _ in posts if now - t < 1]) >= self.rate:
+            self.rejected[channel_id] += 1
+            raise Exception("request too frequent")
+        posts.append((now, content))
+
+
+class FakeClient:
+    def __init__(self, api):
+        self.api = api
+
+
+def make_items(channels, items):
+    return {f"benchmark-dispatcher-{c}": [(f"源{c}：\n第{i}条：\n链接：http://example.com/{c}/{i}\n描述：内容",
+                                           f"源{c}：第{i}条 http://example.com/{c}/{i}") for i in range(items)]
+            for c in range(channels)}
+
+
+async def naive_send(client, items_by_channel):
+    delivered = 0
+    for channel_id, items in items_by_channel.items():
+        for content, _ in items:
+            try:
+                await post_with_log(client, channel_id, content)
+                delivered += 1
+            except Exception:
+                # 旧实现在这里设置当日不再发送，剩余条目留待次日
+                break
+    return delivered
+
+
+async def dispatcher_send(client, items_by_channel, dispatcher):
+    futures = []
+    for channel_id, items in items_by_channel.items():
+        for content, summary in items:
+            futures.append(await dispatcher.submit(client, channel_id, content, summary=summary, encode_urls=False))
+    return sum(await asyncio.gather(*futures))
+
+
+def report(name, api, items_by_channel, acknowledged, elapsed):
+    # 以平台实际收到的消息中出现的链接统计真正送达的RSS项
+    total = sum(len(items) for items in items_by_channel.values())
+    posts = sum(len(posts) for posts in api.posts.values())
+    delivered = len({link for posts in api.posts.values() for _, content in posts
+                     for link in re.findall(r"http://example\.com/\S+", content)})
+    rejected = sum(api.rejected.values())
+    print(f"{name}: {total}条RSS项，发送方认为已送达{acknowledged}条，实际送达{delivered}条，"
+          f"平台收到{posts}条消息，拒绝{rejected}次，耗时{elapsed:.2f}s")
+
+
+async def cleanup(items_by_channel):
+    keys = [f"{prefix}:{channel_id}" for channel_id in items_by_channel for prefix in ("msg_quota", "msg_daily_limit")]
+    await get_async_redis().delete(*keys)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比直接发送与出站调度器在平台限制下的送达情况")
+    parser.add_argument("-c", "--channels", type=int, default=10, help="子频道数量")
+    parser.add_argument("-i", "--items", type=int, default=60, help="每个子频道积压的RSS项数量")
+    parser.add_argument("--quota", type=int, default=20, help="每个子频道每日主动消息上限")
+    parser.add_argument("--rate", type=int, default=5, help="每个子频道每秒消息上限")
+    args = parser.parse_args()
+
+    # 发送失败的日志太多，这里只保留结果
+    logging.getLogger("botpy").setLevel(logging.CRITICAL)
+
+    items_by_channel = make_items(args.channels, args.items)
+    try:
+        await cleanup(items_by_channel)
+        api = FakeAPI(args.quota, args.rate)
+        start = time.perf_counter()
+        delivered = await naive_send(FakeClient(api), items_by_channel)
+        report("直接发送", api, items_by_channel, delivered, time.perf_counter() - start)
+
+        api = FakeAPI(args.quota, args.rate)
+        dispatcher = MessageDispatcher(rate=args.rate, burst=args.rate, daily_quota=args.quota)
+        start = time.perf_counter()
+        delivered = await dispatcher_send(FakeClient(api), items_by_channel, dispatcher)
+        report("出站调度器", api, items_by_channel, delivered, time.perf_counter() - start)
+        print("调度器统计:", dispatcher.stats)
+    finally:
+        await cleanup(items_by_channel)
+        await close_async_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.mysql_utils import get_mysql_conn, get_async_mysql_conn
+
+# 注意：这个脚本需要本地MySQL（与config.yaml中的配置一致），通过SELECT SLEEP模拟慢查询。
+# 每条模拟的@消息都会执行一次慢查询，分别统计同步连接池与异步连接池下的处理延迟。
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def sync_handler(query_latency):
+    # 旧实现：在协程中直接调用阻塞的pymysql
+    conn = get_mysql_conn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT SLEEP(%s)", (query_latency,))
+            cursor.fetchall()
+    finally:
+        conn.close()
+
+
+async def async_handler(query_latency):
+    # 新实现：数据库操作在线程池中执行，不阻塞事件循环
+    conn = await get_async_mysql_conn()
+    try:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT SLEEP(%s)", (query_latency,))
+            await cursor.fetchall()
+    finally:
+        await conn.close()
+
+
+async def fire(handler, messages, query_latency):
+    latencies = []
+
+    # 所有消息同时到达，延迟从到达时刻开始计算，包含在事件循环中排队的时间
+    arrival = time.perf_counter()
+
+    async def on_message():
+        await handler(query_latency)
+        latencies.append((time.perf_counter() - arrival) * 1000)
+
+    await asyncio.gather(*[on_message() for _ in range(messages)])
+    total = time.perf_counter() - arrival
+    return latencies, total
+
+
+def report(name, latencies, total):
+    print(f"{name}: 总耗时 {total:.2f}s，p50 {statistics.median(latencies):.1f}ms，"
+          f"p99 {percentile(latencies, 99):.1f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比同步与异步MySQL访问下并发@消息的处理延迟")
+    parser.add_argument("-n", "--messages", type=int, default=200, help="并发@消息数量")
+    parser.add_argument("-l", "--latency", type=float, default=0.05, help="每次查询的模拟延迟（秒）")
+    args = parser.parse_args()
+
+    report("同步连接池", *await fire(sync_handler, args.messages, args.latency))
+    report("异步连接池", *await fire(async_handler, args.messages, args.latency))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
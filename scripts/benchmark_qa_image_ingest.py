@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from aiohttp import web
+from PIL import Image
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import image_ingest
+from utils.http_client import close_http_session
+from utils.image_ingest import AttachmentError, publish_images, stage_attachments
+
+# 在独立线程中启动aiohttp桩服务器，提供带注入延迟的图片，对比一次上传9张图片时
+# 旧实现（在事件循环中逐张阻塞下载）与新实现（并发下载、校验、压缩后原子发布）的总耗时和事件循环卡顿。
+# 图片写入临时目录，不需要MySQL和QQ机器人。
+
+
+class Attachment:
+    def __init__(self, url):
+        self.url = url
+
+
+def make_images(count, width, height):
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        if i % 3 == 2:
+            # 截图类的PNG，尺寸较小
+            Image.effect_noise((width // 3, height // 3), 32).convert("RGB").save(buffer, "PNG")
+        else:
+            Image.effect_noise((width, height), 32).convert("RGB").save(buffer, "JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def start_stub_server(images, latency):
+    started = threading.Event()
+    state = {}
+
+    async def handle(request):
+        await asyncio.sleep(latency)
+        index = int(request.match_info['index'])
+        if index >= len(images):
+            return web.Response(status=404)
+        return web.Response(body=images[index], content_type="application/octet-stream")
+
+    async def serve():
+        app = web.Application()
+        app.router.add_get("/image/{index}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        state['port'] = site._server.sockets[0].getsockname()[1]
+        state['stop'] = asyncio.Event()
+        started.set()
+        await state['stop'].wait()
+        await runner.cleanup()
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    started.wait()
+    return state['port'], lambda: loop.call_soon_threadsafe(state['stop'].set)
+
+
+async def measure_loop_lag(stop, interval=0.01):
+    max_lag = 0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, loop.time() - start - interval)
+    return max_lag
+
+
+async def legacy_ingest(attachments, question_answer_id):
+    # 旧实现：逐张阻塞下载，直接写入最终路径
+    image_dir = os.path.join(image_ingest.IMAGE_ROOT, str(question_answer_id))
+    os.makedirs(image_dir, exist_ok=True)
+    for seq, attachment in enumerate(attachments, start=1):
+        with urllib.request.urlopen(attachment.url) as response, \
+                open(os.path.join(image_dir, f"image_seq-{seq}"), 'wb') as f:
+            shutil.copyfileobj(response, f)
+
+
+async def ingest(attachments, question_answer_id):
+    async with stage_attachments(attachments) as staged_paths:
+        await publish_images(staged_paths, question_answer_id, 1)
+
+
+async def run(name, func, attachments, question_answer_id):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await func(attachments, question_answer_id)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    max_lag = await lag_task
+    image_dir = os.path.join(image_ingest.IMAGE_ROOT, str(question_answer_id))
+    size = sum(os.path.getsize(os.path.join(image_dir, file_name)) for file_name in os.listdir(image_dir))
+    print(f"{name}: {elapsed:.2f}s，事件循环最大卡顿 {max_lag * 1000:.0f}ms，保存 {size / 1024 / 1024:.1f}MB")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比逐张阻塞下载与并发流水线保存问答图片的耗时")
+    parser.add_argument("-n", "--images", type=int, default=9, help="每次上传的图片数量")
+    parser.add_argument("-l", "--latency", type=float, default=0.3, help="每张图片的注入延迟（秒）")
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=2000)
+    args = parser.parse_args()
+
+    images = make_images(args.images, args.width, args.height)
+    print(f"{len(images)}张图片，共{sum(map(len, images)) / 1024 / 1024:.1f}MB，每张注入延迟{args.latency}s")
+    port, stop_server = start_stub_server(images, args.latency)
+    attachments = [Attachment(f"http://127.0.0.1:{port}/image/{i}") for i in range(len(images))]
+
+    workdir = tempfile.mkdtemp()
+    image_ingest.IMAGE_ROOT = os.path.join(workdir, "question_answer")
+    try:
+        await run("逐张阻塞下载", legacy_ingest, attachments, 1)
+        await run("并发流水线", ingest, attachments, 2)
+
+        # 任一附件失败时不发布任何文件，也不留下临时文件
+        try:
+            await ingest(attachments[:2] + [Attachment(f"http://127.0.0.1:{port}/image/{len(images)}")], 3)
+            raise AssertionError("应当抛出AttachmentError")
+        except AttachmentError as e:
+            print(f"失败的附件：{e}")
+        assert sorted(os.listdir(image_ingest.IMAGE_ROOT)) == ["1", "2"], os.listdir(image_ingest.IMAGE_ROOT)
+        print("校验通过：失败时没有留下任何文件")
+    finally:
+        await close_http_session()
+        stop_server()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmark_qa_search import make_corpus, make_queries, BENCHMARK_GUILD_ID
+from utils.qa_query import build_search_query
+
+# 对比三种问答SQL查询方式在重复搜索下的耗时：
+# 1. 旧实现：关键词通过f-string拼进SQL，每组关键词都是一条新语句
+# 2. 固定形状的参数化模板（当前实现）
+# 3. 在同一连接上用 PREPARE/EXECUTE 复用服务端预处理语句
+# 不加 --mysql 时只比较客户端生成语句的耗时；加上后需要本地MySQL（与config.yaml中的配置一致），测试数据结束后删除。
+
+
+def legacy_query(guild_id, keywords):
+    query_conditions = " AND ".join(
+        [f"(question LIKE '%%{keyword}%%' OR answer LIKE '%%{keyword}%%')" for keyword in keywords])
+    return f"""
+        SELECT qa.guild_question_id, qa.question, qa.answer,
+        GROUP_CONCAT('resource/question_answer/', qa.question_answer_id, '/image_seq-', qai.image_seq ORDER BY qai.image_seq) AS image_path
+        FROM question_answer qa
+        LEFT JOIN question_answer_image qai ON qa.question_answer_id = qai.question_answer_id
+        WHERE {query_conditions} AND qa.guild_id = %s
+        GROUP BY qa.guild_question_id, qa.question, qa.answer
+    """, guild_id
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name}: 平均 {statistics.mean(latencies):.3f}ms，p50 {statistics.median(latencies):.3f}ms，p99 {p99:.3f}ms")
+
+
+def time_each(func, queries):
+    latencies = []
+    for keywords in queries:
+        start = time.perf_counter()
+        func(keywords)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def run_prepared(cursor, prepared, keywords):
+    sql, args = build_search_query(BENCHMARK_GUILD_ID, keywords)
+    name = f"qa_search_{len(keywords)}"
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} FROM %s", (sql.replace("%s", "?"),))
+        prepared.add(name)
+    variables = [f"@p{i}" for i in range(len(args))]
+    cursor.execute("SET " + ", ".join(f"{variable} = %s" for variable in variables), args)
+    cursor.execute(f"EXECUTE {name} USING " + ", ".join(variables))
+    return cursor.fetchall()
+
+
+def benchmark_mysql(rows, queries):
+    from utils.mysql_utils import get_mysql_conn
+
+    conn = get_mysql_conn()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("""
+            INSERT INTO question_answer (question, answer, guild_id, guild_question_id)
+            VALUES (%s, %s, %s, %s)
+        """, [(row["question"], row["answer"], BENCHMARK_GUILD_ID, row["guild_question_id"]) for row in rows])
+        conn.commit()
+
+        def run(builder):
+            def execute(keywords):
+                cursor.execute(*builder(BENCHMARK_GUILD_ID, keywords))
+                return cursor.fetchall()
+            return execute
+
+        # 结果校验：三种方式返回同样的行
+        prepared = set()
+        for keywords in queries[:20]:
+            legacy = run(legacy_query)(keywords)
+            assert run(build_search_query)(keywords) == legacy
+            assert run_prepared(cursor, prepared, keywords) == legacy
+
+        report("f-string 拼接（执行）", time_each(run(legacy_query), queries))
+        report("参数化模板（执行）", time_each(run(build_search_query), queries))
+        report("PREPARE/EXECUTE（执行）", time_each(lambda keywords: run_prepared(cursor, prepared, keywords), queries))
+
+        cursor.execute("SHOW SESSION STATUS WHERE Variable_name IN ('Com_stmt_prepare', 'Com_stmt_execute')")
+        print("会话统计:", {row["Variable_name"]: row["Value"] for row in cursor.fetchall()})
+    finally:
+        cursor.execute("DELETE FROM question_answer WHERE guild_id = %s", (BENCHMARK_GUILD_ID,))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比问答搜索SQL的生成与执行耗时")
+    parser.add_argument("-s", "--size", type=int, default=2000, help="合成问答条数")
+    parser.add_argument("-q", "--queries", type=int, default=500, help="查询次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mysql", action="store_true", help="在本地MySQL上执行查询")
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries, args.seed)
+    report("f-string 拼接（生成）", time_each(lambda keywords: legacy_query(BENCHMARK_GUILD_ID, keywords), queries))
+    report("参数化模板（生成）", time_each(lambda keywords: build_search_query(BENCHMARK_GUILD_ID, keywords), queries))
+    print(f"不同的语句文本数：f-string {len({legacy_query(BENCHMARK_GUILD_ID, q)[0] for q in queries})}，"
+          f"参数化模板 {len({build_search_query(BENCHMARK_GUILD_ID, q)[0] for q in queries})}")
+
+    if args.mysql:
+        benchmark_mysql(make_corpus(args.size, args.seed), queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.qa_index import build_index
+
+# 在一个合成的频道问答库上对比倒排索引与逐条 LIKE 匹配的查询延迟。
+# 加上 --mysql 参数时还会把数据写入本地MySQL（与config.yaml中的配置一致），对比当前的SQL查询路径，结束后删除。
+
+VOCABULARY = [
+    "图书馆", "开放时间", "食堂", "宿舍", "熄灯", "快递", "校园卡", "补办", "选课", "退课", "教务处", "考试", "补考",
+    "成绩", "查询", "奖学金", "助学金", "申请", "体育馆", "预约", "校车", "时刻表", "医务室", "报销", "网络", "宽带",
+    "打印", "复印", "自习室", "实验室", "毕业", "论文", "答辩", "实习", "证明", "学生证", "火车票", "优惠", "社团",
+    "招新", "志愿", "时长", "四六级", "报名", "计算机", "等级考试", "转专业", "辅导员", "请假", "销假", "campus", "wifi",
+]
+BENCHMARK_GUILD_ID = "benchmark-qa-search"
+
+
+def make_corpus(size, seed):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(size):
+        question = "".join(rng.sample(VOCABULARY, rng.randint(2, 4))) + f"问题{i}"
+        answer = "，".join("".join(rng.sample(VOCABULARY, rng.randint(2, 5))) for _ in range(rng.randint(3, 10)))
+        rows.append({
+            "question_answer_id": i + 1,
+            "guild_question_id": i + 1,
+            "question": question,
+            "answer": answer,
+        })
+    return rows
+
+
+def make_queries(count, seed):
+    rng = random.Random(seed + 1)
+    return [rng.sample(VOCABULARY, rng.randint(1, 3)) for _ in range(count)]
+
+
+def make_typo(text, rng):
+    # 随机替换、删除或插入一个字，模拟错字、少字和多字
+    pos = rng.randrange(len(text))
+    kind = rng.choice(("replace", "delete", "insert"))
+    if kind == "replace":
+        return text[:pos] + rng.choice("的了是在有和人这中大为上个国我") + text[pos + 1:]
+    if kind == "delete":
+        return text[:pos] + text[pos + 1:]
+    return text[:pos] + rng.choice("的了是在有和人这中大为上个国我") + text[pos:]
+
+
+def scan_search(rows, keywords):
+    # 与 question LIKE '%kw%' OR answer LIKE '%kw%' 逐条匹配等价
+    keywords = [keyword.lower() for keyword in keywords]
+    return {row["question_answer_id"] for row in rows
+            if all(keyword in row["question"].lower() or keyword in row["answer"].lower() for keyword in keywords)}
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name}: p50 {statistics.median(latencies):.3f}ms，p99 {p99:.3f}ms")
+
+
+def time_each(func, queries):
+    latencies = []
+    for keywords in queries:
+        start = time.perf_counter()
+        func(keywords)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def benchmark_sql(rows, queries):
+    from handler.handle_question import qa
+    from utils.mysql_utils import get_async_mysql_conn
+
+    conn = await get_async_mysql_conn()
+    try:
+        async with conn.cursor() as cursor:
+            await cursor.executemany("""
+                INSERT INTO question_answer (question, answer, guild_id, guild_question_id)
+                VALUES (%s, %s, %s, %s)
+            """, [(row["question"], row["answer"], BENCHMARK_GUILD_ID, row["guild_question_id"]) for row in rows])
+        await conn.commit()
+
+        latencies = []
+        for keywords in queries:
+            start = time.perf_counter()
+            await qa.search_questions_by_sql(BENCHMARK_GUILD_ID, keywords)
+            latencies.append((time.perf_counter() - start) * 1000)
+        report("SQL LIKE 查询", latencies)
+    finally:
+        async with conn.cursor() as cursor:
+            await cursor.execute("DELETE FROM question_answer WHERE guild_id = %s", (BENCHMARK_GUILD_ID,))
+        await conn.commit()
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比问答倒排索引与逐条匹配的查询延迟")
+    parser.add_argument("-s", "--size", type=int, default=2000, help="合成问答条数")
+    parser.add_argument("-q", "--queries", type=int, default=500, help="查询次数")
+    parser.add_argument("-k", "--top-k", type=int, default=20, help="索引返回的结果数量")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mysql", action="store_true", help="同时测试本地MySQL上的SQL查询路径")
+    args = parser.parse_args()
+
+    rows = make_corpus(args.size, args.seed)
+    queries = make_queries(args.queries, args.seed)
+
+    start = time.perf_counter()
+    index = build_index(rows)
+    print(f"构建索引: {args.size} 条问答，{len(index.postings)} 个词项，耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # 校验：不截断时索引的命中集合必须与逐条匹配完全一致
+    for keywords in queries:
+        expected = scan_search(rows, keywords)
+        actual = {doc_id for doc_id, _ in index.search(keywords, len(rows))}
+        assert actual == expected, f"索引结果与逐条匹配不一致：{keywords}"
+    print("校验通过：索引命中集合与逐条匹配一致")
+
+    report("倒排索引 + BM25", time_each(lambda keywords: index.search(keywords, args.top_k), queries))
+    report("逐条 LIKE 匹配（内存）", time_each(lambda keywords: scan_search(rows, keywords), queries))
+
+    # 容错搜索：对随机问题制造一个错字，统计最佳结果仍是原问题的比例
+    rng = random.Random(args.seed + 2)
+    typo_queries = []
+    for _ in range(args.queries):
+        row = rng.choice(rows)
+        typo_queries.append((row["question_answer_id"], make_typo(row["question"], rng)))
+    latencies = []
+    hits = 0
+    for doc_id, query in typo_queries:
+        start = time.perf_counter()
+        matches = index.fuzzy_search([query], 5, 0.5)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += bool(matches) and matches[0][0] == doc_id
+    report("容错搜索", latencies)
+    print(f"容错搜索命中率: {hits / len(typo_queries):.1%}")
+
+    if args.mysql:
+        asyncio.run(benchmark_sql(rows, queries))
+
+
+if __name__ == "__main__":
+    main()
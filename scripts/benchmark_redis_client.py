@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import redis
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import config
+from utils.redis_utils import get_async_redis, get_many, close_async_redis
+
+# 注意：这个脚本需要本地Redis（与config.yaml中的配置一致）。
+# 对比旧实现（每次调用新建连接池的同步客户端）、共享异步客户端逐个GET、共享异步客户端pipeline批量GET三种方式。
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def legacy_connection():
+    # 旧实现：每次调用都新建一个ConnectionPool，连接无法复用
+    redis_config = config['redis']
+    pool = redis.ConnectionPool(
+        host=redis_config['host'],
+        port=redis_config['port'],
+        db=redis_config['db'],
+        password=os.environ.get('REDIS_DB_PASS'),
+        max_connections=redis_config['max_connections'],
+        socket_timeout=redis_config['socket_timeout'],
+        socket_connect_timeout=redis_config['socket_connect_timeout'],
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+async def legacy_handler(keys):
+    for key in keys:
+        legacy_connection().get(key)
+
+
+async def shared_handler(keys):
+    redis_conn = get_async_redis()
+    for key in keys:
+        await redis_conn.get(key)
+
+
+async def pipeline_handler(keys):
+    await get_many(keys)
+
+
+async def fire(handler, messages, keys):
+    latencies = []
+    arrival = time.perf_counter()
+
+    async def on_message():
+        await handler(keys)
+        latencies.append((time.perf_counter() - arrival) * 1000)
+
+    await asyncio.gather(*[on_message() for _ in range(messages)])
+    return latencies, time.perf_counter() - arrival
+
+
+def report(name, latencies, total, messages):
+    print(f"{name}: 总耗时 {total:.2f}s，吞吐 {messages / total:.0f} 条/秒，"
+          f"p50 {statistics.median(latencies):.1f}ms，p99 {percentile(latencies, 99):.1f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比不同Redis客户端用法下并发消息的处理延迟")
+    parser.add_argument("-n", "--messages", type=int, default=500, help="并发消息数量")
+    parser.add_argument("-k", "--keys", type=int, default=5, help="每条消息读取的键数量")
+    args = parser.parse_args()
+
+    keys = [f"benchmark:redis:{i}" for i in range(args.keys)]
+    await get_async_redis().mset({key: "x" * 64 for key in keys})
+
+    try:
+        report("每次新建连接池", *await fire(legacy_handler, args.messages, keys), args.messages)
+        report("共享异步客户端", *await fire(shared_handler, args.messages, keys), args.messages)
+        report("共享异步客户端+pipeline", *await fire(pipeline_handler, args.messages, keys), args.messages)
+    finally:
+        await get_async_redis().delete(*keys)
+        await close_async_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import bisect
+import os
+import random
+import sys
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from handler.handle_rss_subscription import RSSCrawler
+from utils.http_client import close_http_session
+
+# 用模拟时钟模拟不同更新频率的RSS源，对比固定间隔与自适应间隔的抓取次数，以及新条目从发布到被抓取的平均延迟。
+# 间隔计算直接调用RSSCrawler.update_poll_interval，不需要MySQL和QQ机器人。
+
+# (名称, 平均更新间隔（分钟），None表示不再更新)
+FEED_PROFILES = [
+    ("高频", 20),
+    ("每小时", 60),
+    ("每天", 24 * 60),
+    ("每周", 7 * 24 * 60),
+    ("停更", None),
+    ("间歇故障", 24 * 60),
+]
+
+
+def make_arrivals(mean_interval, days, rng):
+    # 新条目按泊松过程到达，返回到达时刻（秒）
+    arrivals = []
+    if mean_interval is None:
+        return arrivals
+    t = rng.expovariate(1 / (mean_interval * 60))
+    while t < days * 86400:
+        arrivals.append(t)
+        t += rng.expovariate(1 / (mean_interval * 60))
+    return arrivals
+
+
+def is_failing(name, t):
+    # 间歇故障的源在第3、4天无法访问
+    return name == "间歇故障" and 2 * 86400 <= t < 4 * 86400
+
+
+def simulate(crawler, name, arrivals, user_interval, days, adaptive):
+    feed = {"rss_feed_id": 0, "current_interval": user_interval, "poll_interval": user_interval,
+            "block_count": 0, "update_interval_ewma": None, "new_item_seen": None}
+    fetches = 0
+    delays = []
+    seen = 0
+    t = 0
+    while t < days * 86400:
+        fetches += 1
+        success = not is_failing(name, t)
+        new_items = 0
+        if success:
+            available = bisect.bisect_right(arrivals, t)
+            new_items = available - seen
+            delays.extend(t - arrival for arrival in arrivals[seen:available])
+            seen = available
+        if adaptive:
+            crawler.update_poll_interval(feed, success, new_items, t)
+        t += crawler.effective_interval(feed) * 60
+    return fetches, delays, feed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比固定间隔与自适应间隔抓取RSS源的次数和延迟")
+    parser.add_argument("-d", "--days", type=int, default=14, help="模拟天数")
+    parser.add_argument("-i", "--interval", type=int, default=30, help="用户设置的更新间隔（分钟）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    total_fixed = total_adaptive = 0
+    feeds = []
+    async with RSSCrawler(None) as crawler:
+        print(f"模拟{args.days}天，用户设置间隔{args.interval}分钟，最大间隔{crawler.rss_max_feed_interval}分钟")
+        for name, mean_interval in FEED_PROFILES:
+            arrivals = make_arrivals(mean_interval, args.days, rng)
+            fixed, fixed_delays, _ = simulate(crawler, name, arrivals, args.interval, args.days, adaptive=False)
+            adaptive, adaptive_delays, feed = simulate(crawler, name, arrivals, args.interval, args.days,
+                                                       adaptive=True)
+            total_fixed += fixed
+            total_adaptive += adaptive
+            feeds.append(feed)
+
+            def average_delay(delays):
+                return f"{sum(delays) / len(delays) / 60:.0f}分钟" if delays else "-"
+
+            print(f"{name:>6}: {len(arrivals):>4}条新条目，抓取次数 {fixed:>4} -> {adaptive:>4}，"
+                  f"平均延迟 {average_delay(fixed_delays)} -> {average_delay(adaptive_delays)}，"
+                  f"最终间隔 {crawler.effective_interval(feed)}分钟")
+
+        saved = sum(60 / feed['current_interval'] - 60 / crawler.effective_interval(feed) for feed in feeds)
+        print(f"合计抓取次数 {total_fixed} -> {total_adaptive}，"
+              f"节省 {1 - total_adaptive / total_fixed:.0%}；按最终间隔计每小时节省 {saved:.1f}次抓取")
+    await close_http_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
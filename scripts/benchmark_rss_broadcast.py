@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import handler.handle_rss_subscription as rss_subscription
+from handler.handle_rss_subscription import RSSCrawler
+from utils.http_client import close_http_session
+from utils.message_dispatcher import MessageDispatcher
+from utils.redis_utils import get_async_redis, close_async_redis
+from utils.send_message_with_log import post_with_log
+
+# 注意：这个脚本需要本地Redis（与config.yaml中的配置一致），用于出站调度器的配额计数，测试用的键结束后删除。
+# 用统计每个子频道收到消息的假client验证RSS推送：每个RSS项在每个订阅的子频道恰好出现一次。
+# 同时给出旧实现（每个订阅都向全部订阅的子频道发送一遍）的发送次数作为对比。
+
+
+class CountingAPI:
+    def __init__(self, latency):
+        self.latency = latency
+        self.posts = defaultdict(list)
+
+    async def post_message(self, channel_id, content, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.posts[channel_id].append(content)
+
+
+class CountingClient:
+    def __init__(self, latency):
+        self.api = CountingAPI(latency)
+
+
+def make_fixture(subscriptions, items):
+    subscription_rows = [{"guild_id": "benchmark-guild", "channel_id": f"benchmark-broadcast-{i}",
+                          "custom_name": f"订阅{i}"} for i in range(subscriptions)]
+    item_rows = [{"rss_item_id": i, "title": f"第{i}条 &amp; 标题", "link": f"http://example.com/item/{i}",
+                  "description": f"<p>第{i}条<b>内容</b></p>", "published_date": datetime(2023, 10, 2, 8, 0)}
+                 for i in range(items)]
+    return subscription_rows, item_rows
+
+
+async def legacy_broadcast(client, crawler, item_rows, subscription_rows):
+    # 旧实现：外层遍历订阅，内层send_rss_item又向全部订阅发送一遍
+    for _ in subscription_rows:
+        for rss_item in item_rows:
+            for subscription in subscription_rows:
+                rendered = crawler.render_rss_item(rss_item)
+                message = rss_subscription.RSS_MESSAGE_TEMPLATE.format(custom_name=subscription['custom_name'],
+                                                                       **rendered)
+                await post_with_log(client, subscription['channel_id'], message)
+
+
+async def broadcast(client, crawler, item_rows, subscription_rows):
+    pending = []
+    for rss_item in item_rows:
+        pending.extend(await crawler.broadcast_rss_item(client, rss_item, subscription_rows))
+    return [await future for _, future in pending]
+
+
+def count_links(posts):
+    pattern = re.compile(r"http://example\.com/item/\d+")
+    return {channel_id: Counter(link for content in contents for link in pattern.findall(content))
+            for channel_id, contents in posts.items()}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="验证RSS推送对每个子频道只发送一次")
+    parser.add_argument("-s", "--subscriptions", type=int, default=5, help="订阅（子频道）数量")
+    parser.add_argument("-i", "--items", type=int, default=10, help="RSS项数量")
+    parser.add_argument("-l", "--latency", type=float, default=0.01, help="每次发送的模拟延迟（秒）")
+    args = parser.parse_args()
+
+    logging.getLogger("botpy").setLevel(logging.WARNING)
+    subscription_rows, item_rows = make_fixture(args.subscriptions, args.items)
+    # 放宽调度器限制，只验证发送次数
+    rss_subscription.dispatcher = MessageDispatcher(rate=10000, burst=10000, daily_quota=10 ** 6)
+
+    try:
+        async with RSSCrawler(None) as crawler:
+            crawler.time_range_start, crawler.time_range_end = "00:00", "23:59"
+
+            client = CountingClient(args.latency)
+            start = time.perf_counter()
+            await legacy_broadcast(client, crawler, item_rows, subscription_rows)
+            posts = sum(len(contents) for contents in client.api.posts.values())
+            print(f"旧实现: 发送{posts}条消息，耗时{time.perf_counter() - start:.2f}s")
+
+            client = CountingClient(args.latency)
+            start = time.perf_counter()
+            results = await broadcast(client, crawler, item_rows, subscription_rows)
+            posts = sum(len(contents) for contents in client.api.posts.values())
+            print(f"广播: 发送{posts}条消息，耗时{time.perf_counter() - start:.2f}s")
+
+            assert all(results)
+            links = count_links(client.api.posts)
+            assert set(links) == {subscription['channel_id'] for subscription in subscription_rows}
+            for channel_id, counter in links.items():
+                assert len(counter) == args.items and set(counter.values()) == {1}, f"{channel_id}: {counter}"
+            print("校验通过：每个RSS项在每个子频道恰好发送一次")
+    finally:
+        await get_async_redis().delete(*[f"msg_quota:{subscription['channel_id']}" for subscription in subscription_rows])
+        await close_async_redis()
+        await close_http_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
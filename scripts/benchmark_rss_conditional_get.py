@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmark_rss_crawler import make_feed
+from handler.handle_rss_subscription import RSSCrawler
+from utils.http_client import close_http_session
+
+# 在本地aiohttp桩服务器上验证RSS条件请求：偶数编号的源支持ETag并返回304，奇数编号的源不带校验头，
+# 只能依靠正文哈希判断是否变化。连续抓取三轮，第三轮修改部分源的内容，检查跳过解析的统计是否正确。
+
+
+async def start_stub_server(feeds, items):
+    bodies = [make_feed(feed_id, items) for feed_id in range(feeds)]
+    versions = [0] * feeds
+
+    async def handle(request):
+        feed_id = int(request.match_info['feed_id'])
+        if feed_id % 2:
+            return web.Response(text=bodies[feed_id], content_type="application/rss+xml")
+        etag = f'"{feed_id}-{versions[feed_id]}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(text=bodies[feed_id], content_type="application/rss+xml", headers={'ETag': etag})
+
+    def modify(feed_id):
+        versions[feed_id] += 1
+        bodies[feed_id] = make_feed(feed_id, items + versions[feed_id])
+
+    app = web.Application()
+    app.router.add_get("/feed/{feed_id}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port, modify
+
+
+async def crawl_round(crawler, feeds):
+    # 与RSSCrawler.process_feed中不涉及数据库的部分一致
+    parsed = 0
+
+    async def process(feed):
+        nonlocal parsed
+        result = await crawler.fetch_feed(feed)
+        assert result is not None, f"获取{feed['url']}失败"
+        if not crawler.is_feed_unchanged(feed, result):
+            await crawler.parse_rss(result['body'])
+            parsed += 1
+        feed['etag'] = result['etag']
+        feed['last_modified'] = result['last_modified']
+        feed['content_hash'] = result['content_hash'] or feed.get('content_hash')
+
+    start = time.perf_counter()
+    await asyncio.gather(*[process(feed) for feed in feeds])
+    return parsed, time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="验证RSS条件请求与正文哈希跳过解析")
+    parser.add_argument("-f", "--feeds", type=int, default=200, help="RSS源数量")
+    parser.add_argument("-i", "--items", type=int, default=50, help="每个源的条目数")
+    parser.add_argument("-m", "--modified", type=int, default=10, help="第三轮修改的源数量")
+    args = parser.parse_args()
+
+    runner, port, modify = await start_stub_server(args.feeds, args.items)
+    feeds = [{"rss_feed_id": feed_id, "url": f"http://127.0.0.1:{port}/feed/{feed_id}"}
+             for feed_id in range(args.feeds)]
+
+    try:
+        async with RSSCrawler(None) as crawler:
+            crawler.rss_fetch_per_host = crawler.rss_fetch_concurrency
+
+            parsed, elapsed = await crawl_round(crawler, feeds)
+            print(f"第一轮：解析{parsed}个源，耗时{elapsed:.2f}s")
+            assert parsed == args.feeds
+
+            parsed, elapsed = await crawl_round(crawler, feeds)
+            print(f"第二轮：解析{parsed}个源，耗时{elapsed:.2f}s")
+            assert parsed == 0
+            assert crawler.stats["not_modified"] == (args.feeds + 1) // 2
+            assert crawler.stats["unchanged"] == args.feeds // 2
+
+            # 奇偶各修改一半，两种判断方式都需要发现变化
+            modified = list(range(args.modified))
+            for feed_id in modified:
+                modify(feed_id)
+            parsed, elapsed = await crawl_round(crawler, feeds)
+            print(f"第三轮：修改{len(modified)}个源后解析{parsed}个源，耗时{elapsed:.2f}s")
+            assert parsed == len(modified)
+
+            print("统计:", crawler.stats)
+            print("校验通过")
+    finally:
+        await runner.cleanup()
+        await close_http_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
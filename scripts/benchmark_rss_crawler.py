@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from aiohttp import web
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from handler.handle_rss_subscription import RSSCrawler
+from utils.http_client import close_http_session
+
+# 在本地启动一个aiohttp桩服务器，提供若干个带随机延迟的RSS源，
+# 对比旧的逐个抓取+解析方式与新的并发抓取阶段的总耗时。不需要MySQL和QQ机器人。
+
+
+def make_feed(feed_id, items):
+    entries = "".join(
+        f"<item><title>源{feed_id} 第{i}条</title><link>http://example.com/{feed_id}/{i}</link>"
+        f"<description>&lt;p&gt;第{i}条内容&lt;/p&gt;</description>"
+        f"<pubDate>Mon, 02 Oct 2023 08:00:00 +0800</pubDate></item>"
+        for i in range(items))
+    return f"<?xml version=\"1.0\"?><rss version=\"2.0\"><channel><title>源{feed_id}</title>{entries}</channel></rss>"
+
+
+async def start_stub_server(feeds, items, min_latency, max_latency, seed):
+    rng = random.Random(seed)
+    latencies = [rng.uniform(min_latency, max_latency) for _ in range(feeds)]
+    bodies = [make_feed(feed_id, items) for feed_id in range(feeds)]
+
+    async def handle(request):
+        feed_id = int(request.match_info['feed_id'])
+        await asyncio.sleep(latencies[feed_id])
+        return web.Response(text=bodies[feed_id], content_type="application/rss+xml")
+
+    app = web.Application()
+    app.router.add_get("/feed/{feed_id}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port, sum(latencies)
+
+
+async def serial_crawl(crawler, urls):
+    # 旧实现：逐个抓取和解析，总耗时约为所有源延迟之和
+    parsed = 0
+    for url in urls:
+        result = await crawler.fetch_rss(crawler.session, url)
+        if result is not None:
+            parsed += len(await crawler.parse_rss(result['body']))
+    return parsed
+
+
+async def concurrent_crawl(crawler, urls):
+    # 新实现：受总并发和单主机并发限制的并发抓取，解析在线程池中进行
+    async def process(url):
+        result = await crawler.fetch_feed({"url": url})
+        if result is None:
+            return 0
+        return len(await crawler.parse_rss(result['body']))
+
+    return sum(await asyncio.gather(*[process(url) for url in urls]))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比串行与并发RSS抓取的总耗时")
+    parser.add_argument("-f", "--feeds", type=int, default=500, help="RSS源数量")
+    parser.add_argument("-i", "--items", type=int, default=20, help="每个源的条目数")
+    parser.add_argument("--min-latency", type=float, default=0.05, help="最小注入延迟（秒）")
+    parser.add_argument("--max-latency", type=float, default=0.5, help="最大注入延迟（秒）")
+    parser.add_argument("--serial-feeds", type=int, default=50, help="串行方式只抓取前若干个源，总耗时按比例估算")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    runner, port, total_latency = await start_stub_server(
+        args.feeds, args.items, args.min_latency, args.max_latency, args.seed)
+    urls = [f"http://127.0.0.1:{port}/feed/{feed_id}" for feed_id in range(args.feeds)]
+    print(f"{args.feeds}个RSS源，注入延迟合计 {total_latency:.1f}s")
+
+    try:
+        async with RSSCrawler(None) as crawler:
+            # 桩服务器只有一个主机，这里放开单主机限制，以模拟来自不同站点的源
+            crawler.rss_fetch_per_host = crawler.rss_fetch_concurrency
+
+            serial_urls = urls[:args.serial_feeds]
+            start = time.perf_counter()
+            parsed = await serial_crawl(crawler, serial_urls)
+            elapsed = time.perf_counter() - start
+            print(f"串行抓取: {len(serial_urls)}个源 {elapsed:.2f}s，解析{parsed}条，"
+                  f"估算{args.feeds}个源需 {elapsed * args.feeds / len(serial_urls):.1f}s")
+
+            start = time.perf_counter()
+            parsed = await concurrent_crawl(crawler, urls)
+            print(f"并发抓取（并发上限{crawler.rss_fetch_concurrency}）: {args.feeds}个源 "
+                  f"{time.perf_counter() - start:.2f}s，解析{parsed}条")
+    finally:
+        await runner.cleanup()
+        await close_http_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
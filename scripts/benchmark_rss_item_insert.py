@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from handler.handle_rss_subscription import RSSCrawler
+from utils.http_client import close_http_session
+from utils.mysql_utils import get_async_mysql_conn
+from utils.parse_date import parse_date
+
+# 注意：这个脚本需要本地MySQL（与config.yaml中的配置一致）。
+# 构造若干个RSS源及其条目，分别用旧的逐条 SELECT + INSERT + commit 和新的批量去重插入写入rss_item，
+# 每种方式都写两遍（第二遍全部是已存在的条目），测试数据结束后删除。
+
+BENCHMARK_URL_PREFIX = "http://benchmark.invalid/rss-item-insert/"
+
+
+def make_entries(feeds, items):
+    return {
+        feed_index: [{
+            "title": f"源{feed_index} 第{i}条",
+            "link": f"{BENCHMARK_URL_PREFIX}{feed_index}/{i}",
+            "description": f"<p>源{feed_index} 第{i}条内容</p>",
+            "published": "Mon, 02 Oct 2023 08:00:00 +0800",
+        } for i in range(items)]
+        for feed_index in range(feeds)
+    }
+
+
+async def legacy_save(crawler, rss_feed_id, entries):
+    # 旧实现：每个条目一次查询、一次插入、一次提交
+    conn = await get_async_mysql_conn()
+    try:
+        async with conn.cursor() as cursor:
+            for rss_item in entries:
+                await cursor.execute("SELECT * FROM rss_item WHERE link = %s", (rss_item['link'],))
+                if not await cursor.fetchone():
+                    published_date = parse_date(rss_item['published'])
+                    title = crawler.truncate_string(rss_item['title'], crawler.rss_truncate_length)
+                    link = crawler.truncate_string(rss_item['link'], crawler.rss_truncate_length)
+                    description = crawler.clean_html(rss_item.get('description', ''))[:1000]
+                    await cursor.execute(
+                        "INSERT INTO rss_item (rss_feed_id, title, link, description, published_date) VALUES (%s, %s, %s, %s, %s)",
+                        (rss_feed_id, title, link, description, published_date))
+                    await conn.commit()
+    finally:
+        await conn.close()
+
+
+async def create_feeds(count):
+    conn = await get_async_mysql_conn()
+    try:
+        feed_ids = []
+        async with conn.cursor() as cursor:
+            for feed_index in range(count):
+                await cursor.execute("INSERT INTO rss_feed (url) VALUES (%s)", (f"{BENCHMARK_URL_PREFIX}{feed_index}",))
+                feed_ids.append(cursor.lastrowid)
+        await conn.commit()
+        return feed_ids
+    finally:
+        await conn.close()
+
+
+async def cleanup():
+    conn = await get_async_mysql_conn()
+    try:
+        async with conn.cursor() as cursor:
+            await cursor.execute("DELETE FROM rss_item WHERE link LIKE %s", (BENCHMARK_URL_PREFIX + "%",))
+            await cursor.execute("DELETE FROM rss_feed WHERE url LIKE %s", (BENCHMARK_URL_PREFIX + "%",))
+        await conn.commit()
+    finally:
+        await conn.close()
+
+
+async def count_items():
+    conn = await get_async_mysql_conn()
+    try:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT COUNT(*) AS count FROM rss_item WHERE link LIKE %s", (BENCHMARK_URL_PREFIX + "%",))
+            return (await cursor.fetchone())['count']
+    finally:
+        await conn.close()
+
+
+async def run(name, save, feed_ids, entries):
+    for round_name in ("首次写入", "重复写入"):
+        start = time.perf_counter()
+        for feed_index, rss_feed_id in enumerate(feed_ids):
+            await save(rss_feed_id, entries[feed_index])
+        print(f"{name}（{round_name}）: {time.perf_counter() - start:.2f}s，当前条目数 {await count_items()}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比逐条与批量写入RSS条目的耗时")
+    parser.add_argument("-f", "--feeds", type=int, default=100, help="RSS源数量")
+    parser.add_argument("-i", "--items", type=int, default=50, help="每个源的条目数")
+    args = parser.parse_args()
+
+    entries = make_entries(args.feeds, args.items)
+    async with RSSCrawler(None) as crawler:
+        try:
+            await cleanup()
+            feed_ids = await create_feeds(args.feeds)
+            await run("逐条写入", lambda feed_id, items: legacy_save(crawler, feed_id, items), feed_ids, entries)
+
+            await cleanup()
+            feed_ids = await create_feeds(args.feeds)
+            await run("批量写入", crawler.save_rss_items, feed_ids, entries)
+        finally:
+            await cleanup()
+    await close_http_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmark_rss_crawler import make_feed
+from handler.handle_rss_subscription import RSSCrawler
+from utils.http_client import close_http_session
+
+# 对比线程池与进程池两种解析模式在不同工作数下解析同一批RSS源的总耗时，
+# 同时记录解析期间事件循环的最大卡顿。不需要MySQL和QQ机器人，多核机器上才能看出进程池的扩展性。
+
+
+def make_corpus(feeds, min_items, max_items, seed):
+    rng = random.Random(seed)
+    return [make_feed(feed_id, rng.randint(min_items, max_items)).encode() for feed_id in range(feeds)]
+
+
+async def measure_loop_lag(stop, interval=0.01):
+    # 定时器本应每interval秒醒来一次，实际多等待的时间即事件循环被阻塞的时间
+    max_lag = 0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, loop.time() - start - interval)
+    return max_lag
+
+
+async def run(crawler, corpus):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(*[crawler.parse_rss(body) for body in corpus])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return results, elapsed, await lag_task
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比线程池与进程池解析RSS的扩展性")
+    parser.add_argument("-f", "--feeds", type=int, default=500, help="RSS源数量")
+    parser.add_argument("--min-items", type=int, default=10, help="每个源的最少条目数")
+    parser.add_argument("--max-items", type=int, default=60, help="每个源的最多条目数")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="工作线程/进程数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.feeds, args.min_items, args.max_items, args.seed)
+    print(f"{len(corpus)}个RSS源，共{sum(len(body) for body in corpus) / 1024 / 1024:.1f}MB，CPU核数 {os.cpu_count()}")
+
+    async with RSSCrawler(None) as crawler:
+        expected = None
+        for mode in ("thread", "process"):
+            for workers in args.workers:
+                crawler.executor.shutdown()
+                crawler.rss_parse_mode = mode
+                crawler.rss_parse_max_workers = workers
+                crawler.executor = crawler.create_parse_executor()
+
+                # 预热：进程池需要先启动子进程并导入feedparser
+                await asyncio.gather(*[crawler.parse_rss(body) for body in corpus[:workers]])
+
+                results, elapsed, max_lag = await run(crawler, corpus)
+                if expected is None:
+                    expected = results
+                consistent = "一致" if results == expected else "不一致"
+                print(f"{mode:>7} x{workers}: {elapsed:.2f}s，{len(corpus) / elapsed:.0f}源/s，"
+                      f"事件循环最大卡顿 {max_lag * 1000:.0f}ms，解析结果{consistent}")
+    await close_http_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.channel_utils import get_channel_name_from_redis
+from utils.guild_utils import get_guild_detail_from_redis
+from utils.redis_utils import close_async_redis, get_async_redis
+from utils.roles import get_guild_roles
+from utils.single_flight import single_flight
+
+# 模拟大频道中大量消息同时未命中缓存：用带注入延迟、统计调用次数的桩API代替QQ接口，
+# 对比未合并（被装饰前的函数）与合并后100个并发调用实际请求上游的次数和耗时，并校验负缓存、过期抖动和异常传播。
+# 需要Redis，不需要MySQL和QQ机器人。
+
+GUILD_ID = "benchmark-guild"
+CHANNEL_ID = "benchmark-channel"
+
+
+class StubApi:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = {}
+
+    async def call(self, name, result):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await asyncio.sleep(self.latency)
+        return result
+
+    async def get_guild(self, guild_id):
+        return await self.call("get_guild", {"id": guild_id, "name": "小千测试频道"})
+
+    async def get_channel(self, channel_id):
+        return await self.call("get_channel", {"id": channel_id, "name": "公告"})
+
+    async def get_guild_roles(self, guild_id):
+        return await self.call("get_guild_roles", {"roles": [{"id": "4", "name": "创建者"}]})
+
+
+class StubClient:
+    def __init__(self, latency):
+        self.api = StubApi(latency)
+
+
+CASES = [
+    ("get_guild_detail_from_redis", get_guild_detail_from_redis, "get_guild", (GUILD_ID,),
+     [f"guild_detail:{GUILD_ID}"]),
+    ("get_channel_name_from_redis", get_channel_name_from_redis, "get_channel", (GUILD_ID, CHANNEL_ID),
+     [f"channel_name:{GUILD_ID}:{CHANNEL_ID}"]),
+    ("get_guild_roles", get_guild_roles, "get_guild_roles", (GUILD_ID,), [f"guild_roles:{GUILD_ID}"]),
+]
+
+
+async def burst(func, client, args, concurrency):
+    start = time.perf_counter()
+    results = await asyncio.gather(*[func(client, *args) for _ in range(concurrency)])
+    assert all(result == results[0] for result in results), results
+    return (time.perf_counter() - start) * 1000
+
+
+async def check_semantics():
+    calls = []
+
+    @single_flight(ttl=0.2, negative_ttl=0.1, jitter=0.5)
+    async def load(name):
+        calls.append(name)
+        await asyncio.sleep(0.01)
+        if name == "error":
+            raise ValueError("上游错误")
+        return None if name == "missing" else name
+
+    # 缓存期内直接返回，过期时间带抖动，最长不超过ttl * (1 + jitter)
+    await load("found")
+    await load("found")
+    assert calls.count("found") == 1, calls
+    await asyncio.sleep(0.31)
+    await load("found")
+    assert calls.count("found") == 2, calls
+
+    # None按negative_ttl缓存
+    await load("missing")
+    await load("missing")
+    assert calls.count("missing") == 1, calls
+    await asyncio.sleep(0.16)
+    await load("missing")
+    assert calls.count("missing") == 2, calls
+
+    # 异常抛给所有并发调用方，但不缓存
+    results = await asyncio.gather(*[load("error") for _ in range(10)], return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results), results
+    await asyncio.gather(*[load("error") for _ in range(10)], return_exceptions=True)
+    assert calls.count("error") == 2, calls
+
+    # 一个调用方被取消不影响其他调用方
+    first = asyncio.create_task(load("shared"))
+    second = asyncio.create_task(load("shared"))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "shared"
+    assert calls.count("shared") == 1, calls
+    print("校验通过：结果缓存、负缓存、过期抖动、异常传播、取消隔离")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="统计并发未命中缓存时实际请求上游的次数")
+    parser.add_argument("-c", "--concurrency", type=int, default=100, help="并发调用数")
+    parser.add_argument("-l", "--latency", type=float, default=0.2, help="上游接口的注入延迟（秒）")
+    args = parser.parse_args()
+
+    r = get_async_redis()
+    try:
+        for name, func, api_name, func_args, keys in CASES:
+            timings = []
+            calls = []
+            for variant in (func.__wrapped__, func):
+                await r.delete(*keys)
+                client = StubClient(args.latency)
+                timings.append(await burst(variant, client, func_args, args.concurrency))
+                calls.append(client.api.calls.get(api_name, 0))
+            assert calls[1] == 1, calls
+            print(f"{name}: {args.concurrency}个并发未命中，未合并请求上游{calls[0]}次（{timings[0]:.0f}ms），"
+                  f"合并后{calls[1]}次（{timings[1]:.0f}ms）")
+            await r.delete(*keys)
+        await check_semantics()
+    finally:
+        await close_async_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.task_supervisor import TaskSupervisor
+
+# 负载测试：按目标速率回放合成的消息事件，其中一个频道刷屏，占大部分消息。
+# 消息处理需要占用容量有限的共享资源（模拟数据库连接池或上游接口），对比
+# 旧的分发方式（每条消息直接create_task）与任务监督器在峰值任务数、各频道处理延迟和拒绝数上的差异。
+# 不需要MySQL、Redis和QQ机器人。
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Replay:
+    def __init__(self, args):
+        self.args = args
+        self.resource = asyncio.Semaphore(args.capacity)
+        self.latencies = {"noisy": [], "quiet": []}
+        self.shed = {"noisy": 0, "quiet": 0}
+        self.peak_tasks = 0
+
+    async def handle(self, kind, received_at):
+        async with self.resource:
+            await asyncio.sleep(self.args.service_time)
+        self.latencies[kind].append(time.perf_counter() - received_at)
+
+    async def reply_busy(self, kind):
+        self.shed[kind] += 1
+
+    def events(self):
+        rng = random.Random(0)
+        total = int(self.args.rate * self.args.duration)
+        for i in range(total):
+            if rng.random() < self.args.noisy_share:
+                yield i, "noisy", "guild-noisy"
+            else:
+                yield i, "quiet", f"guild-{rng.randrange(self.args.guilds)}"
+
+    async def run(self, dispatch):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for i, kind, guild_id in self.events():
+            delay = start + i / self.args.rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            dispatch(kind, guild_id, time.perf_counter())
+            self.peak_tasks = max(self.peak_tasks, len(asyncio.all_tasks()))
+
+    def report(self, name, elapsed):
+        parts = []
+        for kind in ("quiet", "noisy"):
+            latencies = self.latencies[kind]
+            parts.append(f"{'其他频道' if kind == 'quiet' else '刷屏频道'} 完成{len(latencies)}条 拒绝{self.shed[kind]}条 "
+                         f"p50 {percentile(latencies, 0.5) * 1000:.0f}ms p95 {percentile(latencies, 0.95) * 1000:.0f}ms")
+        print(f"{name}: 用时{elapsed:.1f}s，峰值任务数{self.peak_tasks}\n  " + "\n  ".join(parts))
+
+
+async def run_legacy(args):
+    replay = Replay(args)
+    tasks = []
+
+    def dispatch(kind, guild_id, received_at):
+        # 旧实现：直接create_task，没有上限
+        tasks.append(asyncio.create_task(replay.handle(kind, received_at)))
+
+    start = time.perf_counter()
+    await replay.run(dispatch)
+    await asyncio.gather(*tasks)
+    replay.report("直接create_task", time.perf_counter() - start)
+
+
+async def run_supervised(args):
+    replay = Replay(args)
+    supervisor = TaskSupervisor()
+    supervisor.config = dict(supervisor.config, classes={"default": {
+        "concurrency": args.capacity,
+        "max_pending": args.max_pending,
+        "max_pending_per_guild": args.max_pending_per_guild,
+        "timeout": 60,
+    }})
+
+    def dispatch(kind, guild_id, received_at):
+        supervisor.submit("default", guild_id, "/问", lambda: replay.handle(kind, received_at),
+                          on_shed=lambda: replay.reply_busy(kind))
+
+    start = time.perf_counter()
+    await replay.run(dispatch)
+    task_class = supervisor.get_class("default")
+    while task_class.pending or task_class.running or supervisor.tasks:
+        await asyncio.sleep(0.01)
+    replay.report("任务监督器", time.perf_counter() - start)
+    stats = supervisor.snapshot()["default"]
+    print(f"  统计：提交{stats['submitted']} 完成{stats['completed']} 拒绝{stats['shed']} "
+          f"平均排队{stats['wait_avg'] * 1000:.0f}ms 平均执行{stats['run_avg'] * 1000:.0f}ms")
+    await supervisor.close()
+    return replay
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="按目标速率回放合成消息，对比直接create_task与任务监督器")
+    parser.add_argument("-r", "--rate", type=float, default=300, help="每秒消息数")
+    parser.add_argument("-d", "--duration", type=float, default=5, help="回放时长（秒）")
+    parser.add_argument("-c", "--capacity", type=int, default=10, help="共享资源的并发容量")
+    parser.add_argument("-s", "--service-time", type=float, default=0.05, help="每条消息占用共享资源的时间（秒）")
+    parser.add_argument("-g", "--guilds", type=int, default=20, help="其他频道的数量")
+    parser.add_argument("--noisy-share", type=float, default=0.8, help="刷屏频道的消息占比")
+    parser.add_argument("--max-pending", type=int, default=200)
+    parser.add_argument("--max-pending-per-guild", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"回放{args.rate:.0f}条/秒，共{int(args.rate * args.duration)}条，共享资源最多处理"
+          f"{args.capacity / args.service_time:.0f}条/秒，刷屏频道占{args.noisy_share:.0%}")
+    await run_legacy(args)
+    replay = await run_supervised(args)
+    quiet = replay.latencies["quiet"]
+    assert replay.shed["quiet"] == 0, replay.shed
+    assert percentile(quiet, 0.95) < 1.0, percentile(quiet, 0.95)
+    print("校验通过：其他频道的消息没有被拒绝，p95延迟低于1秒")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
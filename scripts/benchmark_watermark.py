@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image, ImageChops, ImageDraw
+
+# 将项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# 字体等资源按项目根目录的相对路径加载
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.watermark import Watermark, dense_tile
+
+# 对比旧的密集水印实现与缓存并裁剪平铺单元后的实现的耗时，并逐像素比较两者的输出。
+# 只统计绘制水印的耗时，不包括打开和保存图片。
+# 不需要MySQL和QQ机器人。
+
+SIZES = {
+    "1080p截图": (1080, 2400),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+}
+
+
+def legacy_dense(font, img, watermark_text):
+    # 旧实现：逐个单元paste
+    width, height = img.size
+    min_distance = 125
+    text_width, text_height = font.getsize(watermark_text)
+
+    txt_img = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
+    txt_draw = ImageDraw.Draw(txt_img)
+    txt_draw.text((0, 0), watermark_text, font=font, fill=(128, 128, 128, 128))
+    txt_img = txt_img.rotate(45, expand=True)
+
+    rotated_width, rotated_height = txt_img.size
+    rotated_width = max(rotated_width, min_distance)
+    rotated_height = max(rotated_height, min_distance)
+
+    for x in range(-rotated_width, width, rotated_width):
+        for y in range(-rotated_height, height, rotated_height):
+            img.paste(txt_img, (x, y), txt_img)
+    return img
+
+
+def make_image(width, height):
+    return Image.effect_noise((width, height), 48).convert('RGBA')
+
+
+def timeit(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比密集水印两种实现的耗时，并逐像素比较输出")
+    parser.add_argument("-r", "--rounds", type=int, default=10, help="每种尺寸的重复次数")
+    parser.add_argument("-t", "--texts", nargs="+", default=["小千问答", "XiaoqianBot", "仅供本频道使用"],
+                        help="水印文字")
+    args = parser.parse_args()
+
+    renderer = Watermark()
+    for name, (width, height) in SIZES.items():
+        base = make_image(width, height)
+        for watermark_text in args.texts:
+            # 逐像素比较
+            expected = legacy_dense(renderer.font, base.copy(), watermark_text)
+            actual = renderer.apply(base.copy(), watermark_text, dense=True)
+            diff = ImageChops.difference(expected, actual).getbbox()
+            if diff is not None:
+                raise AssertionError(f"{name} {watermark_text}: 输出不一致，差异区域 {diff}")
+
+        watermark_text = args.texts[0]
+        legacy = timeit(lambda: legacy_dense(renderer.font, base.copy(), watermark_text), args.rounds)
+        copy = timeit(base.copy, args.rounds)
+
+        def cold():
+            dense_tile.cache_clear()
+            renderer.apply(base.copy(), watermark_text, dense=True)
+
+        cold_time = timeit(cold, args.rounds)
+        warm_time = timeit(lambda: renderer.apply(base.copy(), watermark_text, dense=True), args.rounds)
+        step_x, step_y = dense_tile(renderer.font, watermark_text)[2]
+        tiles = len(range(-step_x, width, step_x)) * len(range(-step_y, height, step_y))
+        print(f"{name} {width}x{height}（{tiles}个单元）: 旧实现 {legacy - copy:.1f}ms，"
+              f"新实现首次 {cold_time - copy:.1f}ms，命中缓存 {warm_time - copy:.1f}ms，输出逐像素一致")
+
+
+if __name__ == "__main__":
+    main()
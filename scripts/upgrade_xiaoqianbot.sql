@@ -0,0 +1,32 @@
+-- 已有数据库的升级语句，按顺序执行尚未执行过的部分。新建数据库直接导入 xiaoqianbot.sql 即可。
+
+-- ----------------------------
+-- rss_feed：条件请求与内容哈希
+-- ----------------------------
+ALTER TABLE `rss_feed`
+  ADD COLUMN `etag` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL,
+  ADD COLUMN `last_modified` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL,
+  ADD COLUMN `content_hash` char(40) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL;
+
+-- ----------------------------
+-- rss_item：按链接批量去重
+-- ----------------------------
+ALTER TABLE `rss_item`
+  ADD INDEX `link`(`link`) USING BTREE;
+
+-- ----------------------------
+-- rss_item / rss_item_delivery：推送计划与过期清理
+-- ----------------------------
+ALTER TABLE `rss_item`
+  ADD COLUMN `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE `rss_item_delivery`
+  ADD INDEX `rss_item_channel`(`rss_item_id`, `channel_id`) USING BTREE,
+  DROP INDEX `rss_item_id`;
+
+-- ----------------------------
+-- rss_feed：按更新频率自适应抓取间隔
+-- ----------------------------
+ALTER TABLE `rss_feed`
+  ADD COLUMN `poll_interval` int(11) NOT NULL DEFAULT 30,
+  ADD COLUMN `update_interval_ewma` int(11) NULL DEFAULT NULL,
+  ADD COLUMN `last_new_item` timestamp NULL DEFAULT NULL;
@@ -131,6 +131,12 @@ CREATE TABLE `rss_feed`  (
   `last_updated` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `last_blocked` timestamp NULL DEFAULT NULL,
   `block_level` int(11) NOT NULL DEFAULT 0,
+  `etag` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL,
+  `last_modified` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL,
+  `content_hash` char(40) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL,
+  `poll_interval` int(11) NOT NULL DEFAULT 30,
+  `update_interval_ewma` int(11) NULL DEFAULT NULL,
+  `last_new_item` timestamp NULL DEFAULT NULL,
   PRIMARY KEY (`rss_feed_id`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 12 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci ROW_FORMAT = Dynamic;
 
@@ -144,8 +150,10 @@ CREATE TABLE `rss_item`  (
   `link` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NOT NULL,
   `description` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NOT NULL,
   `published_date` datetime NULL DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`rss_item_id`) USING BTREE,
   INDEX `rss_feed_id`(`rss_feed_id`) USING BTREE,
+  INDEX `link`(`link`) USING BTREE,
   CONSTRAINT `rss_item_ibfk_1` FOREIGN KEY (`rss_feed_id`) REFERENCES `rss_feed` (`rss_feed_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB AUTO_INCREMENT = 200 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci ROW_FORMAT = Dynamic;
 
@@ -158,7 +166,7 @@ CREATE TABLE `rss_item_delivery`  (
   `guild_id` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NOT NULL,
   `channel_id` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NOT NULL,
   PRIMARY KEY (`rss_item_delivery_id`) USING BTREE,
-  INDEX `rss_item_id`(`rss_item_id`) USING BTREE,
+  INDEX `rss_item_channel`(`rss_item_id`, `channel_id`) USING BTREE,
   CONSTRAINT `rss_item_delivery_ibfk_1` FOREIGN KEY (`rss_item_id`) REFERENCES `rss_item` (`rss_item_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB AUTO_INCREMENT = 68 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci ROW_FORMAT = Dynamic;
 
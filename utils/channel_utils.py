@@ -1,19 +1,21 @@
-from utils.redis_utils import RedisConnection
+from utils.redis_utils import get_async_redis
+from utils.single_flight import single_flight
 
 
 async def save_channel_name_to_redis(client, guild_id, channel_id):
     channel = await client.api.get_channel(channel_id=channel_id)
     channel_name = channel["name"]
-    redis_conn = RedisConnection().get_connection()
-    redis_conn.set(f"channel_name:{guild_id}:{channel_id}", channel_name, ex=86400)  # 存储1天
+    redis_conn = get_async_redis()
+    await redis_conn.set(f"channel_name:{guild_id}:{channel_id}", channel_name, ex=86400)  # 存储1天
 
 
+@single_flight(key=lambda client, guild_id, channel_id: (guild_id, channel_id))
 async def get_channel_name_from_redis(client, guild_id, channel_id):
-    redis_conn = RedisConnection().get_connection()
-    channel_name_bytes = redis_conn.get(f"channel_name:{guild_id}:{channel_id}")
+    redis_conn = get_async_redis()
+    channel_name_bytes = await redis_conn.get(f"channel_name:{guild_id}:{channel_id}")
     if channel_name_bytes is not None:
         return channel_name_bytes.decode('utf-8')
     else:
         await save_channel_name_to_redis(client, guild_id, channel_id)
-        channel_name_bytes = redis_conn.get(f"channel_name:{guild_id}:{channel_id}")
+        channel_name_bytes = await redis_conn.get(f"channel_name:{guild_id}:{channel_id}")
         return channel_name_bytes.decode('utf-8') if channel_name_bytes else None
@@ -0,0 +1,205 @@
+import re
+
+# 命令为“/”加上连续的字母、数字、下划线或中文，与原先的匹配规则一致
+_COMMAND_PATTERN = re.compile(r"/\w+")
+_TOKEN_PATTERN = re.compile(r"\S+")
+
+
+def digits(value, label):
+    if not value.isdigit():
+        raise ValueError(f"<{label}>必须是数字")
+    return value
+
+
+class Arg:
+    """
+    子命令的一个参数。kind为校验函数，接收(值, 参数名)，校验失败时抛出ValueError；
+    choices限定可选值；rest为True时取剩余的全部原文（保留换行），只能是最后一个参数。
+    """
+
+    def __init__(self, label, kind=None, optional=False, choices=None, rest=False):
+        self.label = label
+        self.kind = kind
+        self.optional = optional
+        self.choices = choices
+        self.rest = rest
+
+    def usage(self):
+        text = "|".join(self.choices) if self.choices else self.label
+        return f"[{text}]" if self.optional else f"<{text}>"
+
+    def convert(self, value):
+        if self.choices and value not in self.choices:
+            raise ValueError(f"<{self.label}>只能是{'、'.join(self.choices)}")
+        if self.kind is not None:
+            value = self.kind(value, self.label)
+        return value
+
+
+class Action:
+    """
+    子命令及其参数格式。name为None时表示不匹配任何子命令时使用的默认格式，例如“/问 <关键词>”；
+    attached为True时子命令后可以直接连着第一个参数，例如“查询<@!用户ID>”。
+    """
+
+    def __init__(self, name, args=(), attached=False):
+        self.name = name
+        self.args = list(args)
+        self.attached = attached
+
+    def usage(self, command_name):
+        parts = [command_name] + ([self.name] if self.name else []) + [arg.usage() for arg in self.args]
+        return " ".join(parts)
+
+
+class ParsedCommand:
+    """
+    路由结果：command为命令名，action为子命令名，args为{参数名: 值}，text为子命令之后的原文。
+    参数不符合格式时error为根据格式生成的错误提示，由处理函数在检查权限之后决定是否回复。
+    """
+
+    __slots__ = ("command", "action", "args", "text", "error", "usage")
+
+    def __init__(self, command, action=None, args=None, text="", error=None, usage=None):
+        self.command = command
+        self.action = action
+        self.args = args or {}
+        self.text = text
+        self.error = error
+        self.usage = usage
+
+
+class Route:
+    def __init__(self, name, handler, task_class, actions):
+        self.name = name
+        self.handler = handler
+        self.task_class = task_class
+        self.actions = {}
+        self.action_trie = {}
+        self.default_action = None
+        for action in actions or ():
+            if action.name is None:
+                self.default_action = action
+            else:
+                self.actions[action.name] = action
+                _trie_insert(self.action_trie, action.name, action)
+
+    @property
+    def takes_command(self):
+        # 声明了子命令格式的处理函数会收到command参数
+        return bool(self.actions) or self.default_action is not None
+
+    def available_actions(self):
+        return "、".join(self.actions)
+
+
+_END = object()
+
+
+def _trie_insert(trie, key, value):
+    node = trie
+    for char in key:
+        node = node.setdefault(char, {})
+    node[_END] = value
+
+
+def _tokens(text, start=0):
+    # 按空白切分text[start:]，返回[(词, 起始位置, 结束位置)]
+    return [(match.group(), match.start(), match.end()) for match in _TOKEN_PATTERN.finditer(text, start)]
+
+
+class CommandRouter:
+    """
+    在导入时构建一次的命令路由：命令名和子命令名各用一棵前缀树匹配，子命令的参数按声明的格式解析和校验。
+    """
+
+    def __init__(self):
+        self.trie = {}
+        self.routes = {}
+
+    def add(self, name, handler, task_class="default", actions=None):
+        route = Route(name, handler, task_class, actions)
+        self.routes[name] = route
+        _trie_insert(self.trie, name, route)
+        return route
+
+    def find_command(self, content):
+        """
+        找到消息中第一个“/”开头的词，返回(路由, 命令名, 命令结束位置)，
+        没有命令时返回(None, None, None)，命令不存在时路由为None。
+        """
+        match = _COMMAND_PATTERN.search(content)
+        if match is None:
+            return None, None, None
+
+        name = match.group()
+        node = self.trie
+        for char in name:
+            node = node.get(char)
+            if node is None:
+                return None, name, match.end()
+        return node.get(_END), name, match.end()
+
+    def match_action(self, route, tokens):
+        # 返回(子命令, 子命令之后第一个参数的剩余部分)，剩余部分只在子命令连着参数时不为空
+        if not tokens:
+            return None, ""
+        token = tokens[0][0]
+        node = route.action_trie
+        matched = None
+        for i, char in enumerate(token):
+            node = node.get(char)
+            if node is None:
+                break
+            action = node.get(_END)
+            if action is not None and (i + 1 == len(token) or action.attached):
+                matched = (action, token[i + 1:])
+        return matched if matched is not None else (None, "")
+
+    def parse(self, route, content, end):
+        tokens = _tokens(content, end)
+        if not tokens:
+            return ParsedCommand(route.name)
+
+        action, attached = self.match_action(route, tokens)
+        if action is not None:
+            # 子命令连着的参数作为第一个参数
+            tokens = ([(attached, tokens[0][2] - len(attached), tokens[0][2])] if attached else []) + tokens[1:]
+            text_start = tokens[0][1] if tokens else len(content)
+        elif route.default_action is not None:
+            action = route.default_action
+            text_start = tokens[0][1]
+        else:
+            return ParsedCommand(route.name, action=tokens[0][0], text=content[tokens[0][1]:].strip(),
+                                 error=f"无法识别的子命令{tokens[0][0]}，可用的子命令有：{route.available_actions()}")
+
+        usage = action.usage(route.name)
+        parsed = ParsedCommand(route.name, action=action.name, text=content[text_start:].strip(), usage=usage)
+        try:
+            for index, arg in enumerate(action.args):
+                if arg.rest:
+                    value = content[tokens[index][1]:].strip() if index < len(tokens) else ""
+                    if value:
+                        parsed.args[arg.label] = arg.convert(value)
+                    elif not arg.optional:
+                        raise ValueError(f"缺少<{arg.label}>")
+                    return parsed
+                if index >= len(tokens):
+                    if not arg.optional:
+                        raise ValueError(f"缺少<{arg.label}>")
+                    continue
+                parsed.args[arg.label] = arg.convert(tokens[index][0])
+            if len(tokens) > len(action.args):
+                raise ValueError("参数过多")
+        except ValueError as e:
+            parsed.error = f"{e}。正确格式为：{usage}"
+        return parsed
+
+    def route(self, content):
+        """返回(路由, 解析结果)，没有命令时两者都为None，命令不存在时路由为None、解析结果只有命令名。"""
+        route, name, end = self.find_command(content)
+        if route is None:
+            return None, ParsedCommand(name) if name else None
+        if not route.takes_command:
+            return route, ParsedCommand(name)
+        return route, self.parse(route, content, end)
@@ -3,8 +3,9 @@ import json
 from botpy import get_logger
 
 from config import config
-from utils.mysql_utils import get_mysql_conn
-from utils.redis_utils import RedisConnection
+from utils.mysql_utils import get_async_mysql_conn
+from utils.redis_utils import get_async_redis
+from utils.single_flight import single_flight
 
 _log = get_logger()
 
@@ -16,30 +17,31 @@ async def get_guild_name_from_redis(client, guild_id):
 
 async def save_guild_detail_to_redis(client, guild_id):
     guild_detail = await client.api.get_guild(guild_id=guild_id)
-    redis_conn = RedisConnection().get_connection()
-    redis_conn.set(f"guild_detail:{guild_id}", json.dumps(guild_detail), ex=config['guild_detail_expiry_time'])
+    redis_conn = get_async_redis()
+    await redis_conn.set(f"guild_detail:{guild_id}", json.dumps(guild_detail), ex=config['guild_detail_expiry_time'])
 
 
+@single_flight(key=lambda client, guild_id: guild_id)
 async def get_guild_detail_from_redis(client, guild_id):
-    redis_conn = RedisConnection().get_connection()
-    guild_detail_json = redis_conn.get(f"guild_detail:{guild_id}")
+    redis_conn = get_async_redis()
+    guild_detail_json = await redis_conn.get(f"guild_detail:{guild_id}")
     if guild_detail_json is not None:
         return json.loads(guild_detail_json.decode('utf-8'))
     else:
         await save_guild_detail_to_redis(client, guild_id)
-        guild_detail_json = redis_conn.get(f"guild_detail:{guild_id}")
+        guild_detail_json = await redis_conn.get(f"guild_detail:{guild_id}")
         return json.loads(guild_detail_json.decode('utf-8')) if guild_detail_json else None
 
 
-def check_guild_authenticity(guild_id: str) -> bool:
+async def check_guild_authenticity(guild_id: str) -> bool:
     # 建立数据库连接
-    conn = get_mysql_conn()
+    conn = await get_async_mysql_conn()
     try:
-        with conn.cursor() as cursor:
+        async with conn.cursor() as cursor:
             # 查询数据的SQL语句
             query = "SELECT `guild_id` FROM `authenticated_guilds` WHERE `guild_id` = %s"
-            cursor.execute(query, (guild_id,))
-            result = cursor.fetchone()
+            await cursor.execute(query, (guild_id,))
+            result = await cursor.fetchone()
             if result is not None:
                 return True
             else:
@@ -47,4 +49,4 @@ def check_guild_authenticity(guild_id: str) -> bool:
     except Exception as e:
         _log.error(f"尝试检查频道ID {guild_id} 是否已认证时发生错误：{e}")
     finally:
-        conn.close()
+        await conn.close()
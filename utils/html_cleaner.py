@@ -0,0 +1,64 @@
+from html.parser import HTMLParser
+
+# 这些标签中的内容不是正文，与BeautifulSoup的get_text保持一致，直接跳过
+SKIPPED_TAGS = frozenset({"script", "style", "template"})
+
+
+class _LimitReached(Exception):
+    pass
+
+
+class _TextExtractor(HTMLParser):
+    """边解析边收集文本，收集到的文本超过max_length后立即停止解析。"""
+
+    def __init__(self, max_length=None):
+        super().__init__(convert_charrefs=True)
+        self.max_length = max_length
+        self.parts = []
+        self.length = 0
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth or not data:
+            return
+        self.parts.append(data)
+        self.length += len(data)
+        if self.max_length is not None and self.length > self.max_length:
+            raise _LimitReached
+
+    def unknown_decl(self, data):
+        # <![CDATA[...]]>中的内容同样属于正文
+        if data.startswith("CDATA["):
+            self.handle_data(data[len("CDATA["):])
+
+
+def clean_html(raw_html, max_length=None):
+    """
+    去除HTML标签，只保留文本。
+    指定max_length时，文本超过该长度后不再继续解析，最多返回max_length + 1个字符，
+    调用方可以据此判断是否需要截断。
+    """
+    if not raw_html:
+        return ""
+    # 不含标签和实体的纯文本无需解析
+    if "<" not in raw_html and "&" not in raw_html:
+        text = raw_html
+    else:
+        parser = _TextExtractor(max_length)
+        try:
+            parser.feed(raw_html)
+            parser.close()
+        except _LimitReached:
+            pass
+        text = "".join(parser.parts)
+    if max_length is not None:
+        text = text[:max_length + 1]
+    return text
@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+import aiohttp
+
+from config import config
+
+# 进程内共享的HTTP会话，首次使用时创建。连接池、DNS缓存和keep-alive连接在所有调用方之间复用。
+# aiohttp默认请求gzip和deflate压缩，安装了Brotli时同时请求br压缩，响应会自动解压。
+_session = None
+
+
+def get_http_session():
+    global _session
+    if _session is None or _session.closed:
+        http_config = config['http_client']
+        connector = aiohttp.TCPConnector(
+            limit=http_config['max_connections'],
+            limit_per_host=http_config['max_connections_per_host'],
+            ttl_dns_cache=http_config['dns_cache_ttl'],
+            keepalive_timeout=http_config['keepalive_timeout'],
+        )
+        timeout = aiohttp.ClientTimeout(total=http_config['total_timeout'],
+                                        sock_connect=http_config['connect_timeout'])
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+
+async def close_http_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+class DownloadTooLarge(Exception):
+    pass
+
+
+async def download_to_file(url, path, chunk_size=64 * 1024, timeout=None, max_size=None):
+    """
+    流式下载url到path，不会把整个响应读入内存。
+    先写入临时文件，写完并落盘后再重命名为path，失败时不会留下写了一半的文件。
+    返回写入的字节数，状态码不是200时返回None，超过max_size字节时抛出DownloadTooLarge。
+    """
+    session = get_http_session()
+    loop = asyncio.get_running_loop()
+    temp_path = f"{path}.part"
+    async with session.get(url, timeout=timeout) as response:
+        if response.status != 200:
+            return None
+        if max_size is not None and (response.content_length or 0) > max_size:
+            raise DownloadTooLarge(url)
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise DownloadTooLarge(url)
+                    f.write(chunk)
+                f.flush()
+                await loop.run_in_executor(None, os.fsync, f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        return size
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+
+import aiohttp
+from botpy import get_logger
+from PIL import Image
+
+from config import config
+from utils.http_client import DownloadTooLarge, download_to_file
+
+_log = get_logger()
+
+# 问答图片的存放目录，图片路径为{IMAGE_ROOT}/{question_answer_id}/image_seq-{image_seq}
+IMAGE_ROOT = os.path.join("resource", "question_answer")
+
+# 允许保存的图片格式，以文件内容识别的格式为准，与附件的文件名无关
+ALLOWED_FORMATS = {"JPEG", "PNG", "GIF", "WEBP", "BMP"}
+
+
+class AttachmentError(Exception):
+    """附件无法保存，异常信息可以直接回复给用户。"""
+
+
+def fsync_dir(path):
+    # 目录中的重命名同样需要落盘
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def normalize_image(path, seq):
+    """识别图片格式，格式不支持时抛出AttachmentError；尺寸或体积过大的静态图片缩小后重新压缩。"""
+    qa_config = config['question_answer_system']
+    max_dimension = qa_config['image_max_dimension']
+    try:
+        with Image.open(path) as img:
+            image_format = img.format
+            img.verify()
+    except Exception:
+        raise AttachmentError(f"第{seq}张附件不是有效的图片。")
+    if image_format not in ALLOWED_FORMATS:
+        raise AttachmentError(f"第{seq}张附件的格式{image_format}不受支持。")
+    # 动图重新压缩会丢帧，保持原样
+    if image_format == "GIF":
+        return
+
+    with Image.open(path) as img:
+        if max(img.size) <= max_dimension and os.path.getsize(path) <= qa_config['image_recompress_bytes']:
+            return
+        img.thumbnail((max_dimension, max_dimension))
+        temp_path = f"{path}.resize"
+        if img.mode in ("RGBA", "LA", "P") and (img.mode != "P" or "transparency" in img.info):
+            img.save(temp_path, "PNG", optimize=True)
+        else:
+            img.convert("RGB").save(temp_path, "JPEG", quality=qa_config['image_jpeg_quality'], optimize=True)
+    with open(temp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+async def download_attachment(attachment, path, seq, semaphore):
+    image_url = attachment.url
+    if "://" not in image_url:
+        image_url = "https://" + image_url
+    max_bytes = config['question_answer_system']['image_max_bytes']
+
+    async with semaphore:
+        try:
+            size = await download_to_file(image_url, path, max_size=max_bytes)
+        except DownloadTooLarge:
+            raise AttachmentError(f"第{seq}张图片超过{max_bytes // 1024 // 1024}MB。")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            _log.error(f"下载图片{image_url}失败：{e}")
+            raise AttachmentError(f"第{seq}张图片下载失败。")
+    if size is None:
+        raise AttachmentError(f"第{seq}张图片下载失败。")
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, normalize_image, path, seq)
+    return path
+
+
+@asynccontextmanager
+async def stage_attachments(attachments):
+    """
+    并发下载全部附件到临时目录，返回按附件顺序排列的文件路径。
+    任一附件失败时取消其余下载并抛出AttachmentError；退出时删除临时目录中未发布的文件。
+    """
+    os.makedirs(IMAGE_ROOT, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=IMAGE_ROOT)
+    semaphore = asyncio.Semaphore(config['question_answer_system']['image_download_concurrency'])
+    tasks = [asyncio.create_task(download_attachment(attachment, os.path.join(staging_dir, str(seq)), seq, semaphore))
+             for seq, attachment in enumerate(attachments, start=1)]
+    try:
+        try:
+            staged_paths = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        yield staged_paths
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def _publish_images(staged_paths, image_dir, first_seq):
+    os.makedirs(image_dir, exist_ok=True)
+    image_paths = []
+    try:
+        for offset, staged_path in enumerate(staged_paths):
+            image_path = os.path.join(image_dir, f"image_seq-{first_seq + offset}")
+            os.replace(staged_path, image_path)
+            image_paths.append(image_path)
+        fsync_dir(image_dir)
+    except OSError:
+        # 只发布了一部分时删除已发布的图片，不留下没有数据库记录的文件
+        unpublish_images(image_paths)
+        raise
+    return image_paths
+
+
+async def publish_images(staged_paths, question_answer_id, first_seq):
+    """把暂存的图片依次重命名为image_seq-{first_seq}、image_seq-{first_seq + 1}...，返回最终路径。"""
+    image_dir = os.path.join(IMAGE_ROOT, str(question_answer_id))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _publish_images, staged_paths, image_dir, first_seq)
+
+
+def unpublish_images(image_paths):
+    # 数据库写入失败时删除已发布的图片，保证文件与question_answer_image记录一致
+    for image_path in image_paths:
+        try:
+            os.remove(image_path)
+        except OSError:
+            pass
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import math
+import time
+from array import array
+
+from botpy import get_logger
+from mcstatus import JavaServer
+
+from config import config
+from utils.mysql_utils import get_async_mysql_conn
+from utils.redis_utils import get_async_redis
+
+_log = get_logger()
+
+# 等待超时时先回复给用户的状态，查询仍在后台进行，结果写入Redis
+PENDING_STATUS = "查询中，请稍后重试"
+
+
+def format_status(status):
+    latency = round(status.latency, 2)
+    return f"在线，玩家数：{status.players.online}/{status.players.max}，延迟：{latency} ms"
+
+
+def format_error(e):
+    if isinstance(e, asyncio.TimeoutError):
+        return "离线，错误信息：连接超时"
+    return f"离线，错误信息：{str(e)}"
+
+
+def parse_cached_status(value):
+    # 返回(状态文本, 新鲜截止时间)。旧版本直接保存状态文本，视为新鲜，过期后自然被新格式替换
+    cached = json.loads(value)
+    if isinstance(cached, str):
+        return cached, math.inf
+    return cached['status'], cached['fresh_until']
+
+
+class StatusHistory:
+    """
+    固定长度的环形缓冲区，记录最近size次查询的时间和延迟，离线记为NaN。
+    每次记录只占8字节，不需要额外查询服务器就能给出在线率和延迟趋势。
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.timestamps = array('I', [0]) * size
+        self.latencies = array('f', [0.0]) * size
+        self.next = 0
+        self.count = 0
+
+    def append(self, timestamp, latency):
+        self.timestamps[self.next] = int(timestamp)
+        self.latencies[self.next] = math.nan if latency is None else latency
+        self.next = (self.next + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def samples(self):
+        # 按时间从旧到新返回(时间, 延迟)
+        start = (self.next - self.count) % self.size
+        for i in range(self.count):
+            index = (start + i) % self.size
+            yield self.timestamps[index], self.latencies[index]
+
+    def summary(self, recent=20):
+        if not self.count:
+            return None
+        samples = list(self.samples())
+        online = [latency for _, latency in samples if not math.isnan(latency)]
+        minutes = max(1, round((samples[-1][0] - samples[0][0]) / 60))
+        marks = "".join("○" if math.isnan(latency) else "●" for _, latency in samples[-recent:])
+        text = f"近{minutes}分钟在线率{len(online) * 100 // len(samples)}%"
+        if online:
+            text += f"，平均延迟{sum(online) / len(online):.0f} ms（{min(online):.0f}~{max(online):.0f} ms）"
+        return f"{text}\n近况: {marks}"
+
+
+class MinecraftStatusService:
+    """
+    Minecraft服务器状态查询：SRV解析异步进行并按TTL缓存，Redis中的状态一次MGET取出，
+    没有缓存的服务器并发查询，每次查询有超时，回复时只等待reply_timeout秒，没查完的服务器先返回PENDING_STATUS。
+    后台轮询让所有登记的服务器保持新鲜；过期的状态仍然直接返回，同时在后台重新查询。
+    """
+
+    def __init__(self):
+        self.config = config['minecraft_servers']
+        # server_address -> (过期时间, JavaServer)
+        self.lookups = {}
+        # 正在查询的服务器，同一地址同时只查询一次
+        self.querying = {}
+        # server_address -> StatusHistory
+        self.histories = {}
+
+    async def lookup(self, server_address):
+        entry = self.lookups.get(server_address)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        query_timeout = self.config['query_timeout']
+        mc_server = await JavaServer.async_lookup(server_address, timeout=query_timeout)
+        self.lookups[server_address] = (time.monotonic() + self.config['address_ttl'], mc_server)
+        return mc_server
+
+    def record_history(self, server_address, latency):
+        history = self.histories.get(server_address)
+        if history is None:
+            history = self.histories[server_address] = StatusHistory(self.config['history_size'])
+        history.append(time.time(), latency)
+
+    async def query(self, server_address):
+        # 查询服务器状态并写入Redis，返回状态文本
+        redis_config = self.config['redis']
+        try:
+            mc_server = await asyncio.wait_for(self.lookup(server_address), self.config['query_timeout'])
+            status = await asyncio.wait_for(mc_server.async_status(), self.config['query_timeout'])
+            server_status = format_status(status)
+            fresh_ttl = redis_config['status_query_timeout']
+            self.record_history(server_address, status.latency)
+        except Exception as e:
+            # 服务器可能迁移了地址，下次查询重新解析
+            self.lookups.pop(server_address, None)
+            server_status = format_error(e)
+            fresh_ttl = redis_config['status_query_failed_ttl']
+            self.record_history(server_address, None)
+            _log.error(f"查询服务器状态失败，服务器地址：{server_address}，{server_status}")
+        # 新鲜期过后状态仍保留status_stale_ttl秒，期间直接返回旧状态并在后台刷新
+        value = json.dumps({"status": server_status, "fresh_until": time.time() + fresh_ttl})
+        try:
+            await get_async_redis().set(server_address, value, ex=redis_config['status_stale_ttl'])
+        except Exception as e:
+            _log.error(f"保存服务器状态到Redis失败，服务器地址：{server_address}，错误信息：{str(e)}")
+        return server_status
+
+    def refresh(self, server_address):
+        task = self.querying.get(server_address)
+        if task is None:
+            task = asyncio.create_task(self.query(server_address))
+            self.querying[server_address] = task
+            task.add_done_callback(lambda _: self.querying.pop(server_address, None))
+        return task
+
+    async def get_cached(self, server_addresses):
+        # 返回与server_addresses顺序一致的(状态文本, 新鲜截止时间)，没有缓存时为None
+        try:
+            values = await get_async_redis().mget(server_addresses)
+        except Exception as e:
+            _log.error(f"从Redis中获取服务器状态失败，错误信息：{str(e)}")
+            return [None] * len(server_addresses)
+        return [parse_cached_status(value) if value is not None else None for value in values]
+
+    async def get_statuses(self, server_addresses):
+        """返回{server_address: 状态文本}，没有缓存的服务器并发查询，最多等待reply_timeout秒。"""
+        server_addresses = list(dict.fromkeys(server_addresses))
+        if not server_addresses:
+            return {}
+        cached = await self.get_cached(server_addresses)
+
+        now = time.time()
+        statuses = {}
+        tasks = {}
+        for server_address, entry in zip(server_addresses, cached):
+            if entry is None:
+                tasks[server_address] = self.refresh(server_address)
+                continue
+            server_status, fresh_until = entry
+            statuses[server_address] = server_status
+            if fresh_until <= now:
+                # 过期的状态先返回，同时在后台重新查询
+                self.refresh(server_address)
+
+        if tasks:
+            # 超时后不取消查询，查询结束时结果写入Redis供下次使用
+            await asyncio.wait(tasks.values(), timeout=self.config['reply_timeout'])
+            for server_address, task in tasks.items():
+                statuses[server_address] = task.result() if task.done() else PENDING_STATUS
+        return statuses
+
+    def get_trend(self, server_address):
+        history = self.histories.get(server_address)
+        return history.summary() if history is not None else None
+
+    async def get_registered_addresses(self):
+        # 多个频道登记的同一个服务器只查询一次
+        conn = await get_async_mysql_conn()
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT DISTINCT `server_address` FROM `minecraft_servers`")
+                rows = await cursor.fetchall()
+        finally:
+            await conn.close()
+        return [row['server_address'] for row in rows]
+
+    async def poll_once(self):
+        server_addresses = await self.get_registered_addresses()
+        if not server_addresses:
+            return 0
+        cached = await self.get_cached(server_addresses)
+        # 在下一轮轮询之前就会过期的状态提前刷新，用户查询时总能拿到新鲜的状态
+        deadline = time.time() + self.config['poll_interval']
+        due = [server_address for server_address, entry in zip(server_addresses, cached)
+               if entry is None or entry[1] <= deadline]
+        semaphore = asyncio.Semaphore(self.config['poll_concurrency'])
+
+        async def poll(server_address):
+            async with semaphore:
+                await self.refresh(server_address)
+
+        await asyncio.gather(*[poll(server_address) for server_address in due])
+        # 已经删除的服务器不再保留历史
+        registered = set(server_addresses)
+        for server_address in list(self.histories):
+            if server_address not in registered:
+                del self.histories[server_address]
+        return len(due)
+
+    async def poller(self):
+        await asyncio.sleep(10)  # 等待10秒以确保QQ机器人已启动
+        while True:
+            start = time.monotonic()
+            try:
+                polled = await self.poll_once()
+                if polled:
+                    _log.info(f"已刷新{polled}个Minecraft服务器的状态，用时{time.monotonic() - start:.1f}秒")
+            except Exception as e:
+                _log.error(f"轮询Minecraft服务器状态时发生错误：{e}")
+            await asyncio.sleep(max(0.0, self.config['poll_interval'] - (time.monotonic() - start)))
+
+
+mc_status_service = MinecraftStatusService()
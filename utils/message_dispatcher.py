@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+
+from botpy import get_logger
+
+from config import config
+from utils.redis_utils import get_async_redis
+from utils.send_message_with_log import QUOTA_ERROR, post_with_log
+
+_log = get_logger()
+
+
+def seconds_until_end_of_day():
+    # 到当日23:59:59的秒数，不超过config中预设的过期时间上限
+    now = datetime.now()
+    expire_seconds = (now.replace(hour=23, minute=59, second=59) - now).seconds
+    return max(min(expire_seconds, config['message_limit_seconds']), 1)
+
+
+class TokenBucket:
+    """令牌桶，rate为每秒补充的令牌数，capacity为允许的突发数量。"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def available(self):
+        self._refill()
+        return int(self.tokens)
+
+    async def acquire(self):
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+
+
+class MessageDispatcher:
+    """主动消息的出站调度器。
+
+    每个子频道有独立的待发送队列和令牌桶，每日配额计数保存在Redis中。队列已满时submit会等待，
+    从而向生产者施加背压；令牌或配额不足以逐条发送排队的RSS项时，会把它们合并为一条摘要发送。
+    """
+
+    def __init__(self, rate=None, burst=None, daily_quota=None, queue_size=None, digest_max_length=None):
+        dispatcher_config = config['message_dispatcher']
+        self.rate = rate or dispatcher_config['proactive_rate']
+        self.burst = burst or dispatcher_config['proactive_burst']
+        self.daily_quota = daily_quota or dispatcher_config['proactive_daily_quota']
+        self.queue_size = queue_size or dispatcher_config['queue_size']
+        self.digest_max_length = digest_max_length or dispatcher_config['digest_max_length']
+        self.channels = {}
+        self.stats = {
+            "submitted": 0,
+            "posted": 0,
+            "digests": 0,
+            "digested_items": 0,
+            "quota_rejected": 0,
+            "failed": 0,
+        }
+
+    def _get_channel(self, channel_id):
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.channels[channel_id] = {
+                "pending": deque(),
+                "slots": asyncio.Semaphore(self.queue_size),
+                "bucket": TokenBucket(self.rate, self.burst),
+                "worker": None,
+            }
+        return channel
+
+    async def submit(self, client, channel_id, content, summary=None, encode_urls=True):
+        # 加入子频道的发送队列，返回一个future，发送成功时结果为True，因配额不足或发送失败未发送时为False。
+        # summary为该消息在摘要中的一行，为None时不参与合并
+        channel = self._get_channel(channel_id)
+        await channel["slots"].acquire()
+        future = asyncio.get_running_loop().create_future()
+        channel["pending"].append({
+            "content": content,
+            "summary": summary,
+            "encode_urls": encode_urls,
+            "future": future,
+        })
+        self.stats["submitted"] += 1
+        if channel["worker"] is None:
+            channel["worker"] = asyncio.create_task(self._run(client, channel_id, channel))
+        return future
+
+    async def remaining_quota(self, channel_id):
+        redis_conn = get_async_redis()
+        limited, used = await redis_conn.mget(f"msg_daily_limit:{channel_id}", f"msg_quota:{channel_id}")
+        if limited is not None:
+            return 0
+        return max(self.daily_quota - int(used or 0), 0)
+
+    async def consume_quota(self, channel_id):
+        redis_conn = get_async_redis()
+        key = f"msg_quota:{channel_id}"
+        async with redis_conn.pipeline(transaction=True) as pipe:
+            pipe.incr(key)
+            pipe.ttl(key)
+            used, ttl = await pipe.execute()
+        if ttl < 0:
+            await redis_conn.expire(key, seconds_until_end_of_day())
+        return used <= self.daily_quota
+
+    async def refund_quota(self, channel_id):
+        # 发送失败的消息没有占用平台配额，归还consume_quota预先扣除的计数
+        try:
+            await get_async_redis().decr(f"msg_quota:{channel_id}")
+        except Exception as e:
+            _log.error(f"归还子频道{channel_id}的消息配额失败：{e}")
+
+    async def mark_limited(self, channel_id):
+        await get_async_redis().set(f"msg_daily_limit:{channel_id}", 1, ex=seconds_until_end_of_day())
+
+    @staticmethod
+    def _resolve(entry, success):
+        # 生产者可能已经取消等待
+        if not entry["future"].done():
+            entry["future"].set_result(success)
+
+    def _take_batch(self, channel, count):
+        entries = []
+        for _ in range(count):
+            entries.append(channel["pending"].popleft())
+            channel["slots"].release()
+        return entries
+
+    def _take_digest(self, channel, first):
+        # 从队首开始合并连续的可摘要消息，总长度不超过digest_max_length
+        batch = [first]
+        length = len(first["summary"])
+        pending = channel["pending"]
+        while pending and pending[0]["summary"] is not None:
+            next_length = length + 1 + len(pending[0]["summary"])
+            if next_length > self.digest_max_length:
+                break
+            batch.extend(self._take_batch(channel, 1))
+            length = next_length
+        if len(batch) == 1:
+            return batch, first["content"]
+        content = f"以下为{len(batch)}条更新：\n" + "\n".join(entry["summary"] for entry in batch)
+        return batch, content
+
+    async def _run(self, client, channel_id, channel):
+        pending = channel["pending"]
+        try:
+            while pending:
+                remaining = await self.remaining_quota(channel_id)
+                if remaining <= 0:
+                    # 当天配额已用完，队列中的消息全部以失败返回，由生产者之后重试
+                    for entry in self._take_batch(channel, len(pending)):
+                        self.stats["quota_rejected"] += 1
+                        self._resolve(entry, False)
+                    break
+
+                first = self._take_batch(channel, 1)[0]
+                batch, content = [first], first["content"]
+                if first["summary"] is not None and len(pending) + 1 > min(channel["bucket"].available(), remaining):
+                    batch, content = self._take_digest(channel, first)
+
+                await channel["bucket"].acquire()
+                result = await self._post(client, channel_id, content, first["encode_urls"])
+                success = result == "posted"
+                if success:
+                    self.stats["posted"] += 1
+                    if len(batch) > 1:
+                        self.stats["digests"] += 1
+                        self.stats["digested_items"] += len(batch)
+                else:
+                    self.stats[result] += len(batch)
+                for entry in batch:
+                    self._resolve(entry, success)
+        except Exception as e:
+            _log.error(f"子频道{channel_id}的消息发送队列出错：{e}")
+            for entry in self._take_batch(channel, len(pending)):
+                self._resolve(entry, False)
+        finally:
+            # 子频道状态（尤其是令牌桶）需要保留，不随队列清空而删除
+            channel["worker"] = None
+            if pending:
+                channel["worker"] = asyncio.create_task(self._run(client, channel_id, channel))
+
+    async def _post(self, client, channel_id, content, encode_urls):
+        # 返回"posted"、"quota_rejected"或"failed"，只有确认发送成功时才是"posted"
+        if not await self.consume_quota(channel_id):
+            await self.mark_limited(channel_id)
+            return "quota_rejected"
+        try:
+            await post_with_log(client, channel_id, content, encode_urls=encode_urls, raise_errors=True)
+        except Exception as e:
+            if QUOTA_ERROR in str(e):
+                _log.error(f"消息发送达到上限：{e}")
+                await self.mark_limited(channel_id)
+                return "quota_rejected"
+            # 其他错误可能是暂时的，以失败返回，由生产者之后重试
+            _log.error(f"发送消息到子频道{channel_id}失败：{e}")
+            await self.refund_quota(channel_id)
+            return "failed"
+        return "posted"
+
+
+dispatcher = MessageDispatcher()
@@ -1,14 +1,22 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import pymysql
 from DBUtils.PooledDB import PooledDB
+from botpy import get_logger
 
 from config import config
 
+_log = get_logger()
+
+# 连接池最大连接数，同时也是异步桥接线程池的线程数
+MAX_CONNECTIONS = 10
+
 # 创建连接池
 pool = PooledDB(
     creator=pymysql,
-    maxconnections=10,
+    maxconnections=MAX_CONNECTIONS,
     mincached=2,
     maxcached=5,
     maxshared=3,
@@ -24,7 +32,144 @@ pool = PooledDB(
     cursorclass=pymysql.cursors.DictCursor
 )
 
+# 专用于数据库操作的线程池，避免阻塞的pymysql调用占用事件循环
+executor = ThreadPoolExecutor(max_workers=MAX_CONNECTIONS, thread_name_prefix="mysql")
+
+# 限制同时持有的异步连接数，保证等待连接的协程在事件循环中排队，而不是占满线程池导致死锁
+_conn_semaphore = None
+
 
 def get_mysql_conn():
     conn = pool.connection()
     return conn
+
+
+async def _run_in_executor(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+
+def _call_after(previous, func, args):
+    # 同一连接上的操作按提交顺序执行，前一个操作结束后才开始
+    if previous is not None:
+        wait([previous])
+    return func(*args)
+
+
+class AsyncCursor:
+    """在线程池中执行的游标，接口与pymysql游标保持一致，但所有IO操作都需要await。"""
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    async def execute(self, query, args=None):
+        return await self._connection._run(self._cursor.execute, query, args)
+
+    async def executemany(self, query, args):
+        return await self._connection._run(self._cursor.executemany, query, args)
+
+    async def fetchone(self):
+        return await self._connection._run(self._cursor.fetchone)
+
+    async def fetchall(self):
+        return await self._connection._run(self._cursor.fetchall)
+
+    async def close(self):
+        # 只释放客户端资源，排在连接上的操作之后执行，不等待完成，
+        # 调用方在查询中途被取消时不会被仍在执行的查询阻塞
+        self._connection._submit(self._cursor.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class AsyncConnection:
+    """连接池连接的异步包装，用法与get_mysql_conn()返回的连接相同。"""
+
+    def __init__(self, conn, semaphore):
+        self._conn = conn
+        self._semaphore = semaphore
+        # 最近提交到线程池的操作，以及最近一个由调用方等待的操作（调用方被取消时它可能仍在执行）
+        self._last = None
+        self._awaited = None
+
+    def _submit(self, func, *args):
+        self._last = executor.submit(_call_after, self._last, func, args)
+        return self._last
+
+    async def _run(self, func, *args):
+        # 调用方被取消时，线程中的操作仍会执行完，之后的操作（包括归还连接）排在它后面，
+        # 连接池不会把仍在执行查询的连接交给其他协程
+        self._awaited = self._submit(func, *args)
+        return await asyncio.shield(asyncio.wrap_future(self._awaited))
+
+    def cursor(self, *args):
+        return AsyncCursor(self._conn.cursor(*args), self)
+
+    async def begin(self):
+        await self._run(self._conn.begin)
+
+    async def commit(self):
+        await self._run(self._conn.commit)
+
+    async def rollback(self):
+        await self._run(self._conn.rollback)
+
+    async def close(self):
+        if self._semaphore is None:
+            return
+        semaphore, self._semaphore = self._semaphore, None
+        busy = self._awaited is not None and not self._awaited.done()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                semaphore.release()
+
+        # 归还连接到连接池，之前的操作全部结束、连接归还之后才释放名额；
+        # 仍有操作在执行时（调用方被取消）不等待，归还后在事件循环中释放名额
+        loop = asyncio.get_running_loop()
+        closing = self._submit(self._conn.close)
+        closing.add_done_callback(lambda _: loop.call_soon_threadsafe(release))
+        if not busy:
+            await asyncio.shield(asyncio.wrap_future(closing))
+            release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def __del__(self):
+        # 名额只在close()中释放，垃圾回收的时机不确定，不能依赖它归还名额；这里只记录泄漏
+        if self._semaphore is not None:
+            _log.warning("数据库连接未调用close()就被回收，连接名额不会被释放，请检查调用方")
+
+
+async def get_async_mysql_conn():
+    global _conn_semaphore
+    if _conn_semaphore is None:
+        _conn_semaphore = asyncio.Semaphore(MAX_CONNECTIONS)
+
+    await _conn_semaphore.acquire()
+    try:
+        conn = await _run_in_executor(pool.connection)
+    except BaseException:
+        _conn_semaphore.release()
+        raise
+    return AsyncConnection(conn, _conn_semaphore)
@@ -0,0 +1,242 @@
+import asyncio
+import heapq
+import math
+from collections import OrderedDict
+
+from botpy import get_logger
+
+from config import config
+from utils.mysql_utils import get_async_mysql_conn
+
+_log = get_logger()
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 问题字段的词频权重，命中问题比命中答案更相关
+QUESTION_WEIGHT = 2
+
+# 模糊匹配时，最佳结果领先第二名至少这么多才直接作为唯一结果
+FUZZY_MARGIN = 0.15
+
+
+def tokenize(text):
+    # 中文没有天然分词，按非空白片段切出单字和相邻两字，英文和数字同样适用，并统一转为小写
+    tokens = []
+    for run in text.lower().split():
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def tokenize_keyword(keyword):
+    # 查询时只需两字片段即可定位候选，单字关键词退化为单字
+    tokens = []
+    for run in keyword.lower().split():
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class GuildQAIndex:
+    """单个频道问答库的倒排索引，文档以question_answer_id为键。"""
+
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+        self.question_postings = {}
+        self.total_length = 0
+
+    def add(self, question_answer_id, guild_question_id, question, answer):
+        self.remove(question_answer_id)
+
+        term_freqs = {}
+        for token in tokenize(question):
+            term_freqs[token] = term_freqs.get(token, 0) + QUESTION_WEIGHT
+        for token in tokenize(answer):
+            term_freqs[token] = term_freqs.get(token, 0) + 1
+        length = sum(term_freqs.values())
+
+        for token, freq in term_freqs.items():
+            self.postings.setdefault(token, {})[question_answer_id] = freq
+        # 模糊匹配只比较问题文本的片段集合
+        question_grams = frozenset(tokenize_keyword(question))
+        for token in question_grams:
+            self.question_postings.setdefault(token, set()).add(question_answer_id)
+        self.docs[question_answer_id] = {
+            "guild_question_id": guild_question_id,
+            "question": question,
+            "answer": answer,
+            "text": f"{question}\n{answer}".lower(),
+            "terms": tuple(term_freqs),
+            "question_grams": question_grams,
+            "length": length,
+        }
+        self.total_length += length
+
+    def remove(self, question_answer_id):
+        doc = self.docs.pop(question_answer_id, None)
+        if doc is None:
+            return
+        for token in doc["terms"]:
+            posting = self.postings[token]
+            del posting[question_answer_id]
+            if not posting:
+                del self.postings[token]
+        for token in doc["question_grams"]:
+            posting = self.question_postings[token]
+            posting.discard(question_answer_id)
+            if not posting:
+                del self.question_postings[token]
+        self.total_length -= doc["length"]
+
+    def _candidates(self, keyword):
+        # 取关键词所有片段倒排表的交集，再用子串校验，保证与 LIKE '%kw%' 的语义一致
+        tokens = tokenize_keyword(keyword)
+        if not tokens:
+            return set(self.docs)
+        postings = sorted((self.postings.get(token, {}) for token in set(tokens)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        keyword = keyword.lower()
+        if len(tokens) == 1 and tokens[0] == keyword:
+            # 关键词本身就是索引中的片段，无需再做子串校验
+            return candidates
+        return {doc_id for doc_id in candidates if keyword in self.docs[doc_id]["text"]}
+
+    def search(self, keywords, top_k):
+        # 多个关键词之间为“且”的关系，结果按BM25得分排序并截取前top_k条
+        keywords = [keyword for keyword in keywords if keyword]
+        if not self.docs:
+            return []
+
+        matched = None
+        for keyword in keywords:
+            candidates = self._candidates(keyword)
+            matched = candidates if matched is None else matched & candidates
+            if not matched:
+                return []
+        if matched is None:
+            matched = set(self.docs)
+
+        query_tokens = {token for keyword in keywords for token in tokenize_keyword(keyword)}
+        doc_count = len(self.docs)
+        avg_length = self.total_length / doc_count or 1
+        scores = dict.fromkeys(matched, 0.0)
+        for token in query_tokens:
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id in matched:
+                freq = posting.get(doc_id)
+                if freq:
+                    length_norm = 1 - BM25_B + BM25_B * self.docs[doc_id]["length"] / avg_length
+                    scores[doc_id] += idf * freq * (BM25_K1 + 1) / (freq + BM25_K1 * length_norm)
+
+        # 只需要前top_k条，用堆代替整体排序
+        ranked = heapq.nsmallest(
+            top_k, matched, key=lambda doc_id: (-scores[doc_id], self.docs[doc_id]["guild_question_id"]))
+        return [(doc_id, scores[doc_id]) for doc_id in ranked]
+
+    def fuzzy_search(self, keywords, top_k, threshold):
+        # 容错匹配：按查询片段在问题中出现的比例打分，同分时按Dice系数排序，可以容忍错字、多字和少字
+        query_grams = {token for keyword in keywords for token in tokenize_keyword(keyword)}
+        if not query_grams:
+            return []
+
+        overlaps = {}
+        for token in query_grams:
+            for doc_id in self.question_postings.get(token, ()):
+                overlaps[doc_id] = overlaps.get(doc_id, 0) + 1
+
+        scored = []
+        for doc_id, overlap in overlaps.items():
+            containment = overlap / len(query_grams)
+            if containment >= threshold:
+                dice = 2 * overlap / (len(query_grams) + len(self.docs[doc_id]["question_grams"]))
+                scored.append((containment, dice, doc_id))
+        ranked = heapq.nlargest(top_k, scored)
+        return [(doc_id, containment) for containment, _, doc_id in ranked]
+
+    def get(self, question_answer_id):
+        return self.docs[question_answer_id]
+
+
+# 已加载的频道索引，按最近使用顺序淘汰
+_indexes = OrderedDict()
+_locks = {}
+
+
+def _get_lock(guild_id):
+    lock = _locks.get(guild_id)
+    if lock is None:
+        lock = _locks[guild_id] = asyncio.Lock()
+    return lock
+
+
+def build_index(rows):
+    index = GuildQAIndex()
+    for row in rows:
+        index.add(row['question_answer_id'], row['guild_question_id'], row['question'], row['answer'])
+    return index
+
+
+async def _load_index(guild_id):
+    conn = await get_async_mysql_conn()
+    try:
+        async with conn.cursor() as cursor:
+            await cursor.execute("""
+                SELECT question_answer_id, guild_question_id, question, answer
+                FROM question_answer WHERE guild_id = %s
+            """, (guild_id,))
+            rows = await cursor.fetchall()
+    finally:
+        await conn.close()
+
+    # 分词在线程池中进行，避免大频道建索引时阻塞事件循环
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, build_index, rows)
+
+
+async def get_guild_qa_index(guild_id):
+    # 首次查询时从数据库构建索引，失败时返回None，由调用方退回SQL查询
+    index = _indexes.get(guild_id)
+    if index is not None:
+        _indexes.move_to_end(guild_id)
+        return index
+
+    async with _get_lock(guild_id):
+        index = _indexes.get(guild_id)
+        if index is None:
+            try:
+                index = await _load_index(guild_id)
+            except Exception as e:
+                _log.error(f"构建问答索引失败：{e}")
+                return None
+            _indexes[guild_id] = index
+            while len(_indexes) > config['question_answer_system']['max_indexed_guilds']:
+                evicted_guild_id, _ = _indexes.popitem(last=False)
+                _locks.pop(evicted_guild_id, None)
+    return index
+
+
+async def update_qa_index(guild_id, question_answer_id, guild_question_id, question, answer):
+    # 只更新已加载的索引，未加载的频道会在下次查询时从数据库完整构建
+    async with _get_lock(guild_id):
+        index = _indexes.get(guild_id)
+        if index is not None:
+            index.add(question_answer_id, guild_question_id, question, answer)
+
+
+async def remove_from_qa_index(guild_id, question_answer_id):
+    async with _get_lock(guild_id):
+        index = _indexes.get(guild_id)
+        if index is not None:
+            index.remove(question_answer_id)
@@ -0,0 +1,46 @@
+from functools import lru_cache
+
+# 问答系统的SQL模板。同样数量的关键词始终生成同样的语句，用户输入只作为参数传递。
+
+
+def escape_like(keyword):
+    # 转义 LIKE 中的通配符，使关键词按字面匹配
+    return keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@lru_cache(maxsize=None)
+def search_sql(keyword_count):
+    conditions = " AND ".join(["(qa.question LIKE %s OR qa.answer LIKE %s)"] * keyword_count) or "1 = 1"
+    return f"""
+        SELECT qa.guild_question_id, qa.question, qa.answer,
+        GROUP_CONCAT('resource/question_answer/', qa.question_answer_id, '/image_seq-', qai.image_seq ORDER BY qai.image_seq) AS image_path
+        FROM question_answer qa
+        LEFT JOIN question_answer_image qai ON qa.question_answer_id = qai.question_answer_id
+        WHERE {conditions} AND qa.guild_id = %s
+        GROUP BY qa.guild_question_id, qa.question, qa.answer
+    """
+
+
+def build_search_query(guild_id, keywords):
+    args = []
+    for keyword in keywords:
+        pattern = f"%{escape_like(keyword)}%"
+        args.extend((pattern, pattern))
+    args.append(guild_id)
+    return search_sql(len(keywords)), args
+
+
+@lru_cache(maxsize=None)
+def image_paths_sql(id_count):
+    placeholders = ", ".join(["%s"] * id_count)
+    return f"""
+        SELECT question_answer_id,
+        GROUP_CONCAT('resource/question_answer/', question_answer_id, '/image_seq-', image_seq ORDER BY image_seq) AS image_path
+        FROM question_answer_image
+        WHERE question_answer_id IN ({placeholders})
+        GROUP BY question_answer_id
+    """
+
+
+def build_image_paths_query(question_answer_ids):
+    return image_paths_sql(len(question_answer_ids)), list(question_answer_ids)
@@ -1,30 +1,55 @@
 import os
 
-import redis
+import redis.asyncio as aioredis
 
 from config import config
 
+# 进程内共享的异步Redis客户端，首次使用时创建
+_async_redis = None
 
-class RedisConnection:
-    def __init__(self, host=None, port=None, db=None, password=None,
-                 max_connections=None, socket_timeout=None, socket_connect_timeout=None):
-        self.host = host or config['redis']['host']
-        self.port = port or config['redis']['port']
-        self.db = db or config['redis']['db']
-        self.password = password or os.environ.get('REDIS_DB_PASS')
-        self.max_connections = max_connections or config['redis']['max_connections']
-        self.socket_timeout = socket_timeout or config['redis']['socket_timeout']
-        self.socket_connect_timeout = socket_connect_timeout or config['redis']['socket_connect_timeout']
-
-        self.pool = redis.ConnectionPool(
-            host=self.host,
-            port=self.port,
-            db=self.db,
-            password=self.password,
-            max_connections=self.max_connections,
-            socket_timeout=self.socket_timeout,
-            socket_connect_timeout=self.socket_connect_timeout,
+
+def get_async_redis():
+    global _async_redis
+    if _async_redis is None:
+        redis_config = config['redis']
+        # 使用有上限的阻塞连接池，连接耗尽时等待空闲连接而不是无限新建
+        pool = aioredis.BlockingConnectionPool(
+            host=redis_config['host'],
+            port=redis_config['port'],
+            db=redis_config['db'],
+            password=os.environ.get('REDIS_DB_PASS'),
+            max_connections=redis_config['max_connections'],
+            socket_timeout=redis_config['socket_timeout'],
+            socket_connect_timeout=redis_config['socket_connect_timeout'],
+            timeout=redis_config['socket_timeout'],
         )
+        _async_redis = aioredis.Redis(connection_pool=pool)
+    return _async_redis
+
+
+async def close_async_redis():
+    global _async_redis
+    if _async_redis is not None:
+        await _async_redis.close()
+        await _async_redis.connection_pool.disconnect()
+        _async_redis = None
+
+
+async def get_many(keys):
+    # 通过一次pipeline批量获取多个键，返回与keys顺序一致的值列表
+    if not keys:
+        return []
+    async with get_async_redis().pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.get(key)
+        return await pipe.execute()
+
 
-    def get_connection(self):
-        return redis.Redis(connection_pool=self.pool)
+async def set_many(mapping, ex=None):
+    # 通过一次pipeline批量写入多个键，ex为统一的过期时间（秒）
+    if not mapping:
+        return
+    async with get_async_redis().pipeline(transaction=False) as pipe:
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=ex)
+        await pipe.execute()
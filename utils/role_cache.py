@@ -0,0 +1,164 @@
+import json
+import time
+from collections import OrderedDict
+
+from botpy import get_logger
+from redis.exceptions import WatchError
+
+from config import config
+from utils.mysql_utils import get_async_mysql_conn
+from utils.redis_utils import get_async_redis
+
+_log = get_logger()
+
+# Redis哈希中的哨兵字段，用于区分“频道没有任何管理身份组”和“缓存未加载”
+_LOADED_FIELD = "__loaded__"
+
+# 进程内LRU缓存：guild_id -> (过期时间, {role_type: frozenset(role)})
+_local_cache = OrderedDict()
+
+# 进程内的缓存版本号：guild_id -> 失效次数，加载期间版本号变化时不写回进程内缓存
+_local_generations = {}
+
+# 缓存命中统计
+_stats = {
+    "local_hits": 0,
+    "redis_hits": 0,
+    "misses": 0,
+}
+
+
+def _redis_key(guild_id):
+    return f"management_roles:{guild_id}"
+
+
+def _generation_key(guild_id):
+    # 每次失效时INCR，未命中后加载期间该值发生变化则放弃写回Redis
+    return f"management_roles_generation:{guild_id}"
+
+
+def _local_get(guild_id):
+    entry = _local_cache.get(guild_id)
+    if entry is None:
+        return None
+    expires_at, roles_map = entry
+    if expires_at < time.monotonic():
+        del _local_cache[guild_id]
+        return None
+    _local_cache.move_to_end(guild_id)
+    return roles_map
+
+
+def _local_set(guild_id, roles_map):
+    _local_cache[guild_id] = (time.monotonic() + config['role_cache']['local_ttl'], roles_map)
+    _local_cache.move_to_end(guild_id)
+    while len(_local_cache) > config['role_cache']['local_max_guilds']:
+        _local_cache.popitem(last=False)
+
+
+async def _redis_get(guild_id):
+    data = await get_async_redis().hgetall(_redis_key(guild_id))
+    if not data or _LOADED_FIELD.encode() not in data:
+        return None
+    return {field.decode(): frozenset(json.loads(value))
+            for field, value in data.items() if field.decode() != _LOADED_FIELD}
+
+
+async def _get_generation(guild_id):
+    return await get_async_redis().get(_generation_key(guild_id))
+
+
+async def _redis_set(guild_id, roles_map, generation):
+    # 只有版本号仍为加载前读到的值时才写回，加载期间发生失效时返回False
+    mapping = {role_type: json.dumps(sorted(roles)) for role_type, roles in roles_map.items()}
+    mapping[_LOADED_FIELD] = "1"
+    key = _redis_key(guild_id)
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(_generation_key(guild_id))
+            if await pipe.get(_generation_key(guild_id)) != generation:
+                return False
+            pipe.multi()
+            pipe.delete(key)
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, config['role_cache']['redis_ttl'])
+            await pipe.execute()
+        except WatchError:
+            return False
+    return True
+
+
+async def _load_from_mysql(guild_id):
+    conn = await get_async_mysql_conn()
+    try:
+        async with conn.cursor() as cursor:
+            sql = "SELECT role, role_type FROM management_roles WHERE guild_id = %s"
+            await cursor.execute(sql, (guild_id,))
+            rows = await cursor.fetchall()
+    finally:
+        await conn.close()
+
+    roles_map = {}
+    for row in rows:
+        roles_map.setdefault(row['role_type'], set()).add(row['role'])
+    return {role_type: frozenset(roles) for role_type, roles in roles_map.items()}
+
+
+async def get_guild_management_roles(guild_id):
+    # 依次查询进程内缓存、Redis和MySQL，返回 {role_type: frozenset(role)}
+    roles_map = _local_get(guild_id)
+    if roles_map is not None:
+        _stats["local_hits"] += 1
+        return roles_map
+
+    # 在读取Redis和MySQL之前记下版本号，避免把失效之前读到的旧数据写回缓存
+    local_generation = _local_generations.get(guild_id, 0)
+    try:
+        roles_map = await _redis_get(guild_id)
+    except Exception as e:
+        _log.error(f"从Redis读取管理身份组缓存失败：{e}")
+        roles_map = None
+    if roles_map is not None:
+        _stats["redis_hits"] += 1
+        if _local_generations.get(guild_id, 0) == local_generation:
+            _local_set(guild_id, roles_map)
+        return roles_map
+
+    _stats["misses"] += 1
+    try:
+        generation = await _get_generation(guild_id)
+    except Exception as e:
+        _log.error(f"读取管理身份组缓存版本号失败：{e}")
+        generation = None
+        redis_available = False
+    else:
+        redis_available = True
+    roles_map = await _load_from_mysql(guild_id)
+    if _local_generations.get(guild_id, 0) == local_generation:
+        _local_set(guild_id, roles_map)
+    if redis_available:
+        try:
+            await _redis_set(guild_id, roles_map, generation)
+        except Exception as e:
+            _log.error(f"写入管理身份组缓存失败：{e}")
+    return roles_map
+
+
+async def invalidate_guild_management_roles(guild_id):
+    # 管理身份组发生变更后调用，同时清除两级缓存并增加版本号，使正在加载的旧数据不会被写回
+    _local_cache.pop(guild_id, None)
+    _local_generations[guild_id] = _local_generations.get(guild_id, 0) + 1
+    try:
+        async with get_async_redis().pipeline(transaction=True) as pipe:
+            pipe.incr(_generation_key(guild_id))
+            pipe.expire(_generation_key(guild_id), config['role_cache']['redis_ttl'])
+            pipe.delete(_redis_key(guild_id))
+            await pipe.execute()
+    except Exception as e:
+        _log.error(f"清除管理身份组缓存失败：{e}")
+
+
+def get_role_cache_stats():
+    stats = dict(_stats)
+    stats["local_size"] = len(_local_cache)
+    return stats
@@ -0,0 +1,22 @@
+import feedparser
+
+
+def parse_feed_entries(body):
+    """
+    解析RSS正文，只返回爬虫用到的字段。
+    这个函数会在工作线程或子进程中执行，返回普通字典而不是FeedParserDict，减少进程间传输和序列化的开销。
+    """
+    rss_data = feedparser.parse(body)
+    entries = []
+    for rss_item in rss_data.entries:
+        link = rss_item.get('link')
+        # 没有链接的条目无法去重，也无法推送
+        if not link:
+            continue
+        entries.append({
+            "title": rss_item.get('title', ''),
+            "link": link,
+            "description": rss_item.get('description', ''),
+            "published": rss_item.get('published'),
+        })
+    return entries
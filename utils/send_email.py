@@ -1,5 +1,10 @@
+import asyncio
+import heapq
+import itertools
 import os
 import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.message import EmailMessage
 
 from botpy import get_logger
@@ -13,29 +18,209 @@ class EmailSendingError(Exception):
     pass
 
 
-def send_email(to_email, subject, body):
-    smtp_server = config['email']['smtp_server']
-    smtp_port = config['email']['smtp_port']
-    from_email = os.environ.get('FROM_EMAIL')
-    email_password = os.environ.get('EMAIL_PASSWORD')
-
-    if not from_email or not email_password:
-        raise EmailSendingError("FROM_EMAIL or EMAIL_PASSWORD environment variable is not set.")
-
+def build_message(from_email, to_email, subject, body):
     msg = EmailMessage()
     msg.set_content(body)
     msg['Subject'] = subject
     msg['From'] = from_email
     msg['To'] = to_email
+    return msg
+
+
+def is_permanent_error(e):
+    # 认证失败和5xx响应重试也不会成功，4xx响应和连接错误可以重试
+    if isinstance(e, smtplib.SMTPAuthenticationError):
+        return True
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code >= 500
+
+
+class EmailJob:
+    def __init__(self, to_email, subject, body, future):
+        self.to_email = to_email
+        self.subject = subject
+        self.body = body
+        self.future = future
+        self.domain = to_email.rsplit('@', 1)[-1].lower()
+        self.attempts = 0
+
+
+class EmailSender:
+    """
+    异步邮件发送队列：调用方只把邮件放入有界队列，由后台任务依次发送。
+    SMTP连接在专用线程中保持登录状态并复用，断开后自动重连，不会阻塞事件循环。
+    发送失败时按指数退避重试，同一邮箱域名的两封邮件之间至少间隔domain_interval秒。
+    """
+
+    def __init__(self):
+        self.config = config['email']
+        self.queue = None
+        # 有新邮件入队时设置，next_job据此唤醒
+        self.queued = None
+        self.worker = None
+        # 重试或等待域名限流的邮件，按可以发送的时间排序
+        self.deferred = []
+        self.counter = itertools.count()
+        self.domain_next_send = {}
+        # smtplib的连接不是线程安全的，所有SMTP操作都在同一个线程中执行
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self.smtp = None
+        self.last_used = 0
+
+    def connect(self):
+        from_email = os.environ.get('FROM_EMAIL')
+        email_password = os.environ.get('EMAIL_PASSWORD')
+        if not from_email or not email_password:
+            raise EmailSendingError("FROM_EMAIL or EMAIL_PASSWORD environment variable is not set.")
+        smtp = smtplib.SMTP_SSL(self.config['smtp_server'], self.config['smtp_port'], timeout=self.config['timeout'])
+        try:
+            smtp.login(from_email, email_password)
+        except BaseException:
+            smtp.close()
+            raise
+        return smtp, from_email
+
+    def disconnect(self):
+        if self.smtp is not None:
+            smtp, self.smtp = self.smtp[0], None
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+
+    def send_sync(self, job):
+        # 在SMTP线程中执行
+        if self.smtp is not None and time.monotonic() - self.last_used > self.config['idle_timeout']:
+            # 服务器大多会关闭空闲的连接，空闲太久的连接直接重建
+            self.disconnect()
+        reused = self.smtp is not None
+        if self.smtp is None:
+            self.smtp = self.connect()
+        try:
+            try:
+                smtp, from_email = self.smtp
+                smtp.send_message(build_message(from_email, job.to_email, job.subject, job.body))
+            except smtplib.SMTPServerDisconnected:
+                self.smtp = None
+                if not reused:
+                    raise
+                # 复用的连接已经被服务器关闭，重新登录后再发送一次
+                self.smtp = self.connect()
+                smtp, from_email = self.smtp
+                smtp.send_message(build_message(from_email, job.to_email, job.subject, job.body))
+        except smtplib.SMTPRecipientsRefused:
+            # 只是收件人被拒绝，连接仍然可用
+            self.last_used = time.monotonic()
+            raise
+        except BaseException:
+            # 包括重新连接后的发送失败，连接状态未知，断开后下一封邮件重新连接
+            self.disconnect()
+            raise
+        self.last_used = time.monotonic()
+
+    def enqueue(self, to_email, subject, body):
+        """把邮件放入发送队列，返回发送完成时结束的Future。队列已满时直接抛出EmailSendingError。"""
+        loop = asyncio.get_running_loop()
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.config['queue_size'])
+            self.queued = asyncio.Event()
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self.run())
+        future = loop.create_future()
+        try:
+            self.queue.put_nowait(EmailJob(to_email, subject, body, future))
+        except asyncio.QueueFull:
+            raise EmailSendingError("Email queue is full.")
+        self.queued.set()
+        return future
+
+    def defer(self, job, ready_time):
+        heapq.heappush(self.deferred, (ready_time, next(self.counter), job))
+
+    async def next_job(self):
+        # 取出下一封可以发送的邮件：优先处理已经到时间的延后邮件，否则等待新邮件或最早的延后邮件到时间
+        while True:
+            now = time.monotonic()
+            if self.deferred and self.deferred[0][0] <= now:
+                return heapq.heappop(self.deferred)[2]
+            try:
+                return self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            # 不对queue.get()使用wait_for：Python 3.12之前超时与取到邮件同时发生时邮件会丢失。
+            # 只等待入队事件，邮件始终由上面的get_nowait取出
+            self.queued.clear()
+            timeout = self.deferred[0][0] - now if self.deferred else None
+            try:
+                await asyncio.wait_for(self.queued.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def resolve(job, exception=None):
+        # 调用方可能已经取消等待，此时不再设置结果，避免InvalidStateError终止发送协程
+        if job.future.done():
+            return
+        if exception is None:
+            job.future.set_result(None)
+        else:
+            job.future.set_exception(exception)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.next_job()
+            if job.future.done():
+                continue
+
+            now = time.monotonic()
+            next_send = self.domain_next_send.get(job.domain, 0)
+            if next_send > now:
+                # 同一域名发送太频繁，延后发送，不影响其他域名的邮件
+                self.defer(job, next_send)
+                continue
+            self.domain_next_send[job.domain] = now + self.config['domain_interval']
+
+            job.attempts += 1
+            try:
+                await loop.run_in_executor(self.executor, self.send_sync, job)
+            except asyncio.CancelledError:
+                self.resolve(job, EmailSendingError("Email sender closed."))
+                raise
+            except Exception as e:
+                if is_permanent_error(e) or isinstance(e, EmailSendingError) \
+                        or job.attempts > self.config['max_retries']:
+                    _log.error(f"发送邮件到{job.to_email}时错误：{e}")
+                    self.resolve(job, EmailSendingError("Error sending email."))
+                else:
+                    delay = self.config['retry_backoff'] * 2 ** (job.attempts - 1)
+                    _log.warning(f"发送邮件到{job.to_email}失败，{delay}秒后第{job.attempts}次重试：{e}")
+                    self.defer(job, time.monotonic() + delay)
+            else:
+                self.resolve(job)
+
+    async def close(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+        pending = [job for _, _, job in self.deferred]
+        while self.queue is not None and not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for job in pending:
+            self.resolve(job, EmailSendingError("Email sender closed."))
+        self.deferred.clear()
+        if self.smtp is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self.disconnect)
+
+
+email_sender = EmailSender()
+
 
-    try:
-        server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        server.login(from_email, email_password)
-        server.send_message(msg)
-        server.quit()
-    except smtplib.SMTPException as e:
-        _log.error(f"发送邮件到{to_email}时错误：{e}")
-        raise EmailSendingError("Error sending email.")
-    except Exception as e:
-        _log.error(f"错误：{e}")
-        raise EmailSendingError("Error occurred.")
+def enqueue_email(to_email, subject, body):
+    return email_sender.enqueue(to_email, subject, body)
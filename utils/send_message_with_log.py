@@ -1,10 +1,40 @@
+import time
+
 from botpy.logging import get_logger
 from botpy.message import Message
 
+from config import config
 from utils.encode_urls import encode_urls_in_text
 
 _log = get_logger()
 
+# 主动消息达到平台上限时返回的错误信息
+QUOTA_ERROR = 'push channel message reach limit'
+
+
+class PassiveReplyLimiter:
+    """被动消息限制：每条用户消息在有效期内只能被回复有限次数。"""
+
+    def __init__(self, limit=None, window=None):
+        dispatcher_config = config['message_dispatcher']
+        self.limit = limit or dispatcher_config['passive_reply_limit']
+        self.window = window or dispatcher_config['passive_reply_window']
+        self.replies = {}
+
+    def consume(self, message_id):
+        now = time.monotonic()
+        # 顺带清理已经过了有效期的消息
+        if len(self.replies) > 1024:
+            self.replies = {key: value for key, value in self.replies.items() if value[0] > now}
+        expires_at, count = self.replies.get(message_id, (now + self.window, 0))
+        if expires_at <= now or count >= self.limit:
+            return False
+        self.replies[message_id] = (expires_at, count + 1)
+        return True
+
+
+passive_reply_limiter = PassiveReplyLimiter()
+
 
 def split_content(content, max_length=1000):
     if not content:
@@ -98,6 +128,9 @@ async def reply_with_log(message, content, quote=True, at=True, encode_urls=Fals
     contents = split_content(content)
 
     for content in contents:
+        if not passive_reply_limiter.consume(message.id):
+            _log.error(f"消息{message.id}的被动回复次数已用完或已过期，停止回复。")
+            return
         if quote:
             message_reference = {"message_id": message.id}
         else:
@@ -125,6 +158,9 @@ async def cross_channel_reply_with_log(client, message, content, channel_id, at=
     contents = split_content(content)
 
     for content in contents:
+        if not passive_reply_limiter.consume(message.id):
+            _log.error(f"消息{message.id}的被动回复次数已用完或已过期，停止回复。")
+            return
         try:
             await client.api.post_message(channel_id=channel_id, msg_id=message.id, content=content, **kwargs)
         except Exception as e:
@@ -138,7 +174,8 @@ async def cross_channel_reply_with_log(client, message, content, channel_id, at=
         _log.info(content_escaped_newlines)
 
 
-async def post_with_log(client, channel_id, content, encode_urls=False, **kwargs):
+async def post_with_log(client, channel_id, content, encode_urls=False, raise_errors=False, **kwargs):
+    # raise_errors为True时发送失败会抛出异常，由调用方决定是否重试；否则只记录日志
     content = encode_urls_in_text(content, encode_urls)
 
     contents = split_content(content)
@@ -153,6 +190,9 @@ async def post_with_log(client, channel_id, content, encode_urls=False, **kwargs
                 content = "所有的.已经被替换为。\n\n" + content.replace(".", "。")
                 await client.api.post_message(channel_id=channel_id, content=content,
                                               message_reference=message_reference, **kwargs)
+            elif raise_errors:
+                # 由调用方处理，例如出站调度器遇到配额错误时停止向该子频道发送
+                raise
             else:
                 _log.error(f"{e}")
 
@@ -0,0 +1,73 @@
+import asyncio
+import functools
+import random
+import time
+from collections import OrderedDict
+
+from config import config
+
+
+def single_flight(key=None, ttl=0, negative_ttl=None, jitter=None, maxsize=1024):
+    """
+    合并同一个键的并发调用：同一时刻只执行一次被装饰的协程，其余调用等待同一个结果，
+    用于“先查Redis，未命中再调用上游接口并写回”的函数，避免大量消息同时未命中时重复请求上游。
+
+    key: 根据调用参数生成键的函数，默认使用全部参数
+    ttl: 结果在进程内缓存的秒数，0表示只合并并发调用、不缓存
+    negative_ttl: 结果为None时缓存的秒数，默认使用配置中的single_flight.negative_ttl
+    jitter: 缓存时间随机增加的最大比例，避免同时写入的缓存同时过期
+
+    异常不缓存，但会抛给所有等待同一次调用的调用方。结果在调用方之间共享，不要修改。
+    """
+    if negative_ttl is None:
+        negative_ttl = config['single_flight']['negative_ttl']
+    if jitter is None:
+        jitter = config['single_flight']['jitter']
+
+    def decorator(func):
+        in_flight = {}
+        # cache_key -> (过期时间, 结果)
+        cache = OrderedDict()
+        stats = {"hits": 0, "coalesced": 0, "calls": 0}
+
+        async def load(cache_key, args, kwargs):
+            stats["calls"] += 1
+            result = await func(*args, **kwargs)
+            result_ttl = negative_ttl if result is None else ttl
+            if result_ttl > 0:
+                cache[cache_key] = (time.monotonic() + result_ttl * (1 + random.uniform(0, jitter)), result)
+                cache.move_to_end(cache_key)
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        def forget(cache_key, task):
+            if in_flight.get(cache_key) is task:
+                del in_flight[cache_key]
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs) if key is not None else (args, tuple(sorted(kwargs.items())))
+            entry = cache.get(cache_key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    stats["hits"] += 1
+                    cache.move_to_end(cache_key)
+                    return entry[1]
+                del cache[cache_key]
+
+            task = in_flight.get(cache_key)
+            if task is None:
+                task = asyncio.ensure_future(load(cache_key, args, kwargs))
+                in_flight[cache_key] = task
+                task.add_done_callback(functools.partial(forget, cache_key))
+            else:
+                stats["coalesced"] += 1
+            # 某个调用方被取消时不影响其他等待同一结果的调用方
+            return await asyncio.shield(task)
+
+        wrapper.stats = stats
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import deque
+
+from botpy import get_logger
+
+from config import config
+
+_log = get_logger()
+
+
+class TaskClass:
+    """
+    一类任务的有界工作池：固定数量的worker并发执行，等待中的任务按频道分队列，
+    worker在有任务的频道之间轮转取任务，一个频道刷屏时其他频道的任务不会一直排在后面。
+    """
+
+    def __init__(self, name, class_config):
+        self.name = name
+        self.concurrency = class_config['concurrency']
+        self.max_pending = class_config['max_pending']
+        self.max_pending_per_guild = class_config['max_pending_per_guild']
+        self.timeout = class_config['timeout']
+        # guild_id -> deque[(任务名, 协程工厂, 提交时间)]
+        self.queues = {}
+        # 有等待任务的频道，按轮转顺序排列
+        self.ready = deque()
+        self.available = asyncio.Semaphore(0)
+        self.pending = 0
+        self.running = 0
+        self.workers = []
+        self.shed_logged_at = 0
+        self.stats = {
+            "submitted": 0,
+            "started": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "shed": 0,
+            "wait_total": 0.0,
+            "run_total": 0.0,
+            "run_max": 0.0,
+        }
+
+    def offer(self, guild_id, name, factory):
+        # 放入频道的等待队列，超过总上限或频道上限时返回False
+        queue = self.queues.get(guild_id)
+        if self.pending >= self.max_pending or (queue is not None and len(queue) >= self.max_pending_per_guild):
+            self.stats["shed"] += 1
+            return False
+        if queue is None:
+            queue = self.queues[guild_id] = deque()
+            self.ready.append(guild_id)
+        queue.append((name, factory, time.monotonic()))
+        self.pending += 1
+        self.stats["submitted"] += 1
+        self.available.release()
+        return True
+
+    def take(self):
+        guild_id = self.ready.popleft()
+        queue = self.queues[guild_id]
+        job = queue.popleft()
+        if queue:
+            # 频道还有任务，排到轮转的末尾
+            self.ready.append(guild_id)
+        else:
+            del self.queues[guild_id]
+        self.pending -= 1
+        return job
+
+    def start(self, supervisor):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self.worker(supervisor), name=f"[{self.name}] worker-{i}")
+                            for i in range(self.concurrency)]
+
+    async def worker(self, supervisor):
+        while True:
+            await self.available.acquire()
+            name, factory, submitted_at = self.take()
+            started_at = time.monotonic()
+            self.stats["started"] += 1
+            self.stats["wait_total"] += started_at - submitted_at
+            self.running += 1
+            try:
+                await asyncio.wait_for(factory(), self.timeout)
+                self.stats["completed"] += 1
+            except asyncio.TimeoutError:
+                self.stats["timed_out"] += 1
+                _log.error(f"任务{name}执行超过{self.timeout}秒，已取消")
+            except Exception as e:
+                self.stats["failed"] += 1
+                _log.error(f"执行任务{name}时发生错误：{e}", exc_info=e)
+            finally:
+                self.running -= 1
+                elapsed = time.monotonic() - started_at
+                self.stats["run_total"] += elapsed
+                self.stats["run_max"] = max(self.stats["run_max"], elapsed)
+                if elapsed > supervisor.slow_task_seconds:
+                    _log.warning(f"任务{name}耗时{elapsed:.1f}秒，排队{started_at - submitted_at:.1f}秒")
+
+
+class TaskSupervisor:
+    """
+    替代直接调用asyncio.create_task分发消息处理：每类任务有独立的并发上限和等待队列，
+    队列已满时不再接收新任务并调用on_shed（例如回复繁忙），任务的异常、超时和耗时都会被记录。
+    """
+
+    def __init__(self):
+        self.config = config['task_supervisor']
+        self.slow_task_seconds = self.config['slow_task_seconds']
+        self.classes = {}
+        # 由监督器创建的其他后台任务（例如繁忙回复），保留引用避免被回收
+        self.tasks = set()
+
+    def get_class(self, class_name):
+        task_class = self.classes.get(class_name)
+        if task_class is None:
+            classes_config = self.config['classes']
+            class_config = classes_config.get(class_name, classes_config['default'])
+            task_class = self.classes[class_name] = TaskClass(class_name, class_config)
+        return task_class
+
+    def submit(self, class_name, guild_id, name, factory, on_shed=None):
+        """
+        提交任务，factory为无参数、返回协程的函数，任务开始执行时才调用，被拒绝的任务不会创建协程。
+        返回是否接收；被拒绝时在后台执行on_shed()返回的协程。
+        """
+        task_class = self.get_class(class_name)
+        task_class.start(self)
+        if task_class.offer(guild_id, name, factory):
+            return True
+        # 拒绝时往往正在刷屏，日志最多每10秒记录一次
+        now = time.monotonic()
+        if now - task_class.shed_logged_at >= 10:
+            task_class.shed_logged_at = now
+            _log.warning(f"{class_name}类任务繁忙，已拒绝频道{guild_id}的任务{name}，累计拒绝{task_class.stats['shed']}个")
+        if on_shed is not None:
+            self.run_in_background(on_shed())
+        return False
+
+    def run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def snapshot(self):
+        # 各类任务的计数、排队和执行耗时
+        result = {}
+        for class_name, task_class in self.classes.items():
+            stats = dict(task_class.stats, pending=task_class.pending, running=task_class.running)
+            finished = stats["completed"] + stats["failed"] + stats["timed_out"]
+            stats["wait_avg"] = stats["wait_total"] / stats["started"] if stats["started"] else 0.0
+            stats["run_avg"] = stats["run_total"] / finished if finished else 0.0
+            result[class_name] = stats
+        return result
+
+    async def close(self):
+        workers = [worker for task_class in self.classes.values() for worker in task_class.workers]
+        for task in workers + list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*workers, *self.tasks, return_exceptions=True)
+        self.classes.clear()
+
+
+supervisor = TaskSupervisor()
@@ -1,48 +1,76 @@
-import base64
+import asyncio
+import glob
+import hashlib
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
+import pymysql
+from botpy import get_logger
 from PIL import Image, ImageDraw, ImageFont
 
+from config import config
+from utils.image_ingest import IMAGE_ROOT
+from utils.mysql_utils import get_async_mysql_conn
+
+_log = get_logger()
+
+# 渲染方式变化、需要让已有的水印图片全部失效时修改这个版本号
+RENDER_VERSION = 1
+
+# 密集水印相邻两个文字之间的最小间距
+MIN_DISTANCE = 125
+
+
+@lru_cache(maxsize=32)
+def dense_tile(font, watermark_text):
+    """
+    生成密集水印的平铺单元，按水印文字缓存，返回(文字图像, 文字在单元内的偏移, 单元尺寸)。
+    旋转45度后的文字图像四角是全透明的，裁剪到不透明区域后合成的像素更少，结果与合成整张文字图像完全相同。
+    """
+    text_width, text_height = font.getsize(watermark_text)
+
+    # 创建一个旋转45度的水印文本图像
+    txt_img = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
+    txt_draw = ImageDraw.Draw(txt_img)
+    txt_draw.text((0, 0), watermark_text, font=font, fill=(128, 128, 128, 128))
+    txt_img = txt_img.rotate(45, expand=True)
+
+    # 计算旋转后的文本图像的尺寸，如果小于最小间距，就使用最小间距
+    rotated_width, rotated_height = txt_img.size
+    step = (max(rotated_width, MIN_DISTANCE), max(rotated_height, MIN_DISTANCE))
+
+    bbox = txt_img.getbbox()
+    if bbox is None:
+        return None, (0, 0), step
+    return txt_img.crop(bbox), bbox[:2], step
+
 
 class Watermark:
     def __init__(self):
         self.font_path = os.path.join("resource", "fonts", "SourceHanSansCN-Regular.otf")
         self.font = ImageFont.truetype(self.font_path, 30)
 
-    def add_watermark_to_image(self, image_path, watermark_text, dense=False):
-        watermark_text_encoded = base64.b64encode(watermark_text.encode()).decode()  # 将水印文本编码为base64
-
-        image_dir, image_name = os.path.split(image_path)
-        new_image_name = f"{image_name.split('.')[0]}_{('dense_' if dense else '')}watermarked_{watermark_text_encoded}.jpg"
-        new_image_path = os.path.join(image_dir, new_image_name)
+    def render(self, image_path, watermark_text, dense, output_path):
+        img = self.apply(Image.open(image_path).convert('RGBA'), watermark_text, dense)
 
-        # 如果已经存在加水印的图片，直接返回其路径
-        if os.path.exists(new_image_path):
-            return new_image_path
+        # 先写入临时文件再重命名，其他进程不会读到写了一半的图片
+        temp_path = f"{output_path}.{os.getpid()}.tmp"
+        img.convert('RGB').save(temp_path, format='JPEG')  # 将图片模式转换为'RGB'并保存
+        os.replace(temp_path, output_path)
+        return output_path
 
-        img = Image.open(image_path).convert('RGBA')
+    def apply(self, img, watermark_text, dense):
+        # 在RGBA图片上绘制水印，直接修改并返回img
         width, height = img.size
 
-        # 设置最小间距
-        min_distance = 125
-
         if dense:
-            text_width, text_height = self.font.getsize(watermark_text)
-
-            # 创建一个旋转45度的水印文本图像
-            txt_img = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
-            txt_draw = ImageDraw.Draw(txt_img)
-            txt_draw.text((0, 0), watermark_text, font=self.font, fill=(128, 128, 128, 128))
-            txt_img = txt_img.rotate(45, expand=True)
-
-            # 计算旋转后的文本图像的尺寸，如果小于最小间距，就使用最小间距
-            rotated_width, rotated_height = txt_img.size
-            rotated_width = max(rotated_width, min_distance)
-            rotated_height = max(rotated_height, min_distance)
-
-            for x in range(-rotated_width, width, rotated_width):
-                for y in range(-rotated_height, height, rotated_height):
-                    img.paste(txt_img, (x, y), txt_img)
+            glyphs, (offset_x, offset_y), (step_x, step_y) = dense_tile(self.font, watermark_text)
+            if glyphs is not None:
+                for x in range(-step_x, width, step_x):
+                    for y in range(-step_y, height, step_y):
+                        img.paste(glyphs, (x + offset_x, y + offset_y), glyphs)
         else:
             draw = ImageDraw.Draw(img)
             text_width, text_height = self.font.getsize(watermark_text)
@@ -58,11 +86,159 @@ class Watermark:
             # 绘制白色字体
             text_color = (255, 255, 255)
             draw.text((x, y), watermark_text, font=self.font, fill=text_color)
+        return img
+
+
+# 渲染进程中的Watermark实例，字体只在每个进程第一次渲染时加载
+_renderer = None
+
+
+def variant_path(image_path, watermark_text, dense):
+    # 水印图片与原图放在同一目录，文件名包含水印设置的摘要，设置变化后旧的文件会被清理
+    digest = hashlib.sha1(f"{RENDER_VERSION}:{int(dense)}:{watermark_text}".encode()).hexdigest()[:16]
+    return f"{image_path}_wm-{digest}.jpg"
 
-        # 保存图片到一个新的文件
-        img.convert('RGB').save(new_image_path)  # 将图片模式转换为'RGB'并保存
 
-        return new_image_path
+def evict_stale_variants(image_path, keep=None):
+    # 删除该图片除keep以外的所有水印图片，包括旧版本以base64命名的文件
+    for path in glob.glob(f"{glob.escape(image_path)}_*.jpg"):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
 
-watermark = Watermark()
+def render_variant(image_path, watermark_text, dense):
+    """在渲染进程中执行：生成水印图片并清理该图片的旧水印图片，已经存在时直接返回路径。"""
+    global _renderer
+    output_path = variant_path(image_path, watermark_text, dense)
+    if not os.path.exists(output_path):
+        if _renderer is None:
+            _renderer = Watermark()
+        _renderer.render(image_path, watermark_text, dense, output_path)
+    evict_stale_variants(image_path, keep=output_path)
+    return output_path
+
+
+def evict_all_variants(image_paths):
+    for image_path in image_paths:
+        evict_stale_variants(image_path)
+
+
+class WatermarkService:
+    """
+    频道水印服务：缓存各频道的水印设置，在图片添加或水印变化时于后台进程池中预先生成水印图片，
+    发送图片时优先直接使用已经生成的文件。
+    """
+
+    def __init__(self):
+        self.config = config['watermark']
+        self.settings = {}
+        self.executor = None
+        self.rendering = {}
+        self.tasks = set()
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.config['render_workers'])
+        return self.executor
+
+    async def get_settings(self, guild_id):
+        # 返回(水印文本, 是否密集)，频道没有设置水印时文本为None
+        entry = self.settings.get(guild_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        conn = await get_async_mysql_conn()
+        try:
+            cursor = conn.cursor()
+            await cursor.execute("""
+                SELECT watermark, is_dense
+                FROM question_answer_watermark
+                WHERE guild_id = %s;
+            """, guild_id)
+            result = await cursor.fetchone()
+        except pymysql.Error as e:
+            _log.error(f"错误：{e}")
+            return None, False
+        finally:
+            await conn.close()
+
+        settings = (result['watermark'], bool(result['is_dense'])) if result else (None, False)
+        self.settings[guild_id] = (time.monotonic() + self.config['settings_ttl'], settings)
+        return settings
+
+    async def render(self, image_path, watermark_text, dense):
+        # 同一张图片的同一种水印只渲染一次，并发请求等待同一个结果
+        key = variant_path(image_path, watermark_text, dense)
+        future = self.rendering.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.get_executor(), render_variant, image_path, watermark_text, dense)
+            self.rendering[key] = future
+            future.add_done_callback(lambda _: self.rendering.pop(key, None))
+        return await future
+
+    async def get_image(self, guild_id, image_path):
+        """返回发送时应使用的图片路径：没有水印时为原图，否则为水印图片。"""
+        watermark_text, dense = await self.get_settings(guild_id)
+        if not watermark_text:
+            return image_path
+        path = variant_path(image_path, watermark_text, dense)
+        if os.path.exists(path):
+            return path
+        # 预生成还没有完成时当场渲染
+        return await self.render(image_path, watermark_text, dense)
+
+    def run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def prerender(self, guild_id, image_paths):
+        watermark_text, dense = await self.get_settings(guild_id)
+        loop = asyncio.get_running_loop()
+        if not watermark_text:
+            await loop.run_in_executor(None, evict_all_variants, image_paths)
+            return
+        results = await asyncio.gather(*[self.render(image_path, watermark_text, dense)
+                                         for image_path in image_paths], return_exceptions=True)
+        for image_path, result in zip(image_paths, results):
+            if isinstance(result, Exception):
+                _log.error(f"生成{image_path}的水印图片失败：{result}")
+
+    def on_images_added(self, guild_id, image_paths):
+        # 新图片在后台生成水印图片，不阻塞添加图片的回复
+        self.run_in_background(self.prerender(guild_id, image_paths))
+
+    async def get_guild_image_paths(self, guild_id):
+        conn = await get_async_mysql_conn()
+        try:
+            cursor = conn.cursor()
+            await cursor.execute("""
+                SELECT qai.question_answer_id, qai.image_seq
+                FROM question_answer qa
+                JOIN question_answer_image qai ON qa.question_answer_id = qai.question_answer_id
+                WHERE qa.guild_id = %s;
+            """, guild_id)
+            rows = await cursor.fetchall()
+        finally:
+            await conn.close()
+        return [os.path.join(IMAGE_ROOT, str(row['question_answer_id']), f"image_seq-{row['image_seq']}")
+                for row in rows]
+
+    async def refresh_guild(self, guild_id):
+        try:
+            await self.prerender(guild_id, await self.get_guild_image_paths(guild_id))
+        except Exception as e:
+            _log.error(f"重新生成频道{guild_id}的水印图片时发生错误：{e}")
+
+    def on_watermark_changed(self, guild_id):
+        # 水印设置变化后立即失效缓存，并在后台为频道的所有图片重新生成水印图片、清理旧的水印图片
+        self.settings.pop(guild_id, None)
+        self.run_in_background(self.refresh_guild(guild_id))
+
+
+watermark_service = WatermarkService()